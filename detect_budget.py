@@ -0,0 +1,119 @@
+import time
+from collections import Counter
+
+import pandas as pd
+
+from detect_reader import DEFAULT_CHUNKSIZE, iter_log_records
+from detect_records import load_rows_by_index
+from detect_shard import filter_shard
+from llm_client import add_call_listener, remove_call_listener
+
+# ==== 配置参数 ====
+PENDING_PATH = "未处理日志.csv"
+LEVEL_PRIORITY = {"FATAL": 4, "SEVERE": 3, "ERROR": 3, "FAILURE": 3, "WARN": 2, "WARNING": 2}
+CRITICAL_COMPONENTS = {"KERNEL", "APP", "HARDWARE", "MMCS", "dfs.FSNamesystem:"}
+
+
+class RunBudget:
+    """
+    运行预算：最大调用次数 / 最大 token 数 / 最长运行时间（任一为 None 表示不限制）。
+    通过 llm_client 的调用监听器实时累计用量。
+    """
+
+    def __init__(self, max_calls=None, max_tokens=None, max_seconds=None):
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.calls = 0
+        self.tokens = 0
+        self._start = None
+
+    @property
+    def limited(self):
+        return any(v is not None for v in (self.max_calls, self.max_tokens, self.max_seconds))
+
+    def _on_call(self, event):
+        self.calls += 1
+        self.tokens += event["prompt_tokens"] + event["completion_tokens"]
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        add_call_listener(self._on_call)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        remove_call_listener(self._on_call)
+        return False
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._start if self._start is not None else 0.0
+
+    def exhausted(self):
+        """返回预算耗尽原因，未耗尽返回 None"""
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return f"调用次数达到上限 {self.max_calls}"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return f"token 用量达到上限 {self.max_tokens}"
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return f"运行时间达到上限 {self.max_seconds}s"
+        return None
+
+    def summary(self):
+        return f"调用 {self.calls} 次 | token {self.tokens} | 用时 {self.elapsed:.1f}s"
+
+
+def priority_order(records, critical_components=CRITICAL_COMPONENTS):
+    """
+    待检测日志的优先级排序：
+    1）等级越严重越优先（FATAL > ERROR > WARN > 其它）；
+    2）关键组件优先；
+    3）EventId 在本批次中越罕见越优先；
+    4）其余按原始顺序。
+    返回排序后的 (行号, record) 列表。
+    """
+    event_counts = Counter(str(r.get("EventId")) for _, r in records)
+
+    def key(item):
+        idx, r = item
+        level = LEVEL_PRIORITY.get(str(r.get("Level", "")).upper(), 0)
+        critical = str(r.get("Component", "")) in critical_components
+        return (-level, not critical, event_counts[str(r.get("EventId"))], idx)
+
+    return sorted(records, key=key)
+
+
+def run_budgeted_detection(input_path, detect_fn, budget, chunksize=DEFAULT_CHUNKSIZE, profiler=None,
+                           critical_components=CRITICAL_COMPONENTS, pending_path=PENDING_PATH,
+                           shard=None, shard_by="row"):
+    """
+    预算模式：按优先级处理日志，预算耗尽时在日志边界处停止，
+    未处理的日志按原始列写入 pending_path，可直接作为下一次运行的输入。
+    注意：优先级排序需要先读入全部待检测记录（仅检测所需列）。
+    """
+    records = list(filter_shard(iter_log_records(input_path, chunksize=chunksize), shard, shard_by))
+    ordered = priority_order(records, critical_components)
+    del records
+
+    results = []
+    stop_reason = None
+    with budget:
+        for done, (idx, row) in enumerate(ordered):
+            stop_reason = budget.exhausted()
+            if stop_reason:
+                break
+            print(f"\n🔍 正在处理第 {done + 1}/{len(ordered)} 条日志（行 {idx + 1}，{budget.summary()}）...")
+            results.append(detect_fn(idx, row))
+            if profiler is not None:
+                profiler.checkpoint()
+
+    pending = [idx for idx, _ in ordered[len(results):]]
+    print(f"\n💰 预算使用：{budget.summary()}")
+    if pending:
+        print(f"⏸️ {stop_reason}，提前停止：已处理 {len(results)} 条，剩余 {len(pending)} 条")
+        rows = load_rows_by_index(input_path, pending)
+        pd.DataFrame([rows[i] for i in sorted(rows)]).to_csv(pending_path, index=False)
+        print(f"📝 未处理日志已保存至：{pending_path}")
+
+    results.sort(key=lambda r: r.index)
+    return results
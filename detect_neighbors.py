@@ -0,0 +1,216 @@
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+from detect_records import ModelAVerdict, intern_text
+
+# ==== 配置参数 ====
+NEIGHBOR_DIR = "近邻判定索引"
+SIMILARITY_RADIUS = 0.92        # 余弦相似度不低于该值才视为近邻
+MIN_NEIGHBOR_SCORE = 0.8        # 仅复用置信度不低于该值的历史判定
+TOP_K = 5                       # 检查的最近邻数量：半径内的高置信近邻必须标签一致
+DEDUP_SIMILARITY = 0.995        # 与已有同标签向量几乎相同的判定不再重复入库
+
+_VECTORS = "vectors.npy"
+_META = "meta.jsonl"
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class BruteForceIndex:
+    """暴力内积检索：已持久化的向量以内存映射方式读取，新增向量暂存在内存中"""
+
+    def __init__(self, base=None, dim=None):
+        self.base = base
+        self.dim = base.shape[1] if base is not None else dim
+        self._extra = []
+
+    def __len__(self):
+        return (len(self.base) if self.base is not None else 0) + len(self._extra)
+
+    def add(self, vector):
+        self.dim = self.dim or len(vector)
+        self._extra.append(np.asarray(vector, dtype=np.float32))
+
+    def search(self, query, k):
+        parts = []
+        if self.base is not None and len(self.base):
+            parts.append(self.base @ query)
+        if self._extra:
+            parts.append(np.stack(self._extra) @ query)
+        if not parts:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        sims = np.concatenate(parts)
+        k = min(k, len(sims))
+        ids = np.argpartition(-sims, k - 1)[:k]
+        ids = ids[np.argsort(-sims[ids], kind="stable")]
+        return sims[ids], ids
+
+    def vectors(self):
+        parts = [np.asarray(self.base)] if self.base is not None else []
+        if self._extra:
+            parts.append(np.stack(self._extra))
+        return np.concatenate(parts) if parts else np.empty((0, self.dim or 0), dtype=np.float32)
+
+
+class FaissIndex(BruteForceIndex):
+    """faiss HNSW 近似检索（需安装 faiss）；持久化格式与暴力检索相同"""
+
+    def __init__(self, base=None, dim=None):
+        import faiss
+        super().__init__(base, dim)
+        self._faiss = faiss
+        self._index = None
+        if base is not None and len(base):
+            self._build(np.asarray(base, dtype=np.float32))
+
+    def _build(self, vectors):
+        self._index = self._faiss.IndexHNSWFlat(vectors.shape[1], 32, self._faiss.METRIC_INNER_PRODUCT)
+        self._index.add(vectors)
+
+    def add(self, vector):
+        super().add(vector)
+        vector = np.asarray(vector, dtype=np.float32)[None, :]
+        if self._index is None:
+            self._build(vector)
+        else:
+            self._index.add(vector)
+
+    def search(self, query, k):
+        if self._index is None:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        sims, ids = self._index.search(np.asarray(query, dtype=np.float32)[None, :], k)
+        keep = ids[0] >= 0
+        return sims[0][keep], ids[0][keep]
+
+
+INDEX_BACKENDS = {"brute": BruteForceIndex, "faiss": FaissIndex}
+
+
+class NeighborVerdicts:
+    """
+    近邻判定复用：对历史中高置信判定过的日志内容建立向量索引，
+    新日志在相似半径内存在标签一致的高置信近邻时，直接复用其判定与解释，跳过 LLM。
+    索引目录包含 vectors.npy（归一化向量，启动时内存映射）与 meta.jsonl（逐行判定信息）。
+    同一索引目录不支持多个进程同时写入（分片 / 队列 worker 请各自使用独立目录或只读共享）。
+    """
+
+    name = "neighbor"
+
+    def __init__(self, index_dir=NEIGHBOR_DIR, backend="brute", encoder=None):
+        self.index_dir = index_dir
+        self.backend = backend
+        self._encoder = encoder
+        self.meta = []
+        self._new_meta = []
+        self.stats = Counter()
+        base = None
+        vectors_path = os.path.join(index_dir, _VECTORS)
+        if os.path.exists(vectors_path):
+            base = np.load(vectors_path, mmap_mode="r")
+            with open(os.path.join(index_dir, _META), encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    entry["reason"] = intern_text(entry["reason"])
+                    self.meta.append(entry)
+            # 写入中断时两者长度可能不一致，只保留对齐的部分
+            n = min(len(base), len(self.meta))
+            base, self.meta = base[:n], self.meta[:n]
+            print(f"🧭 已加载近邻判定索引：{index_dir}（{len(self.meta)} 条）")
+        self.index = INDEX_BACKENDS[backend](base)
+
+    @classmethod
+    def load(cls, index_dir=NEIGHBOR_DIR, backend="brute"):
+        return cls(index_dir, backend)
+
+    # ==== 向量化 ====
+    def encode(self, row):
+        if self._encoder is None:
+            # 与共识阶段共用同一个 SBERT 模型，按需加载
+            from model3_similarity_utils import sbert
+            self._encoder = sbert
+        text = row.get("Content") or row.get("EventTemplate") or ""
+        return _normalize(self._encoder.encode(str(text)))
+
+    # ==== 检测流程接口 ====
+    def lookup(self, row):
+        """半径内的高置信近邻标签一致时，返回最近者的判定（ModelAVerdict），否则返回 None"""
+        self.stats["seen"] += 1
+        if not len(self.index):
+            return None
+        sims, ids = self.index.search(self.encode(row), TOP_K)
+        near = [(s, self.meta[i]) for s, i in zip(sims, ids)
+                if s >= SIMILARITY_RADIUS and self.meta[i]["score"] >= MIN_NEIGHBOR_SCORE]
+        if not near or len({m["label"] for _, m in near}) > 1:
+            return None
+        best = near[0][1]
+        self.stats["hits"] += 1
+        return ModelAVerdict(best["label"], best["score"], best["reason"])
+
+    def observe(self, row, record):
+        """融合阶段直接采纳的判定与三模型一致的共识判定入库"""
+        if record.bypass is not None or record.model_a is None:
+            return
+        if record.consensus is None and record.fusion_label in ("黑日志", "白日志"):
+            label, score, reason = record.model_a.label, record.fusion_score, record.model_a.reason
+        elif record.consensus and record.consensus.get("status") == "HARD":
+            label = record.consensus["final_label"]
+            detail = record.consensus.get("detail") or {}
+            scores = detail.get("scores") or [0.0]
+            score = float(np.mean(scores))
+            reason = next(iter((detail.get("reasons") or {}).values()), "")
+        else:
+            return
+        if score is None or score < MIN_NEIGHBOR_SCORE:
+            return
+
+        vector = self.encode(row)
+        if len(self.index):
+            sims, ids = self.index.search(vector, 1)
+            if len(ids) and sims[0] >= DEDUP_SIMILARITY and self.meta[ids[0]]["label"] == label:
+                return
+        self.index.add(vector)
+        entry = {"label": int(label), "score": round(float(score), 3), "reason": intern_text(reason),
+                 "event_id": record.event_id}
+        self.meta.append(entry)
+        self._new_meta.append(entry)
+        self.stats["added"] += 1
+
+    def score_bypass(self, record):
+        if record.true_label in (0, 1):
+            self.stats["bypass_labeled"] += 1
+            self.stats["bypass_correct"] += int(record.model_a.label == record.true_label)
+
+    # ==== 持久化 ====
+    def save(self):
+        """
+        向量整体重写（先写临时文件再替换，已映射的旧文件不受影响），meta 只追加新条目。
+        先替换向量再追加 meta，中途中断时加载会按两者较短的长度对齐。
+        """
+        if not self.index_dir or not self._new_meta:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        vectors_path = os.path.join(self.index_dir, _VECTORS)
+        tmp_path = vectors_path + ".tmp.npy"
+        np.save(tmp_path, self.index.vectors())
+        os.replace(tmp_path, vectors_path)
+        with open(os.path.join(self.index_dir, _META), "a", encoding="utf-8") as f:
+            for entry in self._new_meta:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._new_meta = []
+
+    def print_stats(self):
+        seen = self.stats["seen"]
+        hits = self.stats["hits"]
+        labeled = self.stats["bypass_labeled"]
+        print("\n🧭 【近邻判定复用】")
+        print(f"✔️ 复用率：{hits}/{seen}（{hits / seen if seen else 0:.1%}） | 索引规模 {len(self.index)}"
+              f"（本次新增 {self.stats['added']}）")
+        if labeled:
+            print(f"✔️ 复用准确率：{self.stats['bypass_correct'] / labeled:.3f}（有真实标签 {labeled} 条）")
@@ -0,0 +1,225 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from detect_reader import DEFAULT_CHUNKSIZE, iter_log_records
+from detect_records import DetectionRecord, InlineTable, convert_to_builtin_type
+
+# ==== 配置参数 ====
+LEASE_SECONDS = 600     # 租约时长：worker 超时未确认的行会被重新入队
+LEASE_SIZE = 1          # 每次领取的行数（灰日志耗时差异大，默认逐条领取）
+MAX_ATTEMPTS = 3        # 同一行最多被领取的次数，超过后标记为 failed
+HEARTBEAT_FRACTION = 3  # 检测期间每 租约时长/该值 秒续租一次
+POLL_INTERVAL = 5.0     # 队列暂无可领取行、但仍有租约未结束时的等待间隔（秒）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    idx INTEGER PRIMARY KEY,          -- 输入 CSV 中的行号（0 起）
+    payload TEXT NOT NULL,            -- 检测所需列（JSON）
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending / leased / done / failed
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT                       -- DetectionRecord（JSON，字符串内联）
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, lease_expires);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _renew_lease(conn, worker_id, idx, lease_seconds):
+    """延长本 worker 持有的租约；租约已被他人领取或已结束时返回 False"""
+    return conn.execute(
+        "UPDATE jobs SET lease_expires = ? WHERE idx = ? AND status = 'leased' AND lease_owner = ?",
+        (time.time() + lease_seconds, idx, worker_id)).rowcount > 0
+
+
+class WorkQueue:
+    """
+    基于本地 SQLite 的检测任务队列，多个 log_detect.py worker 进程可共享同一任务。
+    - lease：原子地领取若干待处理行并加租约；
+    - ack：写回检测结果并标记完成；
+    - renew / keep_alive：检测前与检测期间续租，耗时较长的共识流程不会被其他 worker 重复领取；
+    - 租约过期（worker 崩溃或卡死）的行在下一次 lease 时自动重新入队。
+    """
+
+    def __init__(self, db_path, timeout=60):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ==== 入队 ====
+    def enqueue(self, input_path, chunksize=DEFAULT_CHUNKSIZE):
+        """将输入 CSV 的行写入队列（重复入队同一行号会被忽略），返回新入队行数"""
+        before = self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        batch = []
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('input_path', ?)", (input_path,))
+            for idx, record in iter_log_records(input_path, chunksize=chunksize):
+                batch.append((idx, json.dumps(record, ensure_ascii=False, default=convert_to_builtin_type)))
+                if len(batch) >= chunksize:
+                    self.conn.executemany("INSERT OR IGNORE INTO jobs(idx, payload) VALUES (?, ?)", batch)
+                    batch = []
+            if batch:
+                self.conn.executemany("INSERT OR IGNORE INTO jobs(idx, payload) VALUES (?, ?)", batch)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        after = self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return after - before
+
+    def input_path(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'input_path'").fetchone()
+        return row[0] if row else None
+
+    # ==== 领取 / 确认 ====
+    def _requeue_expired(self, now):
+        self.conn.execute(
+            "UPDATE jobs SET status = 'failed', lease_owner = NULL "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, MAX_ATTEMPTS))
+        return self.conn.execute(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?", (now,)).rowcount
+
+    def lease(self, worker_id, size=LEASE_SIZE, lease_seconds=LEASE_SECONDS):
+        """领取最多 size 行，返回 [(行号, record)]"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            requeued = self._requeue_expired(now)
+            if requeued:
+                print(f"♻️ {requeued} 行租约过期，已重新入队")
+            rows = self.conn.execute(
+                "SELECT idx, payload FROM jobs WHERE status = 'pending' ORDER BY idx LIMIT ?", (size,)).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE idx = ?", [(worker_id, now + lease_seconds, idx) for idx, _ in rows])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [(idx, json.loads(payload)) for idx, payload in rows]
+
+    def renew(self, worker_id, idx, lease_seconds=LEASE_SECONDS):
+        return _renew_lease(self.conn, worker_id, idx, lease_seconds)
+
+    @contextmanager
+    def keep_alive(self, worker_id, idx, lease_seconds=LEASE_SECONDS):
+        """上下文期间由后台线程（独立连接）定期续租 idx，worker 崩溃时线程随进程结束，租约照常过期"""
+        stop = threading.Event()
+
+        def heartbeat():
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            try:
+                while not stop.wait(lease_seconds / HEARTBEAT_FRACTION):
+                    if not _renew_lease(conn, worker_id, idx, lease_seconds):
+                        break
+            finally:
+                conn.close()
+
+        thread = threading.Thread(target=heartbeat, name=f"lease-{idx}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def ack(self, idx, record):
+        """写回检测结果；即使租约已过期被他人重新领取，先完成的结果也会被采纳"""
+        result = json.dumps(record.to_compact(InlineTable, InlineTable), ensure_ascii=False,
+                            default=convert_to_builtin_type)
+        self.conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL WHERE idx = ? AND status != 'done'",
+            (result, idx))
+
+    def release(self, idx, worker_id):
+        """worker 主动放弃自己持有的某行（例如被中断），立即重新入队"""
+        self.conn.execute(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL "
+            "WHERE idx = ? AND status = 'leased' AND lease_owner = ?", (idx, worker_id))
+
+    # ==== 统计 / 导出 ====
+    def counts(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+    def results(self):
+        """按行号顺序读出所有已完成行的 DetectionRecord"""
+        for (result,) in self.conn.execute("SELECT result FROM jobs WHERE status = 'done' ORDER BY idx"):
+            yield DetectionRecord.from_compact(json.loads(result), InlineTable, InlineTable)
+
+
+def run_queue_worker(queue, detect_fn, worker_id=None, lease_size=LEASE_SIZE, lease_seconds=LEASE_SECONDS,
+                     poll_interval=POLL_INTERVAL, profiler=None, budget=None):
+    """
+    worker 主循环：不断领取、检测、写回，直到队列中既无待处理行也无未结束的租约。
+    给定 budget（已进入的 RunBudget）时，预算耗尽即归还未检测的行并退出，留给后续 worker。
+    返回本 worker 处理的行数。
+    """
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    print(f"👷 worker {worker_id} 启动，队列：{queue.db_path}")
+    exhausted = None
+    while exhausted is None:
+        if budget is not None and budget.limited:
+            exhausted = budget.exhausted()
+            if exhausted:
+                break
+        jobs = queue.lease(worker_id, size=lease_size, lease_seconds=lease_seconds)
+        if not jobs:
+            counts = queue.counts()
+            if not counts.get("pending") and not counts.get("leased"):
+                break
+            time.sleep(poll_interval)
+            continue
+        for i, (idx, row) in enumerate(jobs):
+            if budget is not None and budget.limited:
+                exhausted = budget.exhausted()
+                if exhausted:
+                    for rest_idx, _ in jobs[i:]:
+                        queue.release(rest_idx, worker_id)
+                    break
+            # 同批领取的后续行可能在前面几行检测期间过期并被他人领取，检测前先续租，失败则跳过
+            if not queue.renew(worker_id, idx, lease_seconds):
+                print(f"⚠️ [{worker_id}] 第 {idx + 1} 条日志的租约已失效（已被重新领取或标记失败），跳过")
+                continue
+            print(f"\n🔍 [{worker_id}] 正在处理第 {idx + 1} 条日志...")
+            try:
+                with queue.keep_alive(worker_id, idx, lease_seconds):
+                    record = detect_fn(idx, row)
+            except BaseException:
+                for rest_idx, _ in jobs[i:]:
+                    queue.release(rest_idx, worker_id)
+                raise
+            queue.ack(idx, record)
+            processed += 1
+            if profiler is not None:
+                profiler.checkpoint()
+
+    if exhausted:
+        print(f"\n⏹️ [{worker_id}] 预算耗尽：{exhausted}（{budget.summary()}），剩余行留在队列中")
+    print(f"\n✅ worker {worker_id} 结束，本进程处理 {processed} 条；队列状态：{queue.counts()}")
+    return processed
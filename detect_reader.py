@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pandas as pd
+
+# 提示词实际用到的列
+PROMPT_COLUMNS = ["EventTemplate", "Component", "Level", "Type", "Node", "Content"]
+# 行标识、事件与标签列（结果引用与评估用）
+ID_COLUMNS = ["NewLineId", "OriginalLineId", "LineId", "EventId", "BinaryLabel"]
+# 取值高度重复的列按 category 读取，同一取值在块内只存一份
+CATEGORY_COLUMNS = ["EventTemplate", "Component", "Level", "Type", "Node", "EventId"]
+
+DEFAULT_CHUNKSIZE = 50000
+PARSER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "解析脚本")
+
+
+def binary_label(record, settings):
+    """依据 settings 中的标签配置推断 BinaryLabel，无法推断时返回 -1"""
+    label = record.get("Label")
+    if label is None:
+        return -1
+    if "anomaly_labels" in settings:
+        return int(label in settings["anomaly_labels"])
+    if "normal_labels" in settings:
+        return int(label not in settings["normal_labels"])
+    return -1
+
+
+class RawLogSource:
+    """
+    原始日志输入：读取时由 LogParser.iter_records 在内存中逐行解析，按块产出与解析后 CSV 相同列的 DataFrame
+    （headers 各列 + BinaryLabel），不生成中间结构化文件。
+    每次读取都从头重新解析（如导出灰日志池时按行号回填），EventId 按首次出现顺序分配，多次读取结果一致。
+    """
+
+    def __init__(self, path, log_type):
+        self.path = str(path)
+        self.log_type = log_type
+
+    def __str__(self):
+        return self.path
+
+    def chunks(self, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+        if PARSER_DIR not in sys.path:
+            sys.path.insert(0, PARSER_DIR)
+        # 解析模块只在读取原始日志时加载（logParser_main 导入时会配置日志文件）
+        from line_reader import read_lines
+        from logParser_main import LogParser
+        from settings import parse_settings
+
+        settings = parse_settings[self.log_type]
+        names = [c for c in list(settings["headers"]) + ["BinaryLabel"] if columns is None or c in columns]
+        rows = []
+        for record in LogParser(settings).iter_records(read_lines(self.path)):
+            record["BinaryLabel"] = binary_label(record, settings)
+            rows.append([record[c] for c in names])
+            if len(rows) >= chunksize:
+                yield pd.DataFrame(rows, columns=names)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=names)
+
+
+def read_chunks(input_path, chunksize=DEFAULT_CHUNKSIZE, columns=None, dtype=None):
+    """
+    分块读取解析后的日志表，逐块产出 DataFrame；columns 为需要的列名集合（None 表示全部），文件中没有的列忽略。
+    *.parquet 按 row batch 读取（需安装 pyarrow），字典编码列直接读为 category，不再逐行解析 CSV 文本；
+    其余按 CSV 读取，dtype 指定的列按 category 读入；RawLogSource 边解析原始日志边产出数据块。
+    """
+    if isinstance(input_path, RawLogSource):
+        yield from input_path.chunks(chunksize, columns)
+        return
+    if str(input_path).lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(input_path)
+        selected = [c for c in parquet.schema_arrow.names if columns is None or c in columns]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=selected):
+            yield batch.to_pandas()
+        return
+    usecols = None if columns is None else (lambda c: c in columns)
+    yield from pd.read_csv(input_path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+
+
+def iter_log_records(input_path, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """
+    分块流式读取解析后的日志（CSV / Parquet，或 RawLogSource 原始日志），只读取检测需要的列。
+    逐条产出 (行号, record)，record 为普通 dict，可直接传给模型调用函数（row['Content'] 等）。
+    文件中缺失的提示词列（如 HDFS 无 Type/Node）以空字符串补齐。
+    内存占用只与 chunksize 相关，与输入总行数无关。
+    """
+    wanted = list(columns or PROMPT_COLUMNS + ID_COLUMNS)
+    wanted_set = set(wanted)
+    dtype = {c: "category" for c in CATEGORY_COLUMNS if c in wanted_set}
+
+    idx = 0
+    for chunk in read_chunks(input_path, chunksize, columns=wanted_set, dtype=dtype):
+        names = list(chunk.columns)
+        missing = [c for c in PROMPT_COLUMNS if c in wanted_set and c not in names]
+        for values in chunk.itertuples(index=False, name=None):
+            record = dict(zip(names, values))
+            for c in missing:
+                record[c] = ""
+            yield idx, record
+            idx += 1
@@ -0,0 +1,300 @@
+import json
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from detect_reader import read_chunks
+
+COMPACT_FORMAT = "compact-v1"
+
+
+# ==== 类型转换器 ====
+def convert_to_builtin_type(obj):
+    if isinstance(obj, (np.integer,)):
+        return int(obj)
+    elif isinstance(obj, (np.floating,)):
+        return float(obj)
+    elif isinstance(obj, (np.ndarray,)):
+        return obj.tolist()
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _to_builtin(value):
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if isinstance(value, pd.Timestamp):  # Parquet 的 EventTime 列
+        return value.isoformat()
+    if value is pd.NaT:
+        return None
+    return value
+
+
+def _to_int(value, default=None):
+    try:
+        if value is None or pd.isna(value):
+            return default
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def intern_text(value):
+    """对模板、解释等高重复文本做驻留，相同内容在内存中只保留一份"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class StringTable:
+    """导出时的字符串表：每个不同字符串只写一次，记录中以下标引用"""
+
+    def __init__(self, values=None):
+        self.values = list(values or [])
+        self._index = {v: i for i, v in enumerate(self.values)}
+
+    def ref(self, value):
+        if value is None:
+            return None
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def get(self, idx):
+        return None if idx is None else self.values[idx]
+
+
+class InlineTable:
+    """不去重的“字符串表”：字符串直接内联在记录中（单条记录独立存储/传输时使用）"""
+
+    @staticmethod
+    def ref(value):
+        return value
+
+    @staticmethod
+    def get(value):
+        return value
+
+
+@dataclass(slots=True)
+class ModelAVerdict:
+    label: int
+    score: float
+    reason: str
+
+    @classmethod
+    def from_dict(cls, result):
+        return cls(int(result["label"]), float(result["score"]), intern_text(result.get("reason", "")))
+
+    def to_dict(self):
+        return {"label": self.label, "reason": self.reason, "score": self.score}
+
+
+@dataclass(slots=True)
+class DetectionRecord:
+    """
+    单条日志的检测结果（紧凑表示）。
+    只保留行标识、EventId/模板引用和真实标签，完整日志列在导出时按需回填。
+    """
+    index: int
+    new_line_id: Optional[int] = None
+    original_line_id: Optional[int] = None
+    event_id: Optional[str] = None
+    event_template: Optional[str] = None
+    true_label: int = -1
+    status: Optional[str] = None          # "模型A失败" / "模型B失败"，正常完成为 None
+    model_a: Optional[ModelAVerdict] = None
+    score_b: Optional[float] = None
+    delta: Optional[float] = None
+    fusion_score: Optional[float] = None
+    fusion_label: str = ""
+    consensus: Optional[dict] = None
+    bypass: Optional[str] = None          # 跳过 LLM 时的判定来源（如 "student"），正常为 None
+
+    @classmethod
+    def from_row(cls, idx, row):
+        line_id = _to_int(row.get("OriginalLineId"))  # pandas 读入的空单元格为 NaN，与 None 一样回退到 LineId
+        if line_id is None:
+            line_id = _to_int(row.get("LineId"))
+        event_id = row.get("EventId")
+        return cls(
+            index=int(idx),
+            new_line_id=_to_int(row.get("NewLineId")),
+            original_line_id=line_id,
+            event_id=intern_text(str(event_id)) if event_id is not None else None,
+            event_template=intern_text(row.get("EventTemplate")),
+            true_label=_to_int(row.get("BinaryLabel"), -1),
+        )
+
+    @property
+    def is_gray_fail(self):
+        """灰日志且共识失败 → 需要进入灰日志池"""
+        return self.consensus is not None and self.consensus.get("status") == "FAIL"
+
+    def to_compact(self, templates, reasons):
+        record = {
+            "index": self.index,
+            "NewLineId": self.new_line_id,
+            "OriginalLineId": self.original_line_id,
+            "EventId": self.event_id,
+            "template": templates.ref(self.event_template),
+            "BinaryLabel": self.true_label,
+        }
+        if self.status:
+            record["status"] = self.status
+        if self.model_a is not None:
+            record["model_A"] = {"label": self.model_a.label,
+                                 "reason": reasons.ref(self.model_a.reason),
+                                 "score": self.model_a.score}
+        if self.bypass:
+            record.update({"bypass": self.bypass, "fusion_score": self.fusion_score,
+                           "fusion_label": self.fusion_label})
+        if self.score_b is not None:
+            record.update({
+                "model_B_score": self.score_b,
+                "delta": self.delta,
+                "fusion_score": self.fusion_score,
+                "fusion_label": self.fusion_label,
+                "consensus": self.consensus,
+            })
+        return record
+
+    @classmethod
+    def from_compact(cls, data, templates, reasons):
+        model_a = data.get("model_A")
+        if model_a is not None:
+            model_a = ModelAVerdict(model_a["label"], model_a["score"], intern_text(reasons.get(model_a["reason"])))
+        return cls(
+            index=data["index"],
+            new_line_id=data.get("NewLineId"),
+            original_line_id=data.get("OriginalLineId"),
+            event_id=intern_text(data.get("EventId")),
+            event_template=intern_text(templates.get(data.get("template"))),
+            true_label=data.get("BinaryLabel", -1),
+            status=data.get("status"),
+            model_a=model_a,
+            score_b=data.get("model_B_score"),
+            delta=data.get("delta"),
+            fusion_score=data.get("fusion_score"),
+            fusion_label=data.get("fusion_label", ""),
+            consensus=data.get("consensus"),
+            bypass=data.get("bypass"),
+        )
+
+    def to_legacy(self, row_dict):
+        """还原为旧版输出格式（每条记录内嵌完整日志行）"""
+        record = {"index": self.index}
+        if self.status:
+            record["status"] = self.status
+        if self.model_a is not None and self.score_b is None:
+            record["model_A"] = self.model_a.to_dict()
+        if self.bypass:
+            record.update({"bypass": self.bypass, "fusion_score": self.fusion_score,
+                           "fusion_label": self.fusion_label})
+        if self.score_b is None:
+            record["log"] = row_dict
+            return record
+        record.update({
+            "log": row_dict,
+            "model_A": self.model_a.to_dict(),
+            "model_B_score": self.score_b,
+            "delta": self.delta,
+            "fusion_score": self.fusion_score,
+            "fusion_label": self.fusion_label,
+            "consensus": self.consensus,
+        })
+        return record
+
+    @classmethod
+    def from_legacy(cls, data):
+        log = data.get("log") or data.get("log_row") or {}
+        record = cls.from_row(data["index"], log)
+        record.status = data.get("status")
+        if data.get("model_A"):
+            record.model_a = ModelAVerdict.from_dict(data["model_A"])
+        if data.get("model_B_score") is not None:
+            record.score_b = float(data["model_B_score"])
+            record.delta = data.get("delta")
+            record.fusion_score = data.get("fusion_score")
+            record.fusion_label = data.get("fusion_label") or data.get("classification", "")
+            record.consensus = data.get("consensus")
+        if data.get("bypass"):
+            record.bypass = data["bypass"]
+            record.fusion_score = data.get("fusion_score")
+            record.fusion_label = data.get("fusion_label", "")
+        return record
+
+
+# ==== 原始日志行回填 ====
+def load_rows_by_index(input_path, indexes, chunksize=100000):
+    """按行号（0 起）从输入 CSV / Parquet 中取回完整日志行，分块读取避免整表驻留内存"""
+    wanted = set(indexes)
+    rows = {}
+    if not wanted:
+        return rows
+    offset = 0
+    for chunk in read_chunks(input_path, chunksize):
+        hit = [i for i in range(offset, offset + len(chunk)) if i in wanted]
+        for i in hit:
+            row = chunk.iloc[i - offset]
+            rows[i] = {k: _to_builtin(v) for k, v in row.to_dict().items()}
+        offset += len(chunk)
+        if len(rows) == len(wanted):
+            break
+    return rows
+
+
+# ==== 结果读写 ====
+def write_results(records, output_path, input_path=None, full_log=False):
+    """
+    写出检测结果。
+    默认写紧凑格式：模板与模型A解释以字符串表去重，记录按 NewLineId/OriginalLineId 引用原始日志行；
+    full_log=True 时从 input_path 回填完整日志列，输出与旧版一致的格式。
+    """
+    if full_log:
+        rows = load_rows_by_index(input_path, (r.index for r in records))
+        payload = [r.to_legacy(rows.get(r.index, {})) for r in records]
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2, default=convert_to_builtin_type)
+        return
+
+    templates, reasons = StringTable(), StringTable()
+    compact = [r.to_compact(templates, reasons) for r in records]
+    payload = {
+        "format": COMPACT_FORMAT,
+        "source": None if input_path is None else str(input_path),
+        "templates": templates.values,
+        "reasons": reasons.values,
+        "records": compact,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"), default=convert_to_builtin_type)
+
+
+def load_results(path):
+    """读取检测结果（兼容紧凑格式与旧版完整格式）"""
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if isinstance(payload, dict) and payload.get("format") == COMPACT_FORMAT:
+        templates = StringTable(payload["templates"])
+        reasons = StringTable(payload["reasons"])
+        return [DetectionRecord.from_compact(r, templates, reasons) for r in payload["records"]]
+    return [DetectionRecord.from_legacy(r) for r in payload]
+
+
+def export_gray_pool(records, input_path, gray_pool_path):
+    """导出共识失败的灰日志（完整日志列从输入文件回填），返回实际写出的条数（输入中找不到的行不计）"""
+    gray_indexes = [r.index for r in records if r.is_gray_fail]
+    if not gray_indexes:
+        return 0
+    rows = load_rows_by_index(input_path, gray_indexes)
+    gray_rows = [rows[i] for i in gray_indexes if i in rows]
+    if len(gray_rows) < len(gray_indexes):
+        print(f"⚠️ {len(gray_indexes) - len(gray_rows)} 条灰日志在输入文件中找不到，未导出")
+    pd.DataFrame(gray_rows).to_csv(gray_pool_path, index=False)
+    return len(gray_rows)
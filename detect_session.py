@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import sys
+from collections import Counter
+from dataclasses import replace
+
+from detect_reader import DEFAULT_CHUNKSIZE, ID_COLUMNS, PROMPT_COLUMNS, iter_log_records
+from detect_records import DetectionRecord, _to_int, intern_text
+from detect_shard import in_shard, shard_key
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "解析脚本"))
+from settings import parse_settings
+
+# ==== 配置参数 ====
+BLOCK_ID_PATTERN = re.compile(r"blk_-?\d+")
+MAX_SEQUENCE_EVENTS = 60     # 事件序列摘要最多展示的事件段数
+MAX_DISTINCTIVE_LINES = 5    # 每个会话送入提示词的代表性日志行数
+SESSION_OUTPUT_PATH = "会话检测结果.json"
+
+LEVEL_SEVERITY = {"FATAL": 4, "ERROR": 3, "SEVERE": 3, "WARN": 2, "WARNING": 2, "INFO": 1}
+
+
+def _line_label(record, anomaly_labels):
+    """单行真实标签：优先 BinaryLabel，其次按 HDFS_label.py 生成的 Label 列推断"""
+    label = _to_int(record.get("BinaryLabel"))
+    if label is not None:
+        return label
+    raw = record.get("Label")
+    if raw is None:
+        return -1
+    return int(raw in anomaly_labels)
+
+
+class BlockSession:
+    """一个 HDFS 块（blk_ id）对应的全部日志行"""
+
+    __slots__ = ("block_id", "lines", "event_sequence", "samples", "components", "label")
+
+    def __init__(self, block_id):
+        self.block_id = block_id
+        self.lines = []            # (行号, NewLineId, OriginalLineId, EventId, 行标签)
+        self.event_sequence = []   # 按出现顺序的 EventId
+        self.samples = {}          # EventId → (等级, 内容)，每类事件保留首条
+        self.components = {}
+        self.label = 0
+
+    def add(self, idx, record, line_label):
+        event_id = str(record.get("EventId"))
+        self.lines.append((idx, _to_int(record.get("NewLineId")),
+                           _to_int(record.get("OriginalLineId"), _to_int(record.get("LineId"))),
+                           event_id, line_label))
+        self.event_sequence.append(event_id)
+        if event_id not in self.samples:
+            self.samples[event_id] = (str(record.get("Level", "")), str(record.get("Content", "")))
+        self.components[str(record.get("Component", ""))] = None
+        if line_label == 1:
+            self.label = 1
+
+    def sequence_summary(self):
+        """将事件序列压缩为 `E5×3 E22 E11×2 ...` 形式"""
+        parts = []
+        prev, count = None, 0
+        for event_id in self.event_sequence:
+            if event_id == prev:
+                count += 1
+                continue
+            if prev is not None:
+                parts.append(prev if count == 1 else f"{prev}×{count}")
+            prev, count = event_id, 1
+        if prev is not None:
+            parts.append(prev if count == 1 else f"{prev}×{count}")
+        if len(parts) > MAX_SEQUENCE_EVENTS:
+            parts = parts[:MAX_SEQUENCE_EVENTS] + [f"...（共 {len(parts)} 段）"]
+        return " ".join(parts)
+
+    def distinctive_lines(self, event_counts):
+        """挑选代表性日志：等级越高、事件在全局越罕见越优先"""
+        ranked = sorted(self.samples.items(),
+                        key=lambda kv: (-LEVEL_SEVERITY.get(kv[1][0].upper(), 0), event_counts[kv[0]]))
+        return [f"[{level}] {content}" for _, (level, content) in ranked[:MAX_DISTINCTIVE_LINES]]
+
+    def to_prompt_row(self, event_counts, templates):
+        levels = [level for level, _ in self.samples.values()]
+        top_level = max(levels, key=lambda lv: LEVEL_SEVERITY.get(lv.upper(), 0)) if levels else ""
+        distinct_events = list(dict.fromkeys(self.event_sequence))
+        return {
+            "EventTemplate": f"事件序列：{self.sequence_summary()}；涉及模板："
+                             + "；".join(f"{e}={templates.get(e, '')}" for e in distinct_events),
+            "Component": ", ".join(self.components),
+            "Level": top_level,
+            "Type": f"HDFS 块会话（{len(self.lines)} 行）",
+            "Node": self.block_id,
+            "Content": " | ".join(self.distinctive_lines(event_counts)),
+            "EventId": "SESSION",
+            "BinaryLabel": self.label,
+        }
+
+
+def group_block_sessions(input_path, chunksize=DEFAULT_CHUNKSIZE, log_type="HDFS"):
+    """
+    按 blk_ id 将结构化 HDFS 日志分组为块会话。
+    返回 (sessions, orphan_lines, event_counts, templates)，orphan_lines 为不含块 ID 的行。
+    """
+    anomaly_labels = set(parse_settings.get(log_type, {}).get("anomaly_labels", ["Anomaly"]))
+    sessions = {}
+    orphan_lines = []
+    event_counts = Counter()
+    templates = {}
+
+    columns = PROMPT_COLUMNS + ID_COLUMNS + ["Label"]
+    for idx, record in iter_log_records(input_path, chunksize=chunksize, columns=columns):
+        event_id = str(record.get("EventId"))
+        event_counts[event_id] += 1
+        if event_id not in templates:
+            templates[event_id] = intern_text(record.get("EventTemplate"))
+
+        line_label = _line_label(record, anomaly_labels)
+        block_ids = dict.fromkeys(BLOCK_ID_PATTERN.findall(str(record.get("Content", ""))))
+        if not block_ids:
+            orphan_lines.append((idx, record, line_label))
+            continue
+        for block_id in block_ids:
+            session = sessions.get(block_id)
+            if session is None:
+                session = sessions[block_id] = BlockSession(block_id)
+            session.add(idx, record, line_label)
+
+    return sessions, orphan_lines, event_counts, templates
+
+
+def run_session_detection(input_path, detect_fn, chunksize=DEFAULT_CHUNKSIZE, profiler=None, log_type="HDFS",
+                          shard=None):
+    """
+    块级检测：每个 blk_ 会话只做一次 模型A/B/共识 判定，再将判定结果投射回会话内的每一行。
+    一行包含多个块 ID 时以最先判定为异常的块为准。
+    分片模式下按块 ID 分片（同一块的所有行落在同一分片），无块 ID 的行按行标识分片。
+    返回 (逐行结果列表, 会话摘要列表)
+    """
+    sessions, orphan_lines, event_counts, templates = group_block_sessions(
+        input_path, chunksize=chunksize, log_type=log_type)
+    if shard is not None:
+        sessions = {b: s for b, s in sessions.items() if in_shard(b, shard)}
+        orphan_lines = [o for o in orphan_lines if in_shard(shard_key(o[0], o[1]), shard)]
+    total_lines = sum(event_counts.values())
+    print(f"🧱 共 {len(sessions)} 个块会话（覆盖 {total_lines - len(orphan_lines)}/{total_lines} 行）")
+
+    line_records = {}
+    session_summaries = []
+    for session_idx, session in enumerate(sessions.values()):
+        print(f"\n🔍 正在处理第 {session_idx + 1}/{len(sessions)} 个块会话 {session.block_id}（{len(session.lines)} 行）...")
+        prompt_row = session.to_prompt_row(event_counts, templates)
+        block_record = detect_fn(session_idx, prompt_row)
+
+        for idx, new_line_id, original_line_id, event_id, line_label in session.lines:
+            existing = line_records.get(idx)
+            if existing is not None and existing.fusion_label.startswith("黑"):
+                continue
+            line_records[idx] = replace(block_record, index=idx, new_line_id=new_line_id,
+                                        original_line_id=original_line_id, event_id=event_id,
+                                        event_template=templates.get(event_id), true_label=line_label)
+
+        session_summaries.append({
+            "block_id": session.block_id,
+            "lines": len(session.lines),
+            "true_label": session.label,
+            "event_sequence": prompt_row["EventTemplate"],
+            "status": block_record.status,
+            "fusion_label": block_record.fusion_label,
+            "model_A": block_record.model_a.to_dict() if block_record.model_a else None,
+            "model_B_score": block_record.score_b,
+            "consensus": block_record.consensus,
+        })
+        if profiler is not None:
+            profiler.checkpoint()
+
+    for idx, record, line_label in orphan_lines:
+        orphan = DetectionRecord.from_row(idx, record)
+        orphan.true_label = line_label
+        orphan.status = "无块ID"
+        line_records[idx] = orphan
+
+    return [line_records[i] for i in sorted(line_records)], session_summaries
+
+
+def save_session_summaries(session_summaries, output_path=SESSION_OUTPUT_PATH):
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(session_summaries, f, ensure_ascii=False, indent=2, default=str)
+    print(f"🧱 块会话判定结果保存至：{output_path}")
+
+
+def evaluate_sessions(session_summaries):
+    """块级精度评估（与 anomaly_label.csv 的块标签口径一致）"""
+    tp = fp = fn = tn = 0
+    for s in session_summaries:
+        label = s.get("fusion_label") or ""
+        if label.startswith("黑"):
+            if s["true_label"] == 1:
+                tp += 1
+            else:
+                fp += 1
+        elif label.startswith("白"):
+            if s["true_label"] == 0:
+                tn += 1
+            else:
+                fn += 1
+    precision = tp / (tp + fp) if (tp + fp) else 0
+    recall = tp / (tp + fn) if (tp + fn) else 0
+    print("\n📊 【块级检测结果评估】")
+    print(f"✔️ TP: {tp}  FP: {fp}  FN: {fn}  TN: {tn}")
+    print(f"🎯 精确度 Precision: {precision:.3f}  召回率 Recall: {recall:.3f}")
@@ -0,0 +1,79 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from detect_records import load_results
+
+ROW_KEY_COLUMNS = ("OriginalLineId", "LineId", "NewLineId")
+
+
+def parse_shard(spec):
+    """解析 `i/N`（i 从 0 开始），返回 (i, N)"""
+    try:
+        index, count = (int(v) for v in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N，例如 0/4：{spec}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片编号越界：{spec}（要求 0 ≤ i < N）")
+    return index, count
+
+
+def stable_hash(key):
+    """跨进程、跨机器一致的哈希（不受 PYTHONHASHSEED 影响）"""
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_key(idx, record, by="row"):
+    """
+    分片键（None 与 pandas 读入的 NaN 都视为缺失）：
+    - row: 按日志行标识（OriginalLineId/LineId/NewLineId，缺失时用行号）均匀打散；
+    - template: 按 EventId（缺失时用模板文本），同一模板落在同一分片，便于复用判定缓存。
+    """
+    if by == "template":
+        key = record.get("EventId")
+        return key if not _missing(key) else record.get("EventTemplate")
+    for column in ROW_KEY_COLUMNS:
+        value = record.get(column)
+        if not _missing(value):
+            return value
+    return idx
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and pd.isna(value))
+
+
+def in_shard(key, shard):
+    index, count = shard
+    return count == 1 or stable_hash(key) % count == index
+
+
+def filter_shard(records, shard, by="row"):
+    """从 (行号, record) 流中筛出属于当前分片的记录；shard 为 None 时原样返回"""
+    if shard is None:
+        yield from records
+        return
+    for idx, record in records:
+        if in_shard(shard_key(idx, record, by), shard):
+            yield idx, record
+
+
+def shard_path(path, shard):
+    """为分片输出文件名加后缀：检测结果.json → 检测结果.shard0of4.json"""
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard[0]}of{shard[1]}{ext}"
+
+
+def merge_shard_results(result_paths):
+    """合并各分片结果（按原始行号排序，重复行以先出现的为准）"""
+    merged = {}
+    for path in result_paths:
+        records = load_results(path)
+        print(f"📥 {path}: {len(records)} 条")
+        for record in records:
+            merged.setdefault(record.index, record)
+    return [merged[i] for i in sorted(merged)]
@@ -0,0 +1,218 @@
+import argparse
+import os
+import re
+import zlib
+from collections import Counter, deque
+
+import numpy as np
+
+from detect_records import ModelAVerdict, load_results, load_rows_by_index
+
+# ==== 配置参数 ====
+STUDENT_PATH = "学生分类器.npz"
+N_FEATURES = 1 << 18            # 哈希特征维度
+LEARNING_RATE = 0.5             # AdaGrad 初始学习率
+L2 = 1e-6
+MIN_TRAINED = 200               # 训练样本不足时不短路
+MIN_PER_CLASS = 30              # 黑/白样本各自不足时不短路（单一类别的历史准确率没有参考价值）
+TARGET_ACCURACY = 0.98          # 校准目标：置信度高于阈值的样本，预测准确率需达到该值
+MIN_SUPPORT = 100               # 校准时阈值以上至少需要的样本数
+MIN_THRESHOLD = 0.9             # 置信度阈值下限
+CALIBRATION_WINDOW = 5000       # 校准使用的最近“先预测后训练”样本数
+RECALIBRATE_EVERY = 50
+
+_TOKEN = re.compile(r"<\*>|\w+")
+_DIGITS = re.compile(r"\d+")
+
+
+def _tokens(text):
+    return [_DIGITS.sub("0", t) for t in _TOKEN.findall(str(text).lower())]
+
+
+def featurize(row):
+    """
+    哈希 n-gram 特征：模板/内容的词一元与二元组 + 等级、组件、类型。
+    返回去重后的特征下标（二值特征，取值统一归一化）。
+    """
+    keys = []
+    for prefix, field in (("T", "EventTemplate"), ("C", "Content")):
+        tokens = _tokens(row.get(field, ""))
+        keys.extend(f"{prefix}:{t}" for t in tokens)
+        keys.extend(f"{prefix}:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for prefix, field in (("L", "Level"), ("P", "Component"), ("Y", "Type")):
+        keys.append(f"{prefix}={str(row.get(field, '')).upper()}")
+    return np.unique(np.fromiter((zlib.crc32(k.encode("utf-8")) % N_FEATURES for k in keys),
+                                 dtype=np.int64, count=len(keys)))
+
+
+class StudentClassifier:
+    """
+    轻量学生分类器：哈希 n-gram 特征 + 逻辑回归（NumPy，AdaGrad 在线更新）。
+    从融合阶段直接采纳的黑/白判定增量学习；置信度阈值按“先预测后训练”（prequential）的
+    历史准确率校准，高于阈值的日志可跳过 LLM。
+    """
+
+    name = "student"
+
+    def __init__(self, path=STUDENT_PATH):
+        self.path = path
+        self.weights = np.zeros(N_FEATURES, dtype=np.float32)
+        self.grad_sq = np.zeros(N_FEATURES, dtype=np.float32)
+        self.bias = 0.0
+        self.bias_grad_sq = 0.0
+        self.n_trained = 0
+        self.class_counts = np.zeros(2, dtype=np.int64)
+        self.history = deque(maxlen=CALIBRATION_WINDOW)    # (置信度, 是否预测正确)
+        self.threshold = None
+        self.stats = Counter()
+
+    # ==== 持久化 ====
+    @classmethod
+    def load(cls, path=STUDENT_PATH):
+        student = cls(path)
+        if path and os.path.exists(path):
+            data = np.load(path)
+            if int(data["n_features"]) == N_FEATURES:
+                student.weights = data["weights"]
+                student.grad_sq = data["grad_sq"]
+                student.bias = float(data["bias"])
+                student.bias_grad_sq = float(data["bias_grad_sq"])
+                student.n_trained = int(data["n_trained"])
+                student.class_counts = data["class_counts"].astype(np.int64)
+                student.history.extend(zip(data["hist_conf"].tolist(), data["hist_correct"].tolist()))
+                student.recalibrate()
+                print(f"🎓 已加载学生分类器：{path}（训练样本 {student.n_trained}，阈值 {student.threshold}）")
+            else:
+                print(f"⚠️ {path} 特征维度与当前配置不一致，重新训练")
+        return student
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        conf, correct = (zip(*self.history) if self.history else ((), ()))
+        np.savez_compressed(
+            path, n_features=N_FEATURES, weights=self.weights, grad_sq=self.grad_sq,
+            bias=self.bias, bias_grad_sq=self.bias_grad_sq, n_trained=self.n_trained,
+            class_counts=self.class_counts,
+            hist_conf=np.asarray(conf, dtype=np.float32), hist_correct=np.asarray(correct, dtype=bool))
+
+    # ==== 模型 ====
+    def _proba(self, idx):
+        value = 1.0 / np.sqrt(max(len(idx), 1))
+        z = self.bias + float(self.weights[idx].sum()) * value
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+    def predict_proba(self, row):
+        """返回异常（label=1）概率"""
+        return self._proba(featurize(row))
+
+    def partial_fit(self, row, label):
+        """单样本在线更新；更新前的预测计入校准历史"""
+        idx = featurize(row)
+        p = self._proba(idx)
+        self.history.append((max(p, 1 - p), int(p >= 0.5) == label))
+
+        value = 1.0 / np.sqrt(max(len(idx), 1))
+        g = p - label
+        grad = g * value + L2 * self.weights[idx]
+        self.grad_sq[idx] += grad * grad
+        self.weights[idx] -= LEARNING_RATE * grad / np.sqrt(self.grad_sq[idx] + 1e-8)
+        self.bias_grad_sq += g * g
+        self.bias -= LEARNING_RATE * g / np.sqrt(self.bias_grad_sq + 1e-8)
+
+        self.n_trained += 1
+        self.class_counts[label] += 1
+        self.stats["trained"] += 1
+        if self.n_trained % RECALIBRATE_EVERY == 0:
+            self.recalibrate()
+
+    def recalibrate(self):
+        """
+        取最低的置信度阈值 t，使历史中置信度 ≥ t 的预测至少 MIN_SUPPORT 条且准确率 ≥ TARGET_ACCURACY。
+        样本不足或找不到满足条件的阈值时不短路。
+        """
+        self.threshold = None
+        if self.n_trained < MIN_TRAINED or len(self.history) < MIN_SUPPORT \
+                or self.class_counts.min() < MIN_PER_CLASS:
+            return self.threshold
+        conf = np.fromiter((c for c, _ in self.history), dtype=np.float64)
+        correct = np.fromiter((ok for _, ok in self.history), dtype=np.float64)
+        order = np.argsort(-conf, kind="stable")
+        conf, correct = conf[order], correct[order]
+        support = np.arange(1, len(conf) + 1)
+        accuracy = np.cumsum(correct) / support
+        ok = np.flatnonzero((support >= MIN_SUPPORT) & (accuracy >= TARGET_ACCURACY) & (conf >= MIN_THRESHOLD))
+        if len(ok):
+            self.threshold = float(conf[ok[-1]])
+        return self.threshold
+
+    # ==== 检测流程接口 ====
+    def lookup(self, row):
+        """置信度达到校准阈值时返回判定（ModelAVerdict），否则返回 None"""
+        self.stats["seen"] += 1
+        if self.threshold is None:
+            return None
+        p = self.predict_proba(row)
+        confidence = max(p, 1 - p)
+        if confidence < self.threshold:
+            return None
+        self.stats["bypassed"] += 1
+        label = int(p >= 0.5)
+        return ModelAVerdict(label, round(confidence, 3), f"学生分类器判定（置信度 {confidence:.3f}）")
+
+    def observe(self, row, record):
+        """融合阶段直接采纳（非灰）的黑/白判定作为训练样本"""
+        if record.bypass is None and record.consensus is None and record.model_a is not None \
+                and record.fusion_label in ("黑日志", "白日志"):
+            self.partial_fit(row, record.model_a.label)
+
+    def score_bypass(self, record):
+        """用真实标签（如有）统计短路判定的准确率"""
+        if record.true_label in (0, 1):
+            self.stats["bypass_labeled"] += 1
+            self.stats["bypass_correct"] += int(record.model_a.label == record.true_label)
+
+    def print_stats(self):
+        seen = self.stats["seen"]
+        bypassed = self.stats["bypassed"]
+        labeled = self.stats["bypass_labeled"]
+        print("\n🎓 【学生分类器】")
+        print(f"✔️ 短路率：{bypassed}/{seen}（{bypassed / seen if seen else 0:.1%}）"
+              f" | 阈值 {self.threshold if self.threshold is not None else '未校准'}"
+              f" | 本次新增训练样本 {self.stats['trained']}（累计 {self.n_trained}）")
+        if labeled:
+            print(f"✔️ 短路准确率：{self.stats['bypass_correct'] / labeled:.3f}（有真实标签 {labeled} 条）")
+
+
+def warm_start(student, result_paths, input_path):
+    """用历史检测结果中融合阶段直接采纳的判定预训练"""
+    for path in result_paths:
+        records = [r for r in load_results(path) if r.model_a is not None and r.consensus is None
+                   and r.bypass is None and r.fusion_label in ("黑日志", "白日志")]
+        rows = load_rows_by_index(input_path, (r.index for r in records))
+        for r in records:
+            if r.index in rows:
+                student.partial_fit(rows[r.index], r.model_a.label)
+        print(f"📥 {path}: {len(records)} 条已采纳判定")
+    student.recalibrate()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="用历史检测结果预训练学生分类器")
+    parser.add_argument("results", nargs="+", help="检测结果 JSON（紧凑或旧版格式）")
+    parser.add_argument("--input", default="解析后的数据集.csv", help="检测结果对应的解析后日志 CSV")
+    parser.add_argument("--student", default=STUDENT_PATH, help="学生分类器模型文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    student = StudentClassifier.load(args.student)
+    warm_start(student, args.results, args.input)
+    student.save()
+    print(f"✅ 学生分类器已保存：{args.student}（训练样本 {student.n_trained}，阈值 {student.threshold}）")
+
+
+if __name__ == "__main__":
+    main()
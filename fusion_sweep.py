@@ -0,0 +1,124 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from detect_records import load_results
+from model2_3_fusion import fuse_scores
+
+# ==== 配置参数 ====
+OUTPUT_PATH = "阈值扫描结果.csv"
+ALPHA_GRID = np.round(np.arange(0.05, 1.0001, 0.05), 2)   # 一致性阈值 Δ 候选
+BETA_GRID = np.round(np.arange(0.30, 0.9501, 0.05), 2)    # 接受可信度阈值 G 候选
+CALLS_PER_LOG = 2               # 每条日志固定的 模型A + 模型B 调用
+MAX_CONSENSUS_CALLS = 9         # 共识最多 3 轮 × 3 个智能体
+
+
+def collect_scores(result_paths):
+    """从历史检测结果中收集 模型A标签/分数、模型B分数、真实标签 以及共识实际调用次数"""
+    label_a, score_a, score_b, truth = [], [], [], []
+    consensus_calls = []
+    for path in result_paths:
+        for r in load_results(path):
+            if r.model_a is None or r.score_b is None:
+                continue
+            label_a.append(r.model_a.label)
+            score_a.append(r.model_a.score)
+            score_b.append(r.score_b)
+            truth.append(r.true_label)
+            detail = (r.consensus or {}).get("detail") or {}
+            if detail.get("round"):
+                consensus_calls.append(int(detail["round"]) * 3)
+    return (np.asarray(label_a, dtype=np.int8), np.asarray(score_a, dtype=np.float64),
+            np.asarray(score_b, dtype=np.float64), np.asarray(truth, dtype=np.int8),
+            consensus_calls)
+
+
+def sweep_thresholds(label_a, score_a, score_b, truth, alphas=ALPHA_GRID, betas=BETA_GRID,
+                     calls_per_gray=MAX_CONSENSUS_CALLS):
+    """
+    对 (ALPHA, BETA) 网格做向量化扫描，不产生任何新的 API 调用。
+    对每个阈值组合统计：灰日志率、已采纳样本的精确度/召回率/准确率，以及预计 LLM 调用次数。
+    """
+    n = len(score_a)
+    pred_pos = label_a == 1
+    true_pos = truth == 1
+    true_neg = truth == 0
+
+    rows = []
+    beta_col = np.asarray(betas)[:, None]
+    for alpha in alphas:
+        accept = fuse_scores(label_a, score_a, score_b, alpha=alpha, beta=beta_col)["accept"]  # (B, n)
+        accepted = accept.sum(axis=1)
+        tp = (accept & (pred_pos & true_pos)).sum(axis=1)
+        fp = (accept & (pred_pos & true_neg)).sum(axis=1)
+        fn = (accept & (~pred_pos & true_pos)).sum(axis=1)
+        tn = (accept & (~pred_pos & true_neg)).sum(axis=1)
+        gray = n - accepted
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            accuracy = np.where(tp + fp + fn + tn > 0, (tp + tn) / (tp + fp + fn + tn), 0.0)
+
+        for j, beta in enumerate(betas):
+            rows.append({
+                "alpha": float(alpha),
+                "beta": float(beta),
+                "gray_rate": gray[j] / n if n else 0.0,
+                "accepted": int(accepted[j]),
+                "precision": float(precision[j]),
+                "recall": float(recall[j]),
+                "accuracy": float(accuracy[j]),
+                "projected_llm_calls": int(n * CALLS_PER_LOG + gray[j] * calls_per_gray),
+            })
+    return pd.DataFrame(rows)
+
+
+def recommend(sweep, min_precision=0.0, min_recall=0.0):
+    """在精确度/召回率约束下选出预计 LLM 调用最少的阈值组合"""
+    feasible = sweep[(sweep["precision"] >= min_precision) & (sweep["recall"] >= min_recall)]
+    if feasible.empty:
+        return None
+    return feasible.sort_values(["projected_llm_calls", "precision"], ascending=[True, False]).iloc[0]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="基于历史分数的 ALPHA/BETA 阈值离线扫描")
+    parser.add_argument("results", nargs="+", help="历史检测结果 JSON（紧凑或完整格式）")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="扫描结果 CSV")
+    parser.add_argument("--min-precision", type=float, default=0.0)
+    parser.add_argument("--min-recall", type=float, default=0.0)
+    parser.add_argument("--calls-per-gray", type=float, default=None,
+                        help="每条灰日志的共识调用数，默认取历史均值（无记录时按上限 9）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    label_a, score_a, score_b, truth, consensus_calls = collect_scores(args.results)
+    if len(score_a) == 0:
+        print("❌ 结果文件中没有可用的 模型A/B 分数")
+        return
+
+    calls_per_gray = args.calls_per_gray
+    if calls_per_gray is None:
+        calls_per_gray = float(np.mean(consensus_calls)) if consensus_calls else MAX_CONSENSUS_CALLS
+    print(f"📥 载入 {len(score_a)} 条历史分数，灰日志平均共识调用 {calls_per_gray:.2f} 次")
+
+    sweep = sweep_thresholds(label_a, score_a, score_b, truth, calls_per_gray=calls_per_gray)
+    sweep.to_csv(args.output, index=False)
+    print(f"✅ 共扫描 {len(sweep)} 组阈值，结果保存至：{args.output}")
+
+    best = recommend(sweep, args.min_precision, args.min_recall)
+    if best is None:
+        print("⚠️ 没有满足精度约束的阈值组合")
+        return
+    print("\n🎯 【推荐阈值】")
+    print(f"ALPHA={best['alpha']:.2f}  BETA={best['beta']:.2f}")
+    print(f"灰日志率 {best['gray_rate']:.1%} | 精确度 {best['precision']:.3f} | 召回率 {best['recall']:.3f} "
+          f"| 预计调用 {int(best['projected_llm_calls'])} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import contextvars
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import openai
+
+# ==== 对冲请求（hedging）参数 ====
+HEDGE_QUANTILE = 0.95       # 主请求耗时超过该端点此分位数后，向备用端点发出相同请求
+HEDGE_MIN_SAMPLES = 20      # 样本不足时使用默认等待时间
+HEDGE_DEFAULT_DELAY = 5.0   # 默认等待时间（秒）
+HEDGE_WINDOW = 200          # 每个端点保留的最近延迟样本数
+HEDGE_MAX_WORKERS = 16      # 被放弃的请求会占用线程直到自身超时，线程池需留有余量
+
+# 每次 LLM 调用结束后通知的监听器（预算控制、用量统计等）
+_listeners = []
+_listener_lock = threading.Lock()
+# 调用上下文标签（run_id / event_id / round 等），随调用事件一起上报
+_call_context = contextvars.ContextVar("llm_call_context", default={})
+
+
+@contextmanager
+def call_context(**tags):
+    """在 with 块内发起的所有调用都会带上这些标签，可嵌套叠加"""
+    token = _call_context.set({**_call_context.get(), **tags})
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def add_call_listener(listener):
+    """注册调用监听器：listener(event)，event 为 dict（stage/endpoint/model/tokens/latency/ok/tags）"""
+    _listeners.append(listener)
+
+
+def remove_call_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _get_field(obj, key, default=None):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def extract_usage(response):
+    """读取 response.usage 中的 token 用量（兼容 dict 与对象两种返回）"""
+    usage = _get_field(response, "usage")
+    prompt_tokens = int(_get_field(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(_get_field(usage, "completion_tokens", 0) or 0)
+    return prompt_tokens, completion_tokens
+
+
+def response_text(response, index=0):
+    """取出第 index 个候选回答的文本"""
+    return response.choices[index].message["content"].strip()
+
+
+class LatencyTracker:
+    """按端点记录最近的成功调用延迟，用于计算对冲等待时间"""
+
+    def __init__(self, window=HEDGE_WINDOW):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency):
+        with self._lock:
+            self._samples[endpoint].append(latency)
+
+    def quantile(self, endpoint, q=HEDGE_QUANTILE):
+        with self._lock:
+            samples = sorted(self._samples[endpoint])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def hedge_delay(self, endpoint):
+        delay = self.quantile(endpoint)
+        return HEDGE_DEFAULT_DELAY if delay is None else delay
+
+
+_latency = LatencyTracker()
+_hedge_stats = defaultdict(Counter)
+_hedge_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+    return _executor
+
+
+def _count(stage, key):
+    with _hedge_lock:
+        _hedge_stats[stage][key] += 1
+
+
+def hedge_stats():
+    """
+    各阶段对冲统计：calls 为启用对冲的调用数，hedged 为实际发出备用请求的次数，
+    primary_wins / backup_wins 为最终采用主/备结果的次数。
+    """
+    with _hedge_lock:
+        stats = {stage: dict(counter) for stage, counter in _hedge_stats.items()}
+    for s in stats.values():
+        calls = s.get("calls", 0)
+        hedged = s.get("hedged", 0)
+        s["hedge_rate"] = hedged / calls if calls else 0.0
+        s["backup_win_rate"] = s.get("backup_wins", 0) / hedged if hedged else 0.0
+    return stats
+
+
+def print_hedge_stats():
+    stats = hedge_stats()
+    if not stats:
+        return
+    print("\n🏁 【对冲请求统计】")
+    for stage, s in sorted(stats.items()):
+        print(f"  {stage}: 调用 {s.get('calls', 0)} | 对冲 {s.get('hedged', 0)}（{s['hedge_rate']:.1%}）"
+              f" | 主请求胜 {s.get('primary_wins', 0)} | 备用胜 {s.get('backup_wins', 0)}"
+              f" | 均失败 {s.get('failed', 0)}")
+
+
+def _emit(event):
+    with _listener_lock:
+        for listener in list(_listeners):
+            listener(event)
+
+
+def _timed_call(stage, kwargs, hedge_role=None):
+    endpoint = kwargs.get("api_base") or openai.api_base
+    start = time.perf_counter()
+    response = None
+    try:
+        response = openai.ChatCompletion.create(**kwargs)
+        return response
+    finally:
+        latency = time.perf_counter() - start
+        if response is not None:
+            _latency.record(endpoint, latency)
+        prompt_tokens, completion_tokens = extract_usage(response)
+        _emit({
+            "stage": stage,
+            "endpoint": endpoint,
+            "model": kwargs.get("model"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": latency,
+            "ok": response is not None,
+            "hedge": hedge_role,
+            "tags": _call_context.get(),
+        })
+
+
+def _is_valid(response, validate):
+    if validate is None:
+        return True
+    try:
+        return validate(response) is not False
+    except Exception:
+        return False
+
+
+def _hedged_call(stage, backup, validate, kwargs):
+    """
+    主请求超过端点 p95 延迟仍未返回时，向备用端点发出相同请求，采用先到的合法结果。
+    openai 0.28 的同步请求无法中途中断：落败的请求在后台线程中跑完（或超时）后丢弃，
+    其 token 用量仍会上报给监听器。
+    """
+    # 显式固定端点与 key，避免后台线程读取到被其它模型改写的全局 openai 配置
+    primary_kwargs = {**kwargs, "api_base": kwargs.get("api_base") or openai.api_base,
+                      "api_key": kwargs.get("api_key") or openai.api_key}
+    backup_kwargs = {**primary_kwargs, **backup}
+    delay = _latency.hedge_delay(primary_kwargs["api_base"])
+    executor = _get_executor()
+    _count(stage, "calls")
+
+    def submit(call_kwargs, role):
+        ctx = contextvars.copy_context()
+        return executor.submit(ctx.run, _timed_call, stage, call_kwargs, role)
+
+    roles = {submit(primary_kwargs, "primary"): "primary"}
+    done, pending = wait(list(roles), timeout=delay)
+    if not done:
+        roles[submit(backup_kwargs, "backup")] = "backup"
+        _count(stage, "hedged")
+        pending = set(roles)
+
+    last_error = None
+    while True:
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if _is_valid(response, validate):
+                for other in pending:
+                    other.cancel()
+                _count(stage, f"{roles[future]}_wins")
+                return response
+            last_error = ValueError(f"{roles[future]} 返回内容不合法")
+        # 主请求在等待期内已失败（或不合法）时立即改走备用端点
+        if not pending and len(roles) == 1:
+            roles[submit(backup_kwargs, "backup")] = "backup"
+            _count(stage, "hedged")
+            pending = set(roles) - set(done)
+        if not pending:
+            _count(stage, "failed")
+            raise last_error
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+def chat_completion(stage, hedge=None, validate=None, **kwargs):
+    """
+    所有模型调用的统一入口，参数与 openai.ChatCompletion.create 一致。
+    stage 标识调用所属阶段（model_A / model_B / agent_A ...），供预算与用量统计使用。
+    hedge 为备用端点配置（如 {"api_base": ..., "api_key": ..., "model": ...}），给出时启用对冲请求；
+    validate(response) 抛出异常或返回 False 表示结果不合法，对冲时会等待另一端点的结果。
+    """
+    if hedge:
+        return _hedged_call(stage, hedge, validate, kwargs)
+    return _timed_call(stage, kwargs)
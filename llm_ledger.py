@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from llm_client import add_call_listener, remove_call_listener
+
+# ==== 配置参数 ====
+LEDGER_PATH = "LLM调用账本.jsonl"
+REPORT_FIELDS = ["stage", "round", "endpoint", "model", "event_id", "run_id", "hedge"]
+
+
+def new_run_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+class TokenLedger:
+    """
+    只追加的 LLM 调用账本：每次调用写一行 JSON，
+    记录阶段、端点、模型、EventId、轮次、prompt/completion token 与耗时。
+    """
+
+    def __init__(self, path=LEDGER_PATH, run_id=None):
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        self._file = None
+
+    def _on_call(self, event):
+        tags = event.get("tags") or {}
+        entry = {
+            "ts": round(time.time(), 3),
+            "run_id": tags.get("run_id", self.run_id),
+            "stage": event["stage"],
+            "round": tags.get("round"),
+            "endpoint": event["endpoint"],
+            "model": event["model"],
+            "event_id": tags.get("event_id"),
+            "log_index": tags.get("log_index"),
+            "prompt_tokens": event["prompt_tokens"],
+            "completion_tokens": event["completion_tokens"],
+            "latency_ms": round(event["latency"] * 1000, 1),
+            "ok": event["ok"],
+            "hedge": event.get("hedge"),
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def __enter__(self):
+        if self.path:
+            self._file = open(self.path, "a", encoding="utf-8")
+            add_call_listener(self._on_call)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            remove_call_listener(self._on_call)
+            self._file.close()
+            self._file = None
+        return False
+
+
+def _group_label(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return "-"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def load_ledger(path=LEDGER_PATH):
+    return pd.read_json(path, lines=True)
+
+
+def aggregate_ledger(ledger, by=("stage",)):
+    """按指定维度汇总调用次数、成功率、token 用量与延迟"""
+    by = list(by)
+    ledger = ledger.copy()
+    if "hedge" in by and "hedge" not in ledger:
+        ledger["hedge"] = None  # 旧账本没有 hedge 字段
+    for col in by:
+        ledger[col] = ledger[col].map(_group_label)
+    ledger["total_tokens"] = ledger["prompt_tokens"] + ledger["completion_tokens"]
+    report = ledger.groupby(by).agg(
+        calls=("ok", "size"),
+        ok_rate=("ok", "mean"),
+        prompt_tokens=("prompt_tokens", "sum"),
+        completion_tokens=("completion_tokens", "sum"),
+        total_tokens=("total_tokens", "sum"),
+        mean_latency_ms=("latency_ms", "mean"),
+        p95_latency_ms=("latency_ms", lambda s: s.quantile(0.95)),
+    )
+    report["token_share"] = report["total_tokens"] / max(int(ledger["total_tokens"].sum()), 1)
+    return report.sort_values("total_tokens", ascending=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LLM 调用账本汇总报告")
+    parser.add_argument("ledger", nargs="?", default=LEDGER_PATH, help="账本 JSONL 文件")
+    parser.add_argument("--by", nargs="+", default=["stage"], choices=REPORT_FIELDS,
+                        help="汇总维度，可组合，如 --by run_id stage round")
+    parser.add_argument("--run-id", default=None, help="只统计指定运行")
+    parser.add_argument("--top", type=int, default=50, help="最多显示的行数")
+    parser.add_argument("--output", default=None, help="汇总结果另存为 CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ledger = load_ledger(args.ledger)
+    if args.run_id:
+        ledger = ledger[ledger["run_id"] == args.run_id]
+    if ledger.empty:
+        print("⚠️ 账本中没有匹配的调用记录")
+        return
+
+    report = aggregate_ledger(ledger, args.by)
+    print(f"\n📒 【LLM 调用账本】共 {len(ledger)} 次调用，"
+          f"token 合计 {int((ledger['prompt_tokens'] + ledger['completion_tokens']).sum())}")
+    with pd.option_context("display.max_rows", args.top, "display.max_columns", None, "display.width", 200,
+                           "display.float_format", "{:.3f}".format):
+        print(report.head(args.top))
+    if args.output:
+        report.to_csv(args.output)
+        print(f"✅ 汇总结果保存至：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,64 @@
-import pandas as pd
-import numpy as np
-import json
+import argparse
 import time
+from functools import partial
 
 from model2_1_CS_A import get_model_A_result
 from model2_2_CT_B import get_model_B_score
+from model2_3_fusion import CLASS_BLACK, CLASS_WHITE, fuse_single
 from model3_consensus_core import consensus_inference
+from detect_budget import (CRITICAL_COMPONENTS, PENDING_PATH, RunBudget,
+                           run_budgeted_detection)
+from detect_queue import LEASE_SECONDS, LEASE_SIZE, WorkQueue, run_queue_worker
+from detect_reader import DEFAULT_CHUNKSIZE, RawLogSource, iter_log_records
+from detect_shard import filter_shard, merge_shard_results, parse_shard, shard_path
+from detect_neighbors import INDEX_BACKENDS, NEIGHBOR_DIR, NeighborVerdicts
+from detect_student import STUDENT_PATH, StudentClassifier
+from detect_session import (SESSION_OUTPUT_PATH, run_session_detection,
+                            save_session_summaries, evaluate_sessions)
+from detect_records import (DetectionRecord, ModelAVerdict, intern_text,
+                            write_results, export_gray_pool)
+from llm_client import call_context, print_hedge_stats
+from llm_ledger import LEDGER_PATH, TokenLedger
+from profile_utils import add_profile_arguments, session_from_args
 
 # ==== 配置参数 ====
 INPUT_PATH = "解析后的数据集.csv"
 OUTPUT_PATH = "检测结果.json"
 GRAY_POOL_PATH = "灰日志池数据.csv"
+MAX_RETRY = 3  # 融合阈值 ALPHA/BETA 统一定义在 model2_3_fusion
 
-ALPHA = 0.3  # 一致性阈值 Δ
-BETA = 0.7   # 接受可信度阈值 G
-MAX_RETRY = 3
-
-# ==== 类型转换器 ====
-def convert_to_builtin_type(obj):
-    if isinstance(obj, (np.integer,)):
-        return int(obj)
-    elif isinstance(obj, (np.floating,)):
-        return float(obj)
-    elif isinstance(obj, (np.ndarray,)):
-        return obj.tolist()
-    else:
-        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+# ==== 单条日志检测 ====
+def detect_log(idx, row, shortcuts=()):
+    """
+    对单条日志执行 模型A → 模型B → 融合 → （灰日志）共识 的完整流程。
+    shortcuts: 可跳过 LLM 的判定来源（如学生分类器），依次尝试 lookup(row)，命中即直接采用；
+    完整流程的结果再通过 observe(row, record) 反馈给它们。
+    返回紧凑的 DetectionRecord（仅引用日志行，不复制整行数据）
+    """
+    record = DetectionRecord.from_row(idx, row)
+    for shortcut in shortcuts:
+        verdict = shortcut.lookup(row)
+        if verdict is not None:
+            return _apply_shortcut(record, shortcut, verdict)
+
+    with call_context(event_id=record.event_id, log_index=record.index):
+        record = _detect_log(record, row)
+    for shortcut in shortcuts:
+        shortcut.observe(row, record)
+    return record
 
-# ==== 加载数据 ====
-df = pd.read_csv(INPUT_PATH)
-results = []
-gray_logs = []
 
-# ==== 主循环处理 ====
-for idx, row in df.iterrows():
-    print(f"\n🔍 正在处理第 {idx + 1}/{len(df)} 条日志...")
+def _apply_shortcut(record, shortcut, verdict):
+    record.model_a = verdict
+    record.bypass = shortcut.name
+    record.fusion_score = verdict.score
+    record.fusion_label = "黑日志" if verdict.label == 1 else "白日志"
+    shortcut.score_bypass(record)
+    print(f"⚡ {shortcut.name} 短路判定：{record.fusion_label}（{verdict.reason}）")
+    return record
 
-    row_dict = {k: (v.item() if isinstance(v, (np.integer, np.floating)) else v) for k, v in row.to_dict().items()}
+
+def _detect_log(record, row):
 
     # === 模型 A 推理 ===
     result_a = None
@@ -48,8 +70,9 @@ for idx, row in df.iterrows():
 
     if not result_a:
         print("❌ 模型A连续失败，跳过")
-        results.append({"index": idx, "status": "模型A失败", "log": row_dict})
-        continue
+        record.status = "模型A失败"
+        return record
+    record.model_a = ModelAVerdict.from_dict(result_a)
 
     # === 模型 B 推理 ===
     result_b = None
@@ -61,25 +84,21 @@ for idx, row in df.iterrows():
 
     if result_b is None:
         print("❌ 模型B连续失败，跳过")
-        results.append({
-            "index": idx,
-            "status": "模型B失败",
-            "model_A": result_a,
-            "log": row_dict
-        })
-        continue
+        record.status = "模型B失败"
+        return record
 
     # === 分数与融合 ===
     score_a = float(result_a["score"])
     score_b = float(result_b["score"]) if isinstance(result_b, dict) else float(result_b)
-    delta = abs(score_a - score_b)
-    fusion_score = (score_a + score_b) / 2
-    label_a = result_a["label"]
-    is_gray = (delta >= ALPHA) or (fusion_score <= BETA)
+    fused = fuse_single(result_a["label"], score_a, score_b)
+    delta = fused["delta"]
+    fusion_score = fused["fusion_score"]
 
     fusion_label = "灰日志"
-    if not is_gray:
-        fusion_label = "黑日志" if label_a == 1 else "白日志"
+    if fused["fusion_class"] == CLASS_BLACK:
+        fusion_label = "黑日志"
+    elif fused["fusion_class"] == CLASS_WHITE:
+        fusion_label = "白日志"
 
     print(f"✅ 融合器判定：{fusion_label}（Δ={delta:.2f}, G={fusion_score:.2f}）")
 
@@ -93,62 +112,222 @@ for idx, row in df.iterrows():
             "detail": detail
         }
 
-        if flag == "FAIL":
-            gray_logs.append(row_dict)
-        else:
+        if flag != "FAIL":
             fusion_label += f"（共识修正为 {label_final}）"
 
     # === 汇总结果 ===
-    results.append({
-        "index": idx,
-        "log": row_dict,
-        "model_A": result_a,
-        "model_B_score": round(score_b, 3),
-        "delta": round(delta, 3),
-        "fusion_score": round(fusion_score, 3),
-        "fusion_label": fusion_label,
-        "consensus": consensus_info
-    })
-
-# ==== 保存结果 JSON ====
-with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(results, f, ensure_ascii=False, indent=2, default=convert_to_builtin_type)
-print(f"\n✅ 检测完成，结果保存至：{OUTPUT_PATH}")
-
-# ==== 灰日志导出 ====
-if gray_logs:
-    pd.DataFrame(gray_logs).to_csv(GRAY_POOL_PATH, index=False)
-    print(f"🟨 共导出灰日志 {len(gray_logs)} 条 → {GRAY_POOL_PATH}")
-else:
-    print("🎉 所有灰日志已成功共识，无需导出灰日志池")
+    record.score_b = round(score_b, 3)
+    record.delta = round(delta, 3)
+    record.fusion_score = round(fusion_score, 3)
+    record.fusion_label = intern_text(fusion_label)
+    record.consensus = consensus_info
+    return record
+
+
+# ==== 结果导出 ====
+def save_outputs(records, input_path=INPUT_PATH, output_path=OUTPUT_PATH,
+                 gray_pool_path=GRAY_POOL_PATH, full_log=False):
+    write_results(records, output_path, input_path=input_path, full_log=full_log)
+    print(f"\n✅ 检测完成，结果保存至：{output_path}")
+
+    gray_count = export_gray_pool(records, input_path, gray_pool_path)
+    if gray_count:
+        print(f"🟨 共导出灰日志 {gray_count} 条 → {gray_pool_path}")
+    else:
+        print("🎉 所有灰日志已成功共识，无需导出灰日志池")
+
 
 # ==== 精度评估 ====
-tp = fp = fn = tn = 0
-for r in results:
-    log = r.get("log", {})
-    true = int(log.get("BinaryLabel", -1))
-    pred = r["model_A"]["label"]
-
-    if r.get("fusion_label", "").startswith("黑"):
-        if true == 1:
-            tp += 1
-        else:
-            fp += 1
-    elif r.get("fusion_label", "").startswith("白"):
-        if true == 0:
-            tn += 1
+def evaluate_results(records):
+    tp = fp = fn = tn = 0
+    for r in records:
+        true = r.true_label
+
+        if r.fusion_label.startswith("黑"):
+            if true == 1:
+                tp += 1
+            else:
+                fp += 1
+        elif r.fusion_label.startswith("白"):
+            if true == 0:
+                tn += 1
+            else:
+                fn += 1
+
+    precision = tp / (tp + fp) if (tp + fp) else 0
+    recall    = tp / (tp + fn) if (tp + fn) else 0
+    f1_score  = 2 * precision * recall / (precision + recall) if (precision + recall) else 0
+
+    print("\n📊 【检测结果评估】")
+    print(f"✔️ TP（真阳性）: {tp}")
+    print(f"✔️ FP（假阳性）: {fp}")
+    print(f"✔️ FN（漏报）  : {fn}")
+    print(f"✔️ TN（真阴性）: {tn}")
+    print(f"\n🎯 精确度 Precision: {precision:.3f}")
+    print(f"🎯 召回率 Recall   : {recall:.3f}")
+    print(f"🎯 F1 分数 F1-score: {f1_score:.3f}")
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "precision": precision, "recall": recall, "f1": f1_score}
+
+
+# ==== 主流程 ====
+def run_detection(input_path=INPUT_PATH, profiler=None, chunksize=DEFAULT_CHUNKSIZE, shard=None, shard_by="row",
+                  detect_fn=detect_log):
+    records = []
+
+    for idx, row in filter_shard(iter_log_records(input_path, chunksize=chunksize), shard, shard_by):
+        print(f"\n🔍 正在处理第 {idx + 1} 条日志...")
+        records.append(detect_fn(idx, row))
+        if profiler is not None:
+            profiler.checkpoint()
+
+    return records
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="多智能体日志异常检测主流程")
+    parser.add_argument("--input", default=INPUT_PATH, help="解析后的日志 CSV")
+    parser.add_argument("--raw-log", default=None, metavar="LOG",
+                        help="直接检测原始日志：边解析边检测，不生成中间 CSV（与 --log-type 配合，替代 --input）")
+    parser.add_argument("--log-type", default="BGL", help="--raw-log 使用的 parse_settings 数据集类型")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="检测结果 JSON")
+    parser.add_argument("--gray-pool", default=GRAY_POOL_PATH, help="灰日志池 CSV")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="输入分块读取的行数")
+    parser.add_argument("--session", choices=["line", "block"], default="line",
+                        help="line: 逐行判定；block: 按 HDFS blk_ 块会话判定并投射回各行")
+    parser.add_argument("--session-output", default=SESSION_OUTPUT_PATH, help="块会话判定结果 JSON")
+    parser.add_argument("--max-calls", type=int, default=None, help="预算：最大 LLM 调用次数")
+    parser.add_argument("--max-tokens", type=int, default=None, help="预算：最大 token 用量")
+    parser.add_argument("--max-seconds", type=float, default=None, help="预算：最长运行时间（秒）")
+    parser.add_argument("--critical-components", nargs="*", default=sorted(CRITICAL_COMPONENTS),
+                        help="预算模式下优先处理的关键组件")
+    parser.add_argument("--pending-output", default=PENDING_PATH, help="预算耗尽时未处理日志 CSV")
+    parser.add_argument("--shard", default=None, metavar="i/N",
+                        help="只处理第 i 个分片（共 N 片，i 从 0 开始），输出文件自动加分片后缀")
+    parser.add_argument("--shard-by", choices=["row", "template"], default="row",
+                        help="分片键：row 按日志行均匀打散；template 按 EventId，同模板同分片")
+    parser.add_argument("--merge", nargs="+", default=None, metavar="RESULT",
+                        help="合并各分片结果文件，生成总结果、灰日志池与评估")
+    parser.add_argument("--queue", default=None, metavar="DB",
+                        help="SQLite 任务队列：多个 worker 进程共享同一检测任务，崩溃后可续跑")
+    parser.add_argument("--enqueue", action="store_true", help="将 --input 的日志写入队列后退出")
+    parser.add_argument("--queue-export", action="store_true",
+                        help="从队列导出已完成的结果（检测结果、灰日志池与评估）后退出")
+    parser.add_argument("--lease-size", type=int, default=LEASE_SIZE, help="worker 每次领取的行数")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS,
+                        help="租约时长（秒），超时未确认的行会被其它 worker 重新领取")
+    parser.add_argument("--worker-id", default=None, help="worker 标识，默认 主机名-进程号")
+    parser.add_argument("--student", nargs="?", const=STUDENT_PATH, default=None, metavar="NPZ",
+                        help="启用学生分类器：高置信日志跳过 LLM，并从融合阶段采纳的判定增量学习")
+    parser.add_argument("--neighbors", nargs="?", const=NEIGHBOR_DIR, default=None, metavar="DIR",
+                        help="启用近邻判定复用：与历史高置信判定内容足够相似的日志直接复用其判定")
+    parser.add_argument("--neighbor-backend", choices=sorted(INDEX_BACKENDS), default="brute",
+                        help="近邻检索后端：brute 为 NumPy 暴力检索（内存映射）；faiss 需另行安装")
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="LLM 调用账本 JSONL（传空字符串关闭）")
+    parser.add_argument("--full-log", action="store_true",
+                        help="导出时回填完整日志列（旧版输出格式），默认输出紧凑格式")
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def load_shortcuts(args):
+    shortcuts = []
+    if args.neighbors:
+        shortcuts.append(NeighborVerdicts.load(args.neighbors, args.neighbor_backend))
+    if args.student:
+        shortcuts.append(StudentClassifier.load(args.student))
+    return shortcuts
+
+
+def finish_shortcuts(shortcuts, save=True):
+    for shortcut in shortcuts:
+        if save:
+            shortcut.save()
+        shortcut.print_stats()
+
+
+def run_queue_mode(args):
+    with WorkQueue(args.queue) as queue:
+        if args.enqueue:
+            added = queue.enqueue(args.input, chunksize=args.chunksize)
+            print(f"📥 新入队 {added} 条 → {args.queue}；队列状态：{queue.counts()}")
+            return
+        if args.queue_export:
+            records = list(queue.results())
+            counts = queue.counts()
+            if counts.get("pending") or counts.get("leased"):
+                print(f"⚠️ 队列尚未处理完：{counts}，仅导出已完成的 {len(records)} 条")
+            input_path = queue.input_path() or args.input
+            save_outputs(records, input_path, args.output, args.gray_pool, full_log=args.full_log)
+            evaluate_results(records)
+            return
+        # 多个 worker 共用同一模型文件 / 索引目录，各自保存会互相覆盖；队列模式下只读使用，
+        # 需要沉淀本次判定时在 --queue-export 之后用导出的结果预热学生分类器
+        shortcuts = load_shortcuts(args)
+        if shortcuts:
+            print("ℹ️ 队列模式下学生分类器 / 近邻索引只读使用，本 worker 的增量不会保存")
+        budget = RunBudget(args.max_calls, args.max_tokens, args.max_seconds)
+        with TokenLedger(args.ledger) as ledger, call_context(run_id=ledger.run_id), \
+                session_from_args(args) as profiler, budget:
+            run_queue_worker(queue, partial(detect_log, shortcuts=shortcuts), worker_id=args.worker_id,
+                             lease_size=args.lease_size, lease_seconds=args.lease_seconds, profiler=profiler,
+                             budget=budget)
+        finish_shortcuts(shortcuts, save=False)
+        print_hedge_stats()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.raw_log and (args.queue or args.merge):
+        raise SystemExit("--raw-log 不支持队列与分片合并模式，请先用 解析脚本/logParser_main.py 生成结构化文件")
+    input_path = RawLogSource(args.raw_log, args.log_type) if args.raw_log else args.input
+    if args.queue:
+        run_queue_mode(args)
+        return
+    if args.merge:
+        records = merge_shard_results(args.merge)
+        save_outputs(records, input_path, args.output, args.gray_pool, full_log=args.full_log)
+        evaluate_results(records)
+        return
+
+    shard = parse_shard(args.shard) if args.shard else None
+    output_path = shard_path(args.output, shard)
+    gray_pool_path = shard_path(args.gray_pool, shard)
+    if shard is not None:
+        print(f"🧩 分片模式：第 {shard[0]}/{shard[1]} 片（按 {args.shard_by}）→ {output_path}")
+
+    budget = RunBudget(args.max_calls, args.max_tokens, args.max_seconds)
+    if budget.limited and args.session == "block":
+        raise SystemExit("--max-calls/--max-tokens/--max-seconds 暂不支持 --session block，请去掉预算参数或改用逐行模式")
+    if args.session == "block" and (args.student or args.neighbors):
+        # 块会话判定的输入是合成的 SESSION 行，学生分类器与近邻索引都按单行日志训练，混用会互相污染
+        print("ℹ️ 块会话模式不使用 --student / --neighbors")
+        args.student = args.neighbors = None
+    shortcuts = load_shortcuts(args)
+    detect_fn = partial(detect_log, shortcuts=shortcuts)
+    with TokenLedger(args.ledger) as ledger, call_context(run_id=ledger.run_id), \
+            session_from_args(args) as profiler:
+        if args.session == "block":
+            records, sessions = run_session_detection(input_path, detect_fn, chunksize=args.chunksize,
+                                                      profiler=profiler, shard=shard)
+            save_session_summaries(sessions, shard_path(args.session_output, shard))
+        elif budget.limited:
+            records = run_budgeted_detection(input_path, detect_fn, budget, chunksize=args.chunksize,
+                                             profiler=profiler,
+                                             critical_components=set(args.critical_components),
+                                             pending_path=shard_path(args.pending_output, shard),
+                                             shard=shard, shard_by=args.shard_by)
         else:
-            fn += 1
-
-precision = tp / (tp + fp) if (tp + fp) else 0
-recall    = tp / (tp + fn) if (tp + fn) else 0
-f1_score  = 2 * precision * recall / (precision + recall) if (precision + recall) else 0
-
-print("\n📊 【检测结果评估】")
-print(f"✔️ TP（真阳性）: {tp}")
-print(f"✔️ FP（假阳性）: {fp}")
-print(f"✔️ FN（漏报）  : {fn}")
-print(f"✔️ TN（真阴性）: {tn}")
-print(f"\n🎯 精确度 Precision: {precision:.3f}")
-print(f"🎯 召回率 Recall   : {recall:.3f}")
-print(f"🎯 F1 分数 F1-score: {f1_score:.3f}")
+            records = run_detection(input_path, profiler=profiler, chunksize=args.chunksize,
+                                    shard=shard, shard_by=args.shard_by, detect_fn=detect_fn)
+        save_outputs(records, input_path, output_path, gray_pool_path, full_log=args.full_log)
+        evaluate_results(records)
+        if args.session == "block":
+            evaluate_sessions(sessions)
+        finish_shortcuts(shortcuts)
+        print_hedge_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "解析脚本"))
+from logParser_main import LogParser, build_structured_row
+from settings import parse_settings
+
+from log_detect import detect_log
+from detect_reader import PROMPT_COLUMNS, binary_label
+from detect_records import InlineTable
+from llm_client import call_context
+from llm_ledger import LEDGER_PATH, TokenLedger
+
+# ==== 配置参数 ====
+BATCH_SIZE = 32        # 单个微批最大日志条数
+MAX_LATENCY = 2.0      # 微批最长等待时间（秒），限制端到端延迟
+POLL_INTERVAL = 0.5    # 无新数据时的轮询间隔（秒）
+OUTPUT_PATH = "实时检测结果.jsonl"
+
+
+def tail_lines(path, poll_interval=POLL_INTERVAL, from_start=False):
+    """
+    持续跟踪一个不断增长的日志文件（类似 tail -F）。
+    - 逐行产出新写入的完整日志行，未写完的半行会缓存到换行符出现；
+    - 文件被轮转（inode 变化/被删除重建）时读完旧文件后切换到新文件并从头读取，旧文件末尾无换行的残行单独产出；
+    - 文件被截断（copytruncate）时回到文件开头；
+    - 暂无新数据时产出 None，便于调用方按时间刷新微批。
+    """
+    f = None
+    inode = None
+    pending = b""
+    while True:
+        if f is None:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                yield None
+                time.sleep(poll_interval)
+                continue
+            inode = os.fstat(f.fileno()).st_ino
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            from_start = True  # 轮转后的新文件需要从头读取
+
+        data = f.readline()
+        if data:
+            pending += data
+            if pending.endswith(b"\n"):
+                yield pending.decode("utf-8", errors="replace")
+                pending = b""
+            continue
+
+        # 暂无新数据：检查轮转与截断
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_ino == inode and st.st_size < f.tell():
+            print(f"⚠️ 检测到文件截断，回到开头：{path}")
+            f.seek(0)
+            pending = b""
+            continue
+        if st is None or st.st_ino != inode:
+            print(f"🔄 检测到日志轮转：{path}")
+            f.close()
+            f = None
+            if pending:  # 旧文件末尾没有换行的残行单独作为一行输出，不能与新文件的首行拼接
+                yield pending.decode("utf-8", errors="replace")
+                pending = b""
+            continue
+
+        yield None
+        time.sleep(poll_interval)
+
+
+def follow(log_path, log_type, output_path=OUTPUT_PATH, batch_size=BATCH_SIZE,
+           max_latency=MAX_LATENCY, poll_interval=POLL_INTERVAL, from_start=False, ledger_path=LEDGER_PATH,
+           store_path=None):
+    """
+    实时跟踪原始日志：逐行在内存中解析（LogParser 状态跨批次保留），
+    按微批送入检测流程，并将每条判定结果追加写入 JSONL。
+    解析失败的行（如内容中的时间串格式不符）与 transform_log_to_csv 一样记录后跳过，不会中断跟踪；
+    数据集缺少的提示词列（如 HDFS 无 Type/Node）以空字符串补齐。
+    微批在达到 batch_size 或最早一条等待超过 max_latency 秒时立即处理。
+    指定 store_path 时从模板库加载已有模板（EventId 与离线解析 / 上次运行一致），出现新模板后写回。
+    """
+    settings = parse_settings[log_type]
+    headers = settings["headers"]
+    missing_columns = [c for c in PROMPT_COLUMNS if c not in headers]
+    parser = LogParser(settings, store_path=store_path)
+    saved_templates = len(parser.templates)
+
+    batch = []
+    line_id = 0
+    processed = 0
+    print(f"👀 开始跟踪日志：{log_path}（批大小 {batch_size}，最大等待 {max_latency}s）")
+
+    with open(output_path, "a", encoding="utf-8") as out, TokenLedger(ledger_path) as ledger, \
+            call_context(run_id=ledger.run_id):
+        for raw_line in tail_lines(log_path, poll_interval=poll_interval, from_start=from_start):
+            now = time.monotonic()
+            if raw_line is not None:
+                line_id += 1
+                try:
+                    structured = build_structured_row(line_id, raw_line, headers, parser)
+                except Exception as e:
+                    print(f"⚠️ 解析第 {line_id} 行失败，已跳过：{e}")
+                    structured = None
+                if structured is not None:
+                    record = dict(zip(headers, structured))
+                    for column in missing_columns:
+                        record[column] = ""
+                    record["BinaryLabel"] = binary_label(record, settings)
+                    batch.append((now, record))
+
+            if batch and (len(batch) >= batch_size or now - batch[0][0] >= max_latency):
+                # 新模板先落盘再输出判定，避免中断后重启时同一模板被分配不同的 EventId
+                if store_path and len(parser.templates) != saved_templates:
+                    parser.save_store()
+                    saved_templates = len(parser.templates)
+                for arrived, record in batch:
+                    result = detect_log(processed, record)
+                    processed += 1
+                    verdict = result.to_compact(InlineTable, InlineTable)
+                    verdict["Content"] = record.get("Content")
+                    verdict["latency_ms"] = round((time.monotonic() - arrived) * 1000, 1)
+                    out.write(json.dumps(verdict, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+                print(f"📤 已输出 {processed} 条实时判定（模板数 {len(parser.templates)}）")
+                batch = []
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="实时跟踪原始日志并在线检测")
+    parser.add_argument("log_path", help="持续写入的原始日志文件")
+    parser.add_argument("--log-type", default="BGL", help="parse_settings 中的数据集类型")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="判定结果 JSONL")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-latency", type=float, default=MAX_LATENCY)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="LLM 调用账本 JSONL（传空字符串关闭）")
+    parser.add_argument("--from-start", action="store_true", help="从文件开头读取（默认只跟踪新写入内容）")
+    parser.add_argument("--template-store", default=None,
+                        help="LogParser 模板库（如 dataset/BGL/BGL.log_template_store.json.gz），保持 EventId 跨运行稳定")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    follow(args.log_path, args.log_type, output_path=args.output, batch_size=args.batch_size,
+           max_latency=args.max_latency, poll_interval=args.poll_interval, from_start=args.from_start,
+           ledger_path=args.ledger, store_path=args.template_store)
@@ -4,6 +4,44 @@ import json
 import openai
 import json
 import time
+from llm_client import chat_completion, response_text
+
+# 备用学生模型端点（对冲请求）：主请求超过 p95 延迟仍未返回时向此端点发出相同请求；None 表示不启用
+HEDGE_BACKUP = None  # 例如 {"api_base": "备用学生模型代理", "api_key": "备用API key", "model": "学生模型name"}
+
+
+def parse_model_A_content(content):
+    """解析模型A返回文本，非法时抛出异常"""
+    # 提取 JSON 内容
+    json_str = content
+    if json_str.startswith("```"):
+        json_str = json_str.strip("`").strip()
+        if json_str.lower().startswith("json"):
+            json_str = json_str[4:].strip()
+    parsed = json.loads(json_str)
+
+    # 处理 label 容错
+    label_raw = parsed["label"]
+    if isinstance(label_raw, str):
+        if "异常" in label_raw.lower() or "abnormal" in label_raw.lower():
+            label = 1
+        elif "正常" in label_raw.lower() or "normal" in label_raw.lower():
+            label = 0
+        else:
+            label = int(label_raw)
+    else:
+        label = int(label_raw)
+
+    score = float(parsed["score"])
+    if label not in [0, 1] or not (0 <= score <= 1):
+        raise ValueError("非法label或score")
+
+    return {
+        "label": label,
+        "reason": parsed["reason"].strip(),
+        "score": score
+    }
+
 
 def get_model_A_result(row, max_retry=3):
     openai.api_key = '学生模型API key'
@@ -31,43 +69,16 @@ def get_model_A_result(row, max_retry=3):
 
     for attempt in range(1, max_retry + 1):
         try:
-            response = openai.ChatCompletion.create(
+            response = chat_completion(
+                stage="model_A",
                 model="学生模型name",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.6,
-                timeout=20
+                timeout=20,
+                hedge=HEDGE_BACKUP,
+                validate=lambda r: parse_model_A_content(response_text(r))
             )
-            content = response.choices[0].message["content"].strip()
-
-            # 提取 JSON 内容
-            json_str = content
-            if json_str.startswith("```"):
-                json_str = json_str.strip("`").strip()
-                if json_str.lower().startswith("json"):
-                    json_str = json_str[4:].strip()
-            parsed = json.loads(json_str)
-
-            # 处理 label 容错
-            label_raw = parsed["label"]
-            if isinstance(label_raw, str):
-                if "异常" in label_raw.lower() or "abnormal" in label_raw.lower():
-                    label = 1
-                elif "正常" in label_raw.lower() or "normal" in label_raw.lower():
-                    label = 0
-                else:
-                    label = int(label_raw)
-            else:
-                label = int(label_raw)
-
-            score = float(parsed["score"])
-            if label not in [0, 1] or not (0 <= score <= 1):
-                raise ValueError("非法label或score")
-
-            return {
-                "label": label,
-                "reason": parsed["reason"].strip(),
-                "score": score
-            }
+            return parse_model_A_content(response_text(response))
 
         except Exception as e:
             print(f"⚠️ 模型A 第 {attempt} 次尝试失败: {e}")
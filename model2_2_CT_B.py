@@ -4,6 +4,10 @@ import openai
 import json
 import time
 import re
+from llm_client import chat_completion, response_text
+
+# 备用教师模型端点（对冲请求），格式同 model2_1_CS_A.HEDGE_BACKUP；None 表示不启用
+HEDGE_BACKUP = None
 
 def extract_json(text):
     """从模型返回中提取 JSON 内容（去除 markdown）"""
@@ -12,6 +16,21 @@ def extract_json(text):
     match = re.search(r"\{.*?\}", text, re.DOTALL)
     return match.group(0) if match else None
 
+def parse_model_B_content(content):
+    """解析模型B返回文本，非法时抛出异常"""
+    json_str = extract_json(content)
+    if not json_str:
+        raise ValueError("返回格式非 JSON")
+
+    parsed = json.loads(json_str)
+    score = float(parsed["score"])
+
+    # 分数合法性判断
+    if not (0 <= score <= 1):
+        raise ValueError("score 超出合法范围")
+
+    return {"score": score}
+
 def get_model_B_score(row, model_a_result, max_retry=3):
     openai.api_key = '教师模型API key'
     openai.api_base = "教师模型代理"
@@ -40,25 +59,16 @@ def get_model_B_score(row, model_a_result, max_retry=3):
 
     for attempt in range(1, max_retry + 1):
         try:
-            response = openai.ChatCompletion.create(
+            response = chat_completion(
+                stage="model_B",
                 model="教师模型name",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.6,
-                timeout=20
+                timeout=20,
+                hedge=HEDGE_BACKUP,
+                validate=lambda r: parse_model_B_content(response_text(r))
             )
-            raw_content = response.choices[0].message["content"].strip()
-            json_str = extract_json(raw_content)
-            if not json_str:
-                raise ValueError("返回格式非 JSON")
-
-            parsed = json.loads(json_str)
-            score = float(parsed["score"])
-
-            # 分数合法性判断
-            if not (0 <= score <= 1):
-                raise ValueError("score 超出合法范围")
-
-            return {"score": score}
+            return parse_model_B_content(response_text(response))
 
         except Exception as e:
             print(f"⚠️ 模型B 第 {attempt} 次失败：{e}")
@@ -0,0 +1,80 @@
+import numpy as np
+
+# ==== 融合阈值 ====
+ALPHA = 0.3  # 一致性阈值 Δ
+BETA = 0.7   # 接受可信度阈值 G
+
+# ==== 融合类别 ====
+CLASS_WHITE = 0      # 采纳，模型A判为正常
+CLASS_BLACK = 1      # 采纳，模型A判为异常
+CLASS_GRAY = 2       # Δ ≥ ALPHA：模型A/B 分歧过大
+CLASS_GRAY_LOW = 3   # Δ < ALPHA 但 G ≤ BETA：一致但可信度不足，需重判
+
+CLASS_LABELS = {
+    CLASS_WHITE: "白日志",
+    CLASS_BLACK: "黑日志",
+    CLASS_GRAY: "灰日志",
+    CLASS_GRAY_LOW: "灰日志（需重判）",
+}
+
+
+def fuse_scores(label_a, score_a, score_b, alpha=ALPHA, beta=BETA):
+    """
+    批量置信度融合（纯 NumPy，不调用任何模型）。
+
+    参数：
+        label_a: 模型A标签数组（0/1）
+        score_a: 模型A置信度数组
+        score_b: 模型B对模型A判断的信任度数组
+        alpha, beta: 阈值，可为标量，也可为可广播的数组（用于阈值网格扫描）
+
+    返回 dict：
+        delta: |score_a - score_b|
+        fusion_score: (score_a + score_b) / 2
+        accept: 是否采纳模型A标签（Δ < ALPHA 且 G > BETA）
+        fusion_class: CLASS_WHITE / CLASS_BLACK / CLASS_GRAY / CLASS_GRAY_LOW
+    """
+    label_a = np.asarray(label_a)
+    score_a = np.asarray(score_a, dtype=np.float64)
+    score_b = np.asarray(score_b, dtype=np.float64)
+
+    delta = np.abs(score_a - score_b)
+    fusion_score = (score_a + score_b) / 2
+    consistent = delta < alpha
+    confident = fusion_score > beta
+    accept = consistent & confident
+
+    fusion_class = np.where(
+        ~consistent, CLASS_GRAY,
+        np.where(confident, np.where(label_a == 1, CLASS_BLACK, CLASS_WHITE), CLASS_GRAY_LOW)
+    ).astype(np.int8)
+
+    return {
+        "delta": delta,
+        "fusion_score": fusion_score,
+        "accept": accept,
+        "fusion_class": fusion_class,
+    }
+
+
+def fuse_single(label_a, score_a, score_b, alpha=ALPHA, beta=BETA):
+    """单条日志的融合结果（Python 标量），供逐条检测流程使用"""
+    fused = fuse_scores([label_a], [score_a], [score_b], alpha, beta)
+    return {
+        "delta": float(fused["delta"][0]),
+        "fusion_score": float(fused["fusion_score"][0]),
+        "accept": bool(fused["accept"][0]),
+        "fusion_class": int(fused["fusion_class"][0]),
+    }
+
+
+def is_gray_class(fusion_class):
+    return np.isin(fusion_class, (CLASS_GRAY, CLASS_GRAY_LOW))
+
+
+# ✅ 单元测试
+if __name__ == "__main__":
+    fused = fuse_scores([1, 0, 1, 0], [0.92, 0.85, 0.9, 0.6], [0.88, 0.8, 0.4, 0.65])
+    for key, value in fused.items():
+        print(f"{key}: {value}")
+    print("📌 类别：", [CLASS_LABELS[c] for c in fused["fusion_class"]])
@@ -1,11 +1,16 @@
 import openai
 import json
 import time
+from llm_client import chat_completion
+from model3_sample_utils import parse_agent_samples, pick_representative
 
-def model3_agent_a_infer(row, prompt_override=None, max_retry=3):
+SUPPORTS_N = True  # 接口支持 n 参数，一次请求返回多个候选回答
+
+def model3_agent_a_infer(row, prompt_override=None, max_retry=3, n=1):
     """
     使用 GPT-3.5 对日志记录进行分类 + 解释推理。
     自动校验格式，必要时多轮重试。
+    n > 1 时一次请求采样 n 个回答，返回多数标签的回答并在 "samples" 中附带全部采样。
     """
     openai.api_key = '模型A API key'
     openai.api_base = "模型A代理"
@@ -35,38 +40,17 @@ def model3_agent_a_infer(row, prompt_override=None, max_retry=3):
     # === 多轮重试调用 ===
     for attempt in range(1, max_retry + 1):
         try:
-            response = openai.ChatCompletion.create(
+            response = chat_completion(
+                stage="agent_A",
                 model="模型Aname",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.6,
-                timeout=20
+                timeout=20,
+                **({"n": n} if n > 1 and SUPPORTS_N else {})
             )
 
-            content = response.choices[0].message["content"].strip()
-            parsed = json.loads(content)
-
-            # === 强制格式校验 ===
-            label_raw = parsed.get("label")
-            reason = parsed.get("reason", "").strip()
-            score = float(parsed.get("score", 0.0))
-
-            # === label 容错处理 ===
-            if isinstance(label_raw, str):
-                norm = label_raw.lower()
-                if "异常" in norm or "abnormal" in norm:
-                    label = 1
-                elif "正常" in norm or "normal" in norm:
-                    label = 0
-                else:
-                    label = int(label_raw)
-            else:
-                label = int(label_raw)
-
-            # 校验通过
-            if label in [0, 1] and 0.0 <= score <= 1.0:
-                return {"label": label, "reason": reason, "score": score}
-            else:
-                raise ValueError("解析结果不合法")
+            # === 强制格式校验 + label 容错处理 ===
+            return pick_representative(parse_agent_samples(response))
 
         except Exception as e:
             print(f"⚠️ 模型A 第 {attempt} 次尝试失败: {e}")
@@ -2,6 +2,10 @@ import openai
 import json
 import re
 import time
+from llm_client import chat_completion
+from model3_sample_utils import parse_agent_samples, pick_representative
+
+SUPPORTS_N = True  # 接口支持 n 参数，一次请求返回多个候选回答
 
 def extract_json(text):
     """
@@ -12,9 +16,10 @@ def extract_json(text):
     match = re.search(r"\{.*?\}", text, re.DOTALL)
     return match.group(0) if match else None
 
-def model3_agent_b_infer(row, prompt_override=None, max_retry=3):
+def model3_agent_b_infer(row, prompt_override=None, max_retry=3, n=1):
     """
     使用 GPT-4o 推理日志异常。返回 dict 包含 label, reason, score
+    n > 1 时一次请求采样 n 个回答，另在 "samples" 中附带全部采样
     """
     openai.api_key = '模型B API key'
     openai.api_base = "模型B代理"
@@ -42,39 +47,15 @@ def model3_agent_b_infer(row, prompt_override=None, max_retry=3):
 
     for attempt in range(1, max_retry + 1):
         try:
-            response = openai.ChatCompletion.create(
+            response = chat_completion(
+                stage="agent_B",
                 model="模型Bname",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.6,
-                timeout=20
+                timeout=20,
+                **({"n": n} if n > 1 and SUPPORTS_N else {})
             )
-            raw_content = response.choices[0].message["content"].strip()
-            json_str = extract_json(raw_content)
-            if not json_str:
-                raise ValueError("未能提取出合法 JSON 格式")
-
-            parsed = json.loads(json_str)
-
-            # === label 容错解析 ===
-            label_raw = parsed.get("label")
-            reason = parsed.get("reason", "").strip()
-            score = float(parsed.get("score", 0.0))
-
-            if isinstance(label_raw, str):
-                norm = label_raw.lower()
-                if "异常" in norm or "abnormal" in norm:
-                    label = 1
-                elif "正常" in norm or "normal" in norm:
-                    label = 0
-                else:
-                    label = int(label_raw)
-            else:
-                label = int(label_raw)
-
-            if label in [0, 1] and 0.0 <= score <= 1.0:
-                return {"label": label, "reason": reason, "score": score}
-            else:
-                raise ValueError("字段值超出预期范围")
+            return pick_representative(parse_agent_samples(response, extract_json))
 
         except Exception as e:
             print(f"⚠️ 模型B 第 {attempt} 次尝试失败: {e}")
@@ -2,6 +2,10 @@ import openai
 import json
 import re
 import time
+from llm_client import chat_completion
+from model3_sample_utils import parse_agent_samples, pick_representative
+
+SUPPORTS_N = False  # DeepSeek 接口不支持 n 参数，多采样时仍只返回一个回答
 
 def extract_json(text):
     """
@@ -12,11 +16,12 @@ def extract_json(text):
     match = re.search(r"\{.*?\}", text, re.DOTALL)
     return match.group(0) if match else None
 
-def model3_agent_c_infer(row, prompt_override=None, max_retry=3):
+def model3_agent_c_infer(row, prompt_override=None, max_retry=3, n=1):
     """
     使用 DeepSeek API 模拟 GPT-4 级别模型，返回异常检测结果。
     支持 prompt_override，用于多轮协同推理。
     返回：dict，包括 label, reason, score
+    n: 多采样数；该接口不支持 n 参数，始终只采样一次
     """
     openai.api_key = '模型C API key'
     openai.api_base = "模型C代理"
@@ -44,40 +49,14 @@ def model3_agent_c_infer(row, prompt_override=None, max_retry=3):
 
     for attempt in range(1, max_retry + 1):
         try:
-            response = openai.ChatCompletion.create(
+            response = chat_completion(
+                stage="agent_C",
                 model="模型Cname",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.6,
                 timeout=20
             )
-
-            raw_content = response.choices[0].message["content"].strip()
-            json_str = extract_json(raw_content)
-            if not json_str:
-                raise ValueError("未能提取合法 JSON 格式")
-
-            parsed = json.loads(json_str)
-
-            # === 容错解析 label ===
-            label_raw = parsed.get("label")
-            reason = parsed.get("reason", "").strip()
-            score = float(parsed.get("score", 0.0))
-
-            if isinstance(label_raw, str):
-                norm = label_raw.lower()
-                if "异常" in norm or "abnormal" in norm:
-                    label = 1
-                elif "正常" in norm or "normal" in norm:
-                    label = 0
-                else:
-                    label = int(label_raw)
-            else:
-                label = int(label_raw)
-
-            if label not in [0, 1] or not (0.0 <= score <= 1.0):
-                raise ValueError("label 或 score 不在合法范围内")
-
-            return {"label": label, "reason": reason, "score": score}
+            return pick_representative(parse_agent_samples(response, extract_json))
 
         except Exception as e:
             print(f"⚠️ 模型C 第 {attempt} 次尝试失败: {e}")
@@ -5,9 +5,27 @@ from model3_agent3 import model3_agent_c_infer
 from model3_similarity_utils import compute_similarity_matrix
 from model3_feedback_utils import build_next_prompts
 from model3_vote_utils import weighted_vote
+from model3_sample_utils import summarize_samples
+from llm_client import call_context
 
 MAX_ROUNDS = 3
 
+# ==== 多采样自洽性（self-consistency）====
+# 支持 n 参数的智能体每次请求采样多个回答；汇总本轮全部采样，
+# 多数标签占比与置信度离散度达标时直接输出，省去下一轮三模型协同推理。
+SAMPLES_PER_AGENT = 1            # 1 表示关闭
+SELF_CONSISTENCY_MIN_SAMPLES = 5
+SELF_CONSISTENCY_AGREEMENT = 0.8
+SELF_CONSISTENCY_MAX_SPREAD = 0.15
+
+
+def pooled_samples(results):
+    """汇总本轮所有模型的采样（未多采样的模型按一个采样计）"""
+    samples = []
+    for r in results:
+        samples.extend(r.get("samples") or [r])
+    return samples
+
 def consensus_inference(row):
     """
     对单条日志执行多轮协同推理。
@@ -25,7 +43,9 @@ def consensus_inference(row):
 
         for i, agent in enumerate(agents):
             try:
-                result = agent(row, prompt_override=prompts[i]) if round_id > 1 else agent(row)
+                with call_context(round=round_id):
+                    result = agent(row, prompt_override=prompts[i] if round_id > 1 else None,
+                                   n=SAMPLES_PER_AGENT)
                 if result is None:
                     raise ValueError("空返回")
             except Exception as e:
@@ -66,6 +86,22 @@ def consensus_inference(row):
                 "method": "加权投票"
             }
 
+        # === 多采样自洽性 ===
+        if SAMPLES_PER_AGENT > 1:
+            summary = summarize_samples(pooled_samples(results))
+            print(f"🎲 多采样自洽性：{summary}")
+            if (summary["n"] >= SELF_CONSISTENCY_MIN_SAMPLES
+                    and summary["agreement"] >= SELF_CONSISTENCY_AGREEMENT
+                    and summary["score_spread"] <= SELF_CONSISTENCY_MAX_SPREAD):
+                print("🎯 多采样结果自洽，直接输出")
+                return summary["majority_label"], "SELF", {
+                    "round": round_id,
+                    "reasons": reasons,
+                    "scores": scores,
+                    "self_consistency": summary,
+                    "method": "多采样自洽"
+                }
+
         # === 准备下一轮 ===
         if round_id < MAX_ROUNDS:
             prompts, strategy_flag = build_next_prompts(row, results, sim_matrix, sim_avg)
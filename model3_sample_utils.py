@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+
+
+def normalize_label(label_raw):
+    """label 容错：支持 0/1 数字、数字字符串以及“正常/异常”等描述"""
+    if isinstance(label_raw, str):
+        norm = label_raw.lower()
+        if "异常" in norm or "abnormal" in norm:
+            return 1
+        if "正常" in norm or "normal" in norm:
+            return 0
+    return int(label_raw)
+
+
+def parse_agent_content(content, extract=None):
+    """
+    解析单个候选回答，返回 {label, reason, score}，非法时抛出异常。
+    extract: 可选，从原始文本中提取 JSON 字符串的函数（返回 None 表示未找到）
+    """
+    json_str = extract(content) if extract else content
+    if not json_str:
+        raise ValueError("未能提取合法 JSON 格式")
+    parsed = json.loads(json_str)
+
+    label = normalize_label(parsed.get("label"))
+    reason = parsed.get("reason", "").strip()
+    score = float(parsed.get("score", 0.0))
+    if label not in [0, 1] or not (0.0 <= score <= 1.0):
+        raise ValueError("label 或 score 不在合法范围内")
+    return {"label": label, "reason": reason, "score": score}
+
+
+def parse_agent_samples(response, extract=None):
+    """
+    解析一次请求返回的全部候选回答（n > 1 时有多个 choices），跳过其中不合法的。
+    全部不合法时抛出最后一个解析异常。
+    """
+    samples = []
+    error = None
+    for choice in response.choices:
+        try:
+            samples.append(parse_agent_content(choice.message["content"].strip(), extract))
+        except Exception as e:
+            error = e
+    if not samples:
+        raise error or ValueError("空返回")
+    return samples
+
+
+def summarize_samples(samples):
+    """
+    多个采样的自洽性统计：
+    - majority_label: 多数标签；agreement: 多数标签所占比例；
+    - score_mean / score_spread: 多数标签采样的置信度均值与标准差。
+    """
+    labels = [s["label"] for s in samples if s["label"] in [0, 1]]
+    if not labels:
+        return {"n": 0, "majority_label": None, "agreement": 0.0, "score_mean": 0.0, "score_spread": 0.0}
+    ones = sum(labels)
+    # 平票时取首个采样的标签，与单采样行为一致
+    majority = 1 if ones * 2 > len(labels) else 0 if ones * 2 < len(labels) else labels[0]
+    scores = np.array([s["score"] for s in samples if s["label"] == majority], dtype=float)
+    return {
+        "n": len(labels),
+        "majority_label": majority,
+        "agreement": round(len(scores) / len(labels), 3),
+        "score_mean": round(float(scores.mean()), 3),
+        "score_spread": round(float(scores.std()), 3),
+    }
+
+
+def pick_representative(samples):
+    """取第一个与多数标签一致的采样作为该模型本轮的回答，并附带全部采样"""
+    if len(samples) == 1:
+        return samples[0]
+    majority = summarize_samples(samples)["majority_label"]
+    result = dict(next(s for s in samples if s["label"] == majority))
+    result["samples"] = samples
+    return result
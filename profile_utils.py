@@ -0,0 +1,177 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+
+# ==== 配置参数 ====
+FOLDED_MIN_SHARE = 0.0001     # 分摊耗时低于总耗时该比例的子树不再展开
+FOLDED_MIN_SECONDS = 1e-6     # 同上，绝对下限（1µs，写出时本来也会被取整为 0）
+FOLDED_MAX_NODES = 200000     # 展开的调用路径节点上限，超过后截断并提示
+
+# 当前激活的剖析会话（供深层循环通过 profile_checkpoint() 检查时间窗口）
+_active_session = None
+
+
+class ProfileSession:
+    """
+    可选的性能剖析会话：在配置的时间窗口内同时采集 cProfile 调用统计与 tracemalloc 内存分配。
+
+    输出文件（以 output_prefix 为前缀）：
+    - {prefix}.pstats      : cProfile 原始统计，可用 `python -m pstats` / snakeviz 打开
+    - {prefix}.folded      : 折叠调用栈，flamegraph.pl / speedscope 可直接读取
+    - {prefix}.memory.txt  : tracemalloc 分配热点 Top N
+
+    output_prefix 为空时会话不做任何事，调用方无需区分是否开启剖析。
+    """
+
+    def __init__(self, output_prefix=None, window=0, top_n=30, trace_frames=10):
+        self.output_prefix = output_prefix
+        self.window = window  # 采集窗口（秒），0 表示覆盖整个运行过程
+        self.top_n = top_n
+        self.trace_frames = trace_frames
+        self._profiler = None
+        self._start_time = None
+        self._running = False
+
+    @property
+    def enabled(self):
+        return bool(self.output_prefix)
+
+    def start(self):
+        global _active_session
+        if not self.enabled or self._running:
+            return self
+        tracemalloc.start(self.trace_frames)
+        self._profiler = cProfile.Profile()
+        self._start_time = time.perf_counter()
+        self._running = True
+        _active_session = self
+        self._profiler.enable()
+        return self
+
+    def checkpoint(self):
+        """在主循环中周期性调用：超过采集窗口即停止并落盘"""
+        if self._running and self.window and time.perf_counter() - self._start_time >= self.window:
+            self.stop()
+
+    def stop(self):
+        global _active_session
+        if not self._running:
+            return
+        self._profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self._running = False
+        if _active_session is self:
+            _active_session = None
+
+        elapsed = time.perf_counter() - self._start_time
+        prefix = self.output_prefix
+        out_dir = os.path.dirname(prefix)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        self._profiler.dump_stats(f"{prefix}.pstats")
+        stats = pstats.Stats(self._profiler)
+        write_folded_stacks(stats, f"{prefix}.folded")
+        write_memory_top(snapshot, f"{prefix}.memory.txt", self.top_n)
+        print(f"🧪 性能剖析完成（窗口 {elapsed:.1f}s）→ {prefix}.pstats / .folded / .memory.txt")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def profile_checkpoint():
+    """供解析/采样等深层循环调用，无激活会话时开销可忽略"""
+    if _active_session is not None:
+        _active_session.checkpoint()
+
+
+def add_profile_arguments(parser):
+    """为 argparse 命令行添加统一的剖析参数"""
+    parser.add_argument("--profile", metavar="PREFIX", default=None,
+                        help="开启性能剖析，输出文件前缀（如 profile/run1）")
+    parser.add_argument("--profile-window", type=float, default=0,
+                        help="剖析采集窗口（秒），0 表示整个运行过程")
+    parser.add_argument("--profile-top", type=int, default=30,
+                        help="内存分配热点输出条数")
+
+
+def session_from_args(args):
+    return ProfileSession(args.profile, window=args.profile_window, top_n=args.profile_top)
+
+
+def _func_label(func):
+    filename, lineno, name = func
+    if filename == "~":  # 内建函数
+        return name
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+def write_folded_stacks(stats, output_path, max_depth=64, min_share=FOLDED_MIN_SHARE,
+                        max_nodes=FOLDED_MAX_NODES):
+    """
+    将 pstats 调用图近似展开为折叠调用栈（每行 `a;b;c 微秒数`）。
+    cProfile 只记录调用边，路径耗时按边上的累计时间占比分摊。
+    调用图中的简单路径数随函数数指数增长，分摊耗时低于 min_share×总耗时（且不低于 1µs）的子树直接剪掉，
+    展开的节点数超过 max_nodes 时截断；被剪掉的耗时不计入输出，火焰图只保留主要路径。
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, entry in raw.items() if not entry[4]]
+    total = sum(entry[2] for entry in raw.values())  # 各函数自身耗时之和即总耗时
+    min_weight = max(total * min_share, FOLDED_MIN_SECONDS)
+    folded = {}
+    nodes = 0
+
+    def walk(func, weight, path):
+        nonlocal nodes
+        _, _, tt, ct, _ = raw[func]
+        if ct <= 0 or weight < min_weight or nodes >= max_nodes:
+            return
+        nodes += 1
+        path = path + (_func_label(func),)
+        self_time = weight * tt / ct
+        if self_time > 0:
+            folded[path] = folded.get(path, 0.0) + self_time
+        if len(path) >= max_depth:
+            return
+        for child, edge_ct in callees.get(func, []):
+            if child in raw and _func_label(child) not in path:
+                walk(child, weight * edge_ct / ct, path)
+
+    for root in roots:
+        walk(root, raw[root][3], ())
+    if nodes >= max_nodes:
+        print(f"⚠️ 折叠调用栈展开超过 {max_nodes} 个节点，已截断：{output_path}")
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        for path, seconds in sorted(folded.items()):
+            micros = int(seconds * 1e6)
+            if micros > 0:
+                f.write(f"{';'.join(path)} {micros}\n")
+
+
+def write_memory_top(snapshot, output_path, top_n=30):
+    """输出 tracemalloc 分配热点（按代码行聚合）"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    top_stats = snapshot.statistics("lineno")
+    total = sum(stat.size for stat in top_stats)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(f"当前存活分配总量: {total / 1024 / 1024:.2f} MiB\n\n")
+        for rank, stat in enumerate(top_stats[:top_n], 1):
+            frame = stat.traceback[0]
+            f.write(f"#{rank}: {frame.filename}:{frame.lineno} "
+                    f"{stat.size / 1024:.1f} KiB（{stat.count} 次分配）\n")
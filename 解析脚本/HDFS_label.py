@@ -2,7 +2,7 @@ import os
 import csv
 import re
 from settings import parse_settings  # 假设 settings.py 在同一目录下
-from tqdm import tqdm  # 导入 tqdm 用于显示进度条
+from line_reader import LineReader, read_lines  # 单遍读取，按字节显示进度，支持 .gz/.zst
 
 
 def add_labels(input_file, output_file, label_file, log_type='HDFS_2k'):
@@ -16,12 +16,11 @@ def add_labels(input_file, output_file, label_file, log_type='HDFS_2k'):
     # 读取标签文件并构建 BlockId 到 Label 的映射字典
     block_id_label_map = {}
     print("标签数据读取中...")
-    with open(label_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            block_id = row['BlockId']
-            label = row['Label']
-            block_id_label_map[block_id] = label
+    reader = csv.DictReader(read_lines(label_file))
+    for row in reader:
+        block_id = row['BlockId']
+        label = row['Label']
+        block_id_label_map[block_id] = label
 
     # 按 BlockId 长度降序排序，避免短的 BlockId 错误匹配长的 BlockId
     sorted_block_ids = sorted(block_id_label_map.keys(), key=lambda x: len(x), reverse=True)
@@ -29,12 +28,8 @@ def add_labels(input_file, output_file, label_file, log_type='HDFS_2k'):
     # 编译一个包含所有 BlockId 的正则表达式模式，使用单词边界确保准确匹配
     pattern = re.compile(r'\b(' + '|'.join(map(re.escape, sorted_block_ids)) + r')\b')
 
-    # 获取文件行数以初始化 tqdm 进度条
-    with open(input_file, 'r') as f:
-        total_lines = sum(1 for _ in f) - 1  # 减去表头行
-        
-    # 处理原始日志文件，逐行读取和写入
-    with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
+    # 处理原始日志文件，逐行读取和写入（进度条按已读字节数显示，无需预先统计行数）
+    with LineReader(input_file, desc="处理日志文件") as infile, open(output_file, 'w', newline='') as outfile:
         reader = csv.DictReader(infile)
         
         # 检查 parse_settings 是否有指定表头，如果有则使用，否则使用文件默认表头
@@ -55,7 +50,7 @@ def add_labels(input_file, output_file, label_file, log_type='HDFS_2k'):
         writer.writeheader()  # 写入表头
 
         # 逐行处理日志内容
-        for row in tqdm(reader, total=total_lines, desc="处理日志文件"):
+        for row in reader:
             content = row['Content']  # 获取日志内容
             label = 'Normal'  # 默认 Label 值
             
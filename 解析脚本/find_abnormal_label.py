@@ -1,12 +1,13 @@
 import csv
+from line_reader import read_lines
 
 # 输入文件和输出文件路径
 input_file = './dataset/HDFS/anomaly_label.csv'
 output_file = './dataset/HDFS/anomaly_blocks.csv'
 
 # 打开输入文件进行读取，打开输出文件进行写入
-with open(input_file, mode='r') as infile, open(output_file, mode='w', newline='') as outfile:
-    reader = csv.DictReader(infile)
+with open(output_file, mode='w', newline='') as outfile:
+    reader = csv.DictReader(read_lines(input_file))
     writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
     
     # 写入输出文件的标题行
@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import io
+import mmap
+import os
+
+from tqdm import tqdm
+
+# ==== 配置参数 ====
+BLOCK_BYTES = 1 << 20       # 每次解码的字节块大小（块边界对齐到换行符之后）
+FINGERPRINT_BYTES = 4096    # 文件指纹取样的字节数
+PROGRESS_STEP = 1 << 20     # 进度条按字节刷新的步长
+COMPRESSED_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+
+
+def detect_compression(path) -> str:
+    """按扩展名判断压缩格式：'gzip' / 'zstd'，未压缩返回空串"""
+    return COMPRESSED_SUFFIXES.get(os.path.splitext(str(path))[1].lower(), '')
+
+
+def _open_decompressed(raw, compression):
+    """在已打开的压缩文件对象上套一层流式解压，返回二进制流"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    # zstd 为可选依赖，仅在读取 .zst 文件时需要
+    import zstandard
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=False))
+
+
+def _split_lines(block):
+    """按文本模式 open() 的通用换行规则切行：\\r\\n、\\r 均视为换行并转换为 \\n"""
+    return io.StringIO(block, newline=None)
+
+
+class _ProgressStream(io.RawIOBase):
+    """统计底层文件已消费字节数的只读流，供 pandas.read_csv 等按块读取的场景使用"""
+
+    def __init__(self, stream, reader):
+        self._stream = stream
+        self._reader = reader
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._stream.readinto(buffer)
+        self._reader._advance(self._reader._raw.tell())
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+class LineReader:
+    """
+    解析脚本共用的单遍行读取器：
+    - 未压缩文件内存映射读取，按块直接从映射区解码为 str，不经过中间 bytes；
+    - .gz / .zst 文件流式解压读取（zstd 需安装 zstandard）；
+    - 进度条按已消费的（压缩）文件字节数显示，无需为统计行数预先读一遍文件；
+    - 换行规则与文本模式 open() 一致，行号与原先逐行读取相同；
+    - 支持按 [start, end) 字节区间读取（仅未压缩文件），区间边界应对齐到换行符之后。
+
+    用法：
+        with LineReader(path, desc="Processing logs") as reader:
+            for line_id, line in enumerate(reader, 1):
+                ...
+    """
+
+    def __init__(self, path, encoding='utf-8', errors='strict', start=0, end=None, desc=None):
+        self.path = str(path)
+        self.encoding = encoding
+        self.errors = errors
+        self.compression = detect_compression(self.path)
+        if self.compression and (start or end is not None):
+            raise ValueError(f"压缩文件不支持按字节区间读取: {self.path}")
+        self.size = os.path.getsize(self.path)
+        self.start = start
+        self.end = self.size if end is None else min(end, self.size)
+        self.position = start     # 已消费到的（压缩）文件字节位置
+        self._reported = start
+        self._raw = None
+        self._pbar = tqdm(total=self.end - self.start, desc=desc, unit="B", unit_scale=True) if desc else None
+
+    # ==== 上下文管理 ====
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+        if self._pbar is not None:
+            self._advance(self.position)
+            self._pbar.close()
+            self._pbar = None
+
+    def _advance(self, position):
+        self.position = position
+        if self._pbar is not None and (position - self._reported >= PROGRESS_STEP or position >= self.end):
+            self._pbar.update(position - self._reported)
+            self._reported = position
+
+    # ==== 读取 ====
+    def __iter__(self):
+        self._raw = open(self.path, 'rb')
+        if self.compression:
+            blocks = self._iter_compressed()
+        elif self.end > self.start:
+            blocks = self._iter_mapped()
+        else:
+            blocks = iter(())
+        for block in blocks:
+            yield from _split_lines(block)
+
+    def _iter_mapped(self):
+        """逐块解码映射区；区间末尾未对齐到换行时读完最后一行"""
+        encoding, errors = self.encoding, self.errors
+        mm = mmap.mmap(self._raw.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        try:
+            pos, end, size = self.start, self.end, self.size
+            while pos < end:
+                stop = min(pos + BLOCK_BYTES, end)
+                if stop < size:
+                    newline = mm.find(b'\n', stop - 1)
+                    stop = size if newline < 0 else newline + 1
+                block = str(view[pos:stop], encoding, errors)
+                pos = stop
+                self._advance(pos)
+                yield block
+        finally:
+            view.release()
+            mm.close()
+
+    def _iter_compressed(self):
+        stream = _open_decompressed(self._raw, self.compression)
+        encoding, errors, raw = self.encoding, self.errors, self._raw
+        try:
+            while True:
+                data = stream.read(BLOCK_BYTES)
+                if not data:
+                    break
+                data += stream.readline()  # 补齐到换行符，避免块边界切断一行或多字节字符
+                self._advance(raw.tell())
+                yield str(data, encoding, errors)
+        finally:
+            stream.close()
+        self._advance(self.end)
+
+    def binary(self):
+        """返回（解压后的）二进制流，供 pandas.read_csv 等自行分块读取；进度按底层文件字节数更新"""
+        self._raw = open(self.path, 'rb')
+        stream = _open_decompressed(self._raw, self.compression) if self.compression else self._raw
+        return io.BufferedReader(_ProgressStream(stream, self))
+
+
+def read_lines(path, encoding='utf-8', errors='strict', desc=None):
+    """逐行读取文件（自动识别压缩格式）的便捷生成器"""
+    with LineReader(path, encoding=encoding, errors=errors, desc=desc) as reader:
+        yield from reader
+
+
+def split_byte_ranges(path, chunk_bytes, start=0, end=None):
+    """把未压缩文件的 [start, end) 切成约 chunk_bytes 大小、边界对齐到换行符之后的字节区间"""
+    size = os.path.getsize(path) if end is None else end
+    ranges = []
+    with open(path, 'rb') as f:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end - 1)
+                f.readline()  # 读到下一个换行符（含）为止
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def complete_end(path):
+    """最后一个换行符之后的字节位置：正在写入、尚未写完的末行不计入"""
+    with open(path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(BLOCK_BYTES, pos)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b'\n')
+            if newline >= 0:
+                return pos + newline + 1
+    return 0
+
+
+def file_fingerprint(path, offset):
+    """
+    已读取部分 [0, offset) 的指纹：开头与 offset 之前各 FINGERPRINT_BYTES 字节的 SHA-1。
+    用于判断文件是否只是在末尾追加（指纹不变）还是被轮转 / 截断 / 替换。
+    """
+    with open(path, 'rb') as f:
+        head = f.read(min(FINGERPRINT_BYTES, offset))
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        tail = f.read(offset - f.tell())
+    return {'head': hashlib.sha1(head).hexdigest(), 'tail': hashlib.sha1(tail).hexdigest()}
@@ -1,12 +1,28 @@
+import argparse
 import csv
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
 import re, string
+import sys
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Iterable, Iterator, List, Tuple, Any, Optional
 from collections import defaultdict
 from settings import parse_settings  # 配置文件，包含不同日志类型的解析设置
 from datetime import datetime
 from tqdm import tqdm 
 import logging
+from line_reader import LineReader, complete_end, detect_compression, file_fingerprint, split_byte_ranges
+from structured_output import is_parquet, open_structured_output
+from time_parser import get_time_parser
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # 复用项目根目录下的公共工具
+from profile_utils import ProfileSession, add_profile_arguments, profile_checkpoint
 
 # 配置日志输出
 logging.basicConfig(
@@ -23,6 +39,227 @@ date_alias = {'JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OC
               'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN',
               'PDT', 'UTC'}
 
+# ==== 预编译解析计划 ====
+try:
+    from re import _parser as _sre_parse   # Python 3.11+
+except ImportError:                       # pragma: no cover
+    import sre_parse as _sre_parse
+
+_ANY_CHAR = None  # 字符集分析中表示“可能匹配任意字符”
+
+
+def _pattern_charset(pattern: str):
+    """
+    估计正则可能匹配到的字符集合，用于判断两条替换规则能否安全合并。
+    返回 (字面字符集合, 字符类别集合)；含有任意字符、取反、环视、锚点、反向引用等
+    无法静态分析的结构时返回 _ANY_CHAR。
+    """
+    literals, categories = set(), set()
+
+    def walk(items):
+        for op, av in items:
+            name = str(op)
+            if name == 'LITERAL':
+                literals.add(chr(av))
+            elif name == 'IN':
+                for sub_op, sub_av in av:
+                    sub_name = str(sub_op)
+                    if sub_name == 'LITERAL':
+                        literals.add(chr(sub_av))
+                    elif sub_name == 'RANGE' and sub_av[1] - sub_av[0] < 256:
+                        literals.update(chr(c) for c in range(sub_av[0], sub_av[1] + 1))
+                    elif sub_name == 'CATEGORY' and str(sub_av) in _CATEGORY_PATTERNS:
+                        categories.add(str(sub_av))
+                    else:
+                        return False
+            elif name == 'SUBPATTERN':
+                if not walk(av[-1]):
+                    return False
+            elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+                if not walk(av[-1]):
+                    return False
+            elif name == 'BRANCH':
+                if not all(walk(branch) for branch in av[1]):
+                    return False
+            else:  # ANY / NOT_LITERAL / AT / ASSERT / GROUPREF ...
+                return False
+        return True
+
+    parsed = _sre_parse.parse(pattern)
+    if not walk(parsed.data) or parsed.getwidth()[0] == 0:
+        return _ANY_CHAR
+    return literals, categories
+
+
+_CATEGORY_PATTERNS = {
+    'CATEGORY_DIGIT': re.compile(r'\d'),
+    'CATEGORY_WORD': re.compile(r'\w'),
+    'CATEGORY_SPACE': re.compile(r'\s'),
+}
+# 互不相交的字符类别组合（\d 与 \s、\w 与 \s）
+_DISJOINT_CATEGORIES = {frozenset({'CATEGORY_DIGIT', 'CATEGORY_SPACE'}),
+                        frozenset({'CATEGORY_WORD', 'CATEGORY_SPACE'})}
+
+
+def _charsets_disjoint(a, b) -> bool:
+    if a is _ANY_CHAR or b is _ANY_CHAR:
+        return False
+    (lit_a, cat_a), (lit_b, cat_b) = a, b
+    if lit_a & lit_b:
+        return False
+    for cat in cat_a:
+        if any(_CATEGORY_PATTERNS[cat].match(c) for c in lit_b):
+            return False
+    for cat in cat_b:
+        if any(_CATEGORY_PATTERNS[cat].match(c) for c in lit_a):
+            return False
+    return all(frozenset({x, y}) in _DISJOINT_CATEGORIES for x in cat_a for y in cat_b)
+
+
+def _text_charset(text: str):
+    return set(text), set()
+
+
+class _FusedSubstitution:
+    """
+    多条互不干扰的替换规则合并成一个交替正则，一次扫描完成全部替换。
+    仅在以下条件同时满足时合并（见 ParsePlan._fuse），保证结果与逐条执行完全一致：
+    各规则可匹配字符集两两不相交、替换文本不含其它规则可匹配的字符、
+    替换文本为纯字面量且规则不会匹配空串、不含环视/锚点/反向引用。
+    """
+
+    def __init__(self, rules: List[Tuple[str, str]]):
+        self.pattern = re.compile('|'.join(f'(?P<r{i}>{rex})' for i, (rex, _) in enumerate(rules)))
+        self._repls = {f'r{i}': repl for i, (_, repl) in enumerate(rules)}
+
+    def _replace(self, match) -> str:
+        return self._repls[match.lastgroup]
+
+    def sub(self, line: str) -> str:
+        return self.pattern.sub(self._replace, line)
+
+
+class _Substitution:
+    def __init__(self, rex: str, repl: str, count: int = 0):
+        self.pattern = re.compile(rex)
+        self.repl = repl
+        self.count = count
+
+    def sub(self, line: str) -> str:
+        return self.pattern.sub(self.repl, line, count=self.count)
+
+
+class ParsePlan:
+    """
+    由一条 parse_settings[...] 配置预先构建的解析计划：
+    正则全部预编译、替换顺序与 replace_once 预先展开，时间提取与 <DATETIME> 替换合并为一次扫描，
+    可安全合并的相邻替换规则合并为一个交替正则。
+    """
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.time_regex = re.compile(settings['time_regex'])
+        self.time_format = settings['time_format']
+        self.time_parser = get_time_parser(self.time_format)  # 按 time_format 专门化的快速时间解析
+        self.specific = [re.compile(rex) for rex in settings['specific']]
+        replace_once = settings.get('replace_once', [])
+        self.substitutions = self._fuse([
+            (rex, repl, 1 if i in replace_once else 0)
+            for i, (rex, repl) in enumerate(settings['substitute_regex'].items())
+        ])
+        self.splits = self._fuse([(rex, repl, 0) for rex, repl in settings['split_regex'].items()])
+
+    @staticmethod
+    def _fusable(rex: str, repl: str, count: int) -> bool:
+        return count == 0 and '\\' not in repl and _pattern_charset(rex) is not _ANY_CHAR
+
+    @classmethod
+    def _fuse(cls, rules: List[Tuple[str, str, int]]) -> List[Any]:
+        """按原顺序把相邻且互不干扰的规则合并，其余规则保持逐条执行"""
+        steps, group = [], []
+
+        def flush():
+            if len(group) > 1:
+                steps.append(_FusedSubstitution([(rex, repl) for rex, repl, _ in group]))
+            elif group:
+                steps.append(_Substitution(*group[0]))
+            group.clear()
+
+        for rex, repl, count in rules:
+            if cls._fusable(rex, repl, count) and group and all(
+                    _charsets_disjoint(_pattern_charset(rex), _pattern_charset(other))
+                    and _charsets_disjoint(_pattern_charset(rex), _text_charset(other_repl))
+                    and _charsets_disjoint(_text_charset(repl), _pattern_charset(other))
+                    for other, other_repl, _ in group):
+                group.append((rex, repl, count))
+                continue
+            flush()
+            if cls._fusable(rex, repl, count):
+                group.append((rex, repl, count))
+            else:
+                steps.append(_Substitution(rex, repl, count))
+        flush()
+        return steps
+
+    def extract_time(self, line: str) -> Tuple[Optional[str], str]:
+        """
+        一次扫描完成时间提取与替换：返回 (首个时间串, 替换为 <DATETIME> 后的行)。
+        常见情况只有一处时间：从首个匹配结束处继续查找不到第二处时直接拼接，否则回退到整行替换。
+        """
+        match = self.time_regex.search(line)
+        if match is None:
+            return None, line
+        start, end = match.span()
+        if end > start and self.time_regex.search(line, end) is None:
+            return match.group(1), line[:start] + '<DATETIME>' + line[end:]
+        return match.group(1), self.time_regex.sub('<DATETIME>', line)
+
+
+_plan_cache: Dict[int, Tuple[Dict[str, Any], ParsePlan]] = {}
+
+
+def get_parse_plan(settings: Dict[str, Any]) -> ParsePlan:
+    """每个 parse_settings[...] 配置只构建一次解析计划"""
+    cached = _plan_cache.get(id(settings))
+    if cached is None or cached[0] is not settings:
+        cached = _plan_cache[id(settings)] = (settings, ParsePlan(settings))
+    return cached[1]
+
+
+# ==== token 变量判定 ====
+TOKEN_CACHE_SIZE = 1 << 16  # token → 是否变量 的缓存上限（LRU）
+
+_PUNCTUATION = frozenset(string.punctuation)
+# 纯 ASCII token 的变量判定：以 < 开头 / 包含数字 / 全部为十六进制字符（含空串）
+_ASCII_VARIABLE = re.compile(r'<.*|.*[0-9].*|[0-9a-fA-F]*', re.DOTALL)
+
+
+def is_variable_token(token: str) -> bool:
+    """判断给定token是否为变量/动态值（原始实现，逐字符扫描）"""
+    # 已被标记为变量的情况 # 单个标点符号 # 包含数字 # 十六进制格式 # 时间相关缩写
+    return token == '' or \
+        token[0] == '<' or \
+        (len(token) == 1 and token[0] in string.punctuation) or \
+        any(char.isdigit() for char in token) or \
+        all('a' <= c.lower() <= 'f' or c.isdigit() for c in token) or \
+        token.upper() in date_alias
+
+
+def classify_token(token: str) -> bool:
+    """
+    与 is_variable_token 结果完全一致的快速判定：纯 ASCII token 用一次 fullmatch 代替三次逐字符扫描；
+    非 ASCII token（str.isdigit / str.lower 的 Unicode 语义与 ASCII 规则不同）回退到原始实现。
+    """
+    if not token.isascii():
+        return is_variable_token(token)
+    return _ASCII_VARIABLE.fullmatch(token) is not None or \
+        token in _PUNCTUATION or \
+        token.upper() in date_alias
+
+
+# 日志中 token 高度重复，缓存判定结果；maxsize 限制内存占用
+cached_classify_token = lru_cache(maxsize=TOKEN_CACHE_SIZE)(classify_token)
+
+
 # 默认运行配置参数
 default_running_settings = {
     'enable_time_parse': True,       # 是否启用时间解析
@@ -34,20 +271,51 @@ default_running_settings = {
     'exclude_dataset': {'Total'},    # 需要排除的数据集
     'specific_dataset': {'BGL'},          # 指定需要处理的数据集（空表示全部）
     'origin_data_type': 'log2csv',       # 原始数据类型（csv/raw/log2csv）
-    'log_data_dir': './dataset'         # 日志数据目录
+    'log_data_dir': './dataset',        # 日志数据目录
+    'parse_workers': 1,                 # 解析进程数，>1 时按字节区间并行解析（输出与串行逐字节一致）
+    'incremental': False,               # 增量解析：加载/保存模板库，只解析上次之后追加的日志行
+    'output_format': 'csv',             # 结构化输出格式（csv/parquet）
+    'parser': 'regex',                  # 模板挖掘算法：regex（静态 token 日志键）/ drain（Drain 解析树）
+    'validate_time': True,              # 是否按 time_format 校验内容中的时间串（格式不符的行报错跳过）
+    'epoch_column': False,              # CSV 输出是否追加纪元微秒列 EventTimeUs
+    'profile_output': None,             # 性能剖析输出前缀（None 表示不剖析）
+    'profile_window': 0,                # 剖析采集窗口（秒），0 表示整个运行过程
+    'profile_top': 30                   # 内存分配热点输出条数
 }
 
+# ==== 模板库持久化 ====
+STORE_VERSION = 1
+# 影响日志键（EventId）划分的配置项，任一变化都会使已保存的 EventId 失效
+_KEY_SETTINGS = ('time_regex', 'time_format', 'specific', 'substitute_regex', 'replace_once', 'split_regex')
+
+
+def _as_key(value):
+    """JSON 中的列表还原为元组（日志键及 findall 多分组结果均为元组）"""
+    return tuple(_as_key(v) for v in value) if isinstance(value, list) else value
+
+
 class LogParser:
+    parallel = True  # 各字节区间可独立解析后按日志键合并（见 merge_parser_state）
+
     def __init__(self, settings: Dict[str, Any], 
                  enable_time_parse: bool = True,
                  enable_specific_key: bool = True,
                  enable_regex_substitute: bool = True,
-                 enable_regex_split: bool = True):
+                 enable_regex_split: bool = True,
+                 use_parse_plan: bool = True,
+                 store_path: Optional[str] = None,
+                 validate_time: bool = True):
         self.settings = settings
+        # 预编译解析计划；use_parse_plan=False 时按原始配置逐条调用 re（用于差分校验）
+        self.plan = get_parse_plan(settings) if use_parse_plan else None
+        self._classify = cached_classify_token if use_parse_plan else is_variable_token
         self.enable_time_parse = enable_time_parse
         self.enable_specific_key = enable_specific_key
         self.enable_regex_substitute = enable_regex_substitute
         self.enable_regex_split = enable_regex_split
+        # 时间串只替换为 <DATETIME>、解析结果不会被使用；validate_time=True 时仍按 time_format 校验，
+        # 格式不符的行与原实现一样报错跳过，False 时完全跳过时间解析（这些行会被保留）
+        self.validate_time = validate_time
         
         # 状态维护
         self.key_id_map: Dict[Tuple, int] = {}
@@ -57,33 +325,37 @@ class LogParser:
         # 进度显示与调试
         self._processed_lines = 0
         self._cluster_stats = defaultdict(int)
+
+        # 模板库：跨运行保留 key_id_map/templates/_cluster_stats 及各输入文件的读取位置
+        self.store_path = store_path
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        if store_path and os.path.exists(store_path):
+            self.load_store(store_path)
     
     def is_variable(self, token: str) -> bool:
         """判断给定token是否为变量/动态值"""
-        # 已被标记为变量的情况 # 单个标点符号 # 包含数字 # 十六进制格式 # 时间相关缩写
-        return token == '' or \
-            token[0] == '<' or \
-            (len(token) == 1 and token[0] in string.punctuation) or \
-            any(char.isdigit() for char in token) or \
-            all('a' <= c.lower() <= 'f' or c.isdigit() for c in token) or \
-            token.upper() in date_alias
+        return self._classify(token)
 
     def parse_time(self, logline: str, time_regex: str, time_format: str):
         """从日志行中提取并标准化时间信息"""
         match = re.search(time_regex, logline)
         if match:
             data_str = match.group(1)
-            # 处理UNIX时间戳格式
-            if time_format == '%UNIX_TIMESTAMP':
-                date_obj = datetime.utcfromtimestamp(int(data_str))
-            else:
-                date_obj = datetime.strptime(match.group(1), time_format)
+            date_obj = self.to_datetime(data_str, time_format)
             # 替换时间部分为<DATETIME>标记
             logline = re.sub(time_regex, '<DATETIME>', logline)
             return date_obj, logline
         else:
             return None, logline
 
+    @staticmethod
+    def to_datetime(data_str: str, time_format: str) -> datetime:
+        """按 time_format 解析时间串（格式不符时抛出异常）"""
+        # 处理UNIX时间戳格式
+        if time_format == '%UNIX_TIMESTAMP':
+            return datetime.utcfromtimestamp(int(data_str))
+        return datetime.strptime(data_str, time_format)
+
     def generate_log_template(self, tokens: List[str]) -> str:
         """生成日志模板，将变量部分替换为<*>，并合并连续的变量"""
         template = []
@@ -126,6 +398,77 @@ class LogParser:
                     f'{template}'  # 保留原始模板的引号包裹
                 ])
 
+    def key_fingerprint(self) -> str:
+        """决定日志键划分的配置指纹（解析规则 + 开关）"""
+        relevant = {name: self.settings.get(name) for name in _KEY_SETTINGS}
+        relevant['switches'] = [self.enable_time_parse, self.enable_specific_key,
+                                self.enable_regex_substitute, self.enable_regex_split]
+        return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def save_store(self, path: Optional[str] = None) -> None:
+        """
+        将模板库写入 gzip 压缩的 JSON：按 EventId 顺序保存 [日志键, 模板, 出现次数]，以及各输入文件的读取位置。
+        先写临时文件再替换，中途中断不会损坏已有模板库。
+        """
+        path = path or self.store_path
+        if not path:
+            return
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        keys = sorted(self.key_id_map.items(), key=lambda item: item[1])
+        store = {
+            'version': STORE_VERSION,
+            'fingerprint': self.key_fingerprint(),
+            'events': [[list(key), self.templates[event_id], self._cluster_stats.get(event_id, 0)]
+                       for key, event_id in keys],
+            'sources': self.sources,
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(store, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def load_store(self, path: str) -> None:
+        """加载模板库；解析规则已变化时 EventId 不再可信，直接报错而不是静默重新编号"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            store = json.load(f)
+        if store.get('version') != STORE_VERSION or store.get('fingerprint') != self.key_fingerprint():
+            raise ValueError(f"模板库 {path} 与当前解析配置不一致，请删除该文件或改用新的模板库路径")
+        self.key_id_map, self.templates = {}, {}
+        self._cluster_stats = defaultdict(int)
+        for event_id, (key, template, count) in enumerate(store['events']):
+            self.key_id_map[_as_key(key)] = event_id
+            self.templates[event_id] = template
+            if count:
+                self._cluster_stats[event_id] = count
+        self.sources = store.get('sources', {})
+        logging.info(f"已加载模板库 {path}：{len(self.templates)} 个模板，{len(self.sources)} 个已解析文件")
+
+    def resume_point(self, input_path: str) -> Tuple[int, int, Optional[int]]:
+        """
+        返回 (起始字节, 已解析行数, 上次输出文件大小)。
+        文件只在末尾追加（已读部分指纹不变）时从上次位置继续；被轮转 / 截断 / 替换时从头解析。
+        压缩文件无法从中间继续，只有完全未变时才跳过。
+        """
+        source = self.sources.get(str(Path(input_path).resolve()))
+        if source is None:
+            return 0, 0, None
+        size = os.path.getsize(input_path)
+        offset = source['offset']
+        unchanged = size >= offset and file_fingerprint(input_path, offset) == source['fingerprint']
+        if unchanged and (not detect_compression(input_path) or size == offset):
+            return offset, source['lines'], source.get('output_size')
+        logging.info(f"{input_path} 已被轮转或改写，从头解析（EventId 保持不变）")
+        return 0, 0, None
+
+    def record_source(self, input_path: str, offset: int, lines: int, output_path: str) -> None:
+        """记录输入文件已解析到的位置及对应结构化输出的大小"""
+        self.sources[str(Path(input_path).resolve())] = {
+            'offset': offset,
+            'lines': lines,
+            'fingerprint': file_fingerprint(input_path, offset),
+            'output_size': os.path.getsize(output_path),
+        }
+
     def parse_line(self, raw_line: str) -> Tuple[str, str]:
         """单行日志解析核心逻辑"""
         self._processed_lines += 1
@@ -133,6 +476,64 @@ class LogParser:
             logging.info(f"已处理 {self._processed_lines} 行日志...")
 
         line = raw_line.strip()
+        if self.plan is not None:
+            line, specific_keys = self._apply_plan(line)
+        else:
+            line, specific_keys = self._apply_settings(line)
+
+        # 生成tokens和日志键
+        tokens = [t for t in line.split() if t]
+        is_variable = self.is_variable
+        static_tokens = [t for t in tokens if not is_variable(t)]
+        log_key = tuple(static_tokens + specific_keys)
+
+        # 分配事件ID并生成模板
+        if log_key not in self.key_id_map:
+            event_id = len(self.key_id_map)
+            self.key_id_map[log_key] = event_id
+            self.templates[event_id] = self.generate_log_template(tokens)
+        
+        event_id = self.key_id_map[log_key]
+        self._cluster_stats[event_id] += 1
+
+        return f"E{event_id}", self.templates[event_id]
+
+    def iter_records(self, lines: Iterable[str], start_line_id: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        流式解析：逐行产出结构化记录 dict（headers 各列，含 LineId/Content/EventId/EventTemplate），不写任何文件。
+        LineId 从 start_line_id 起按输入行计数；字段数不足或解析失败的行与 transform_log_to_csv 一样跳过。
+        """
+        headers = self.settings['headers']
+        for line_id, raw_line in enumerate(lines, start_line_id):
+            try:
+                structured = build_structured_row(line_id, raw_line, headers, self)
+            except Exception as e:
+                logging.error(f"处理行 {line_id} 失败: {str(e)}")
+                continue
+            if structured is not None:
+                yield dict(zip(headers, structured))
+
+    def _apply_plan(self, line: str) -> Tuple[str, List[str]]:
+        """按预编译解析计划执行 时间替换 → 特定键提取 → 正则替换 → 分割"""
+        plan = self.plan
+        specific_keys = []
+        if self.enable_time_parse:
+            time_str, line = plan.extract_time(line)
+            if time_str is not None and self.validate_time:
+                plan.time_parser(time_str)  # 保持原有校验：格式不符的行报错跳过（结果与 strptime 一致）
+        if self.enable_specific_key:
+            for pattern in plan.specific:
+                specific_keys.extend(pattern.findall(line))
+        if self.enable_regex_substitute:
+            for step in plan.substitutions:
+                line = step.sub(line)
+        if self.enable_regex_split:
+            for step in plan.splits:
+                line = step.sub(line)
+        return line, specific_keys
+
+    def _apply_settings(self, line: str) -> Tuple[str, List[str]]:
+        """原始实现：每行按配置中的正则字符串逐条调用 re"""
         specific_keys = []
 
         # 时间解析
@@ -157,84 +558,229 @@ class LogParser:
             for rex, repl in self.settings['split_regex'].items():
                 line = re.sub(rex, repl, line)
 
-        # 生成tokens和日志键
-        tokens = [t for t in line.split() if t]
-        static_tokens = [t for t in tokens if not self.is_variable(t)]
-        log_key = tuple(static_tokens + specific_keys)
+        return line, specific_keys
 
-        # 分配事件ID并生成模板
-        if log_key not in self.key_id_map:
-            event_id = len(self.key_id_map)
-            self.key_id_map[log_key] = event_id
+
+# ==== Drain 解析树 ====
+DRAIN_DEPTH = 4             # 解析树深度：长度层 + (DRAIN_DEPTH - 2) 层前缀 token + 叶子层
+DRAIN_SIM_THRESHOLD = 0.4   # 叶子内相似度阈值，低于阈值新建簇
+DRAIN_MAX_CHILDREN = 100    # 内部节点的最大子节点数，超出后归入 <*> 子节点
+DRAIN_MAX_CLUSTERS = 64     # 每个叶子参与匹配的簇数上限（按最近命中淘汰），限制单行匹配开销
+WILDCARD = '<*>'
+
+
+class DrainParser(LogParser):
+    """
+    Drain 风格的在线模板挖掘：固定深度解析树 长度(+特定键) → 前缀 token → 叶子簇列表，
+    叶子内按位置相似度选簇，命中后把不一致的位置泛化为 <*>，未命中则新建簇。
+    预处理（时间、特定键、正则替换/分割）与 LogParser 相同，is_variable 判定为变量的 token 预先记为 <*>。
+    EventId 为簇编号，首次出现时分配、之后不变；模板随合并逐步泛化，
+    结构化输出中的 EventTemplate 为解析该行时的模板，save_templates 写出最终模板。
+    簇状态依赖全局解析顺序，不支持多进程合并与模板库持久化。
+    """
+    parallel = False
+
+    def __init__(self, settings: Dict[str, Any],
+                 depth: int = DRAIN_DEPTH,
+                 sim_threshold: float = DRAIN_SIM_THRESHOLD,
+                 max_children: int = DRAIN_MAX_CHILDREN,
+                 max_clusters: int = DRAIN_MAX_CLUSTERS,
+                 **kwargs):
+        if kwargs.get('store_path'):
+            raise ValueError("DrainParser 不支持模板库持久化，请使用默认解析器进行增量解析")
+        super().__init__(settings, **kwargs)
+        self.prefix_depth = max(depth - 2, 0)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.root: Dict[Any, Any] = {}
+        self.cluster_tokens: List[List[str]] = []  # EventId → 当前模板 token（含 <*>）
+
+    def parse_line(self, raw_line: str) -> Tuple[str, str]:
+        """单行日志解析：下行到叶子 → 选簇 / 新建簇 → 合并模板"""
+        self._processed_lines += 1
+        if self._processed_lines % 1000000 == 0:
+            logging.info(f"已处理 {self._processed_lines} 行日志...")
+
+        line = raw_line.strip()
+        if self.plan is not None:
+            line, specific_keys = self._apply_plan(line)
+        else:
+            line, specific_keys = self._apply_settings(line)
+
+        is_variable = self.is_variable
+        tokens = [WILDCARD if is_variable(t) else t for t in line.split()]
+        leaf = self._leaf(tokens, specific_keys)
+        event_id = self._match(leaf, tokens)
+        if event_id is None:
+            event_id = len(self.cluster_tokens)
+            self.cluster_tokens.append(tokens)
             self.templates[event_id] = self.generate_log_template(tokens)
-        
-        event_id = self.key_id_map[log_key]
-        self._cluster_stats[event_id] += 1
+            leaf[event_id] = None
+            if len(leaf) > self.max_clusters:
+                leaf.popitem(last=False)  # 淘汰最久未命中的簇（已分配的 EventId 与模板保留）
+        else:
+            leaf.move_to_end(event_id)
+            template = self.cluster_tokens[event_id]
+            changed = False
+            for i, token in enumerate(tokens):
+                if template[i] != token and template[i] != WILDCARD:
+                    template[i] = WILDCARD
+                    changed = True
+            if changed:
+                self.templates[event_id] = self.generate_log_template(template)
 
+        self._cluster_stats[event_id] += 1
         return f"E{event_id}", self.templates[event_id]
 
+    def _leaf(self, tokens: List[str], specific_keys: List[Any]) -> OrderedDict:
+        """沿 长度(+特定键) → 前缀 token 下行，返回叶子（EventId 的有序字典，按最近命中排序）"""
+        node = self.root.setdefault((len(tokens), tuple(specific_keys)), {})
+        for token in tokens[:self.prefix_depth]:
+            child = node.get(token)
+            if child is None:
+                if len(node) >= self.max_children:
+                    token = WILDCARD
+                child = node.setdefault(token, {})
+            node = child
+        leaf = node.get(None)
+        if leaf is None:
+            leaf = node[None] = OrderedDict()
+        return leaf
+
+    def _match(self, leaf: OrderedDict, tokens: List[str]) -> Optional[int]:
+        """
+        叶子内选相似度最高的簇：相似度 = 与模板逐位置相同的 token 占比（变量 token 与 <*> 视为相同），
+        并列时取模板中 <*> 较多（更泛化）者；最高相似度低于阈值时返回 None。
+        """
+        best, best_sim, best_params = None, -1.0, -1
+        length = len(tokens)
+        for event_id in leaf:
+            template = self.cluster_tokens[event_id]
+            same = params = 0
+            for expected, token in zip(template, tokens):
+                if expected == token:
+                    same += 1
+                elif expected == WILDCARD:
+                    params += 1
+            sim = same / length if length else 1.0
+            if sim > best_sim or (sim == best_sim and params > best_params):
+                best, best_sim, best_params = event_id, sim, params
+        return best if best_sim >= self.sim_threshold else None
+
+
+PARSERS = {'regex': LogParser, 'drain': DrainParser}
+
+
+def split_fields(line_id: int, raw_line: str, headers: List[str]) -> Optional[List[Any]]:
+    """
+    将一行原始日志按 headers 切分为 [LineId, 各头部字段..., Content]（不含 EventId/EventTemplate）。
+    字段数不足时返回 None。
+    """
+    content_index = len(headers) - 3  # 倒数第三列为Content
+    parts = raw_line.strip().split()
+
+    # 动态验证字段数（保留最后三个字段给Content+EventId+EventTemplate）
+    if len(parts) < (content_index - 1):  # LineId不占用parts位置
+        return None
+
+    # 动态构建基础结构
+    structured = [line_id]  # LineId
+    # 填充中间字段（从parts按顺序取）
+    for i in range(content_index - 1):  # 跳过LineId和最后三个字段
+        if i < len(parts):
+            structured.append(parts[i])
+        else:
+            structured.append("")  # 补空值
+
+    # 处理Content（合并剩余部分）
+    content = ' '.join(parts[content_index-1:])  # 注意索引偏移
+    structured.append(content)
+    return structured
+
+
+def build_structured_row(line_id: int, raw_line: str, headers: List[str],
+                         parser: LogParser) -> Optional[List[Any]]:
+    """
+    将一行原始日志按 headers 切分为结构化字段，并实时解析出 EventId/EventTemplate。
+    字段数不足时返回 None。
+    """
+    structured = split_fields(line_id, raw_line, headers)
+    if structured is None:
+        return None
+
+    # 实时解析并填充最后两列
+    event_id, template = parser.parse_line(structured[-1])
+    structured.extend([event_id, template])
+    return structured
+
 
 def transform_log_to_csv(input_path: str, 
                         output_path: str, 
                         parser: LogParser,
-                        chunk_size: int = 5000) -> None:
-    """改进后的日志转换函数，支持分块处理和实时解析"""
-    # 预读文件获取总行数（用于进度条）
-    with open(input_path, 'r', encoding='utf-8') as f:
-        total_lines = sum(1 for _ in f)
-    
+                        chunk_size: int = 5000,
+                        workers: int = 1,
+                        incremental: bool = False,
+                        epoch_column: bool = False) -> None:
+    """
+    改进后的日志转换函数，支持分块处理和实时解析；workers>1 时多进程并行解析。
+    incremental=True 时只解析上次记录位置之后的完整行并续写输出，结束后保存模板库（parser.store_path）。
+    output_path 以 .parquet 结尾时写出 Parquet（字典编码列 + EventTime 时间列）；
+    epoch_column=True 时 CSV 额外写出按 timestamp_columns 解析的纪元微秒列 EventTimeUs。
+    """
     # 用户自定义列表头部种类
     headers = parser.settings['headers']
+    compressed = detect_compression(input_path)
 
-    with open(input_path, 'r', encoding='utf-8') as f_in, \
-         open(output_path, 'w', newline='', encoding='utf-8') as f_out:
-        
-        writer = csv.writer(f_out)
-        writer.writerow(headers)
-        
-        chunk = []
-        logging.info(f"开始处理文件: {input_path}")
+    start, line_offset, append_size, end = 0, 0, None, None
+    if incremental:
+        if is_parquet(output_path):
+            raise ValueError("增量解析需要可续写的 CSV 输出，Parquet 输出请关闭 incremental")
+        start, line_offset, append_size = parser.resume_point(input_path)
+        end = None if compressed else complete_end(input_path)
+        if start >= (os.path.getsize(input_path) if end is None else end):
+            logging.info(f"{input_path} 没有新增日志行")
+            return
+        logging.info(f"增量解析 {input_path}：从第 {start} 字节（第 {line_offset + 1} 行）开始")
 
-        content_index = len(headers) - 3  # 倒数第三列为Content
+    if workers > 1 and compressed:
+        logging.warning(f"压缩文件无法按字节区间切分，改为串行解析: {input_path}")
+    elif workers > 1 and not parser.parallel:
+        logging.warning(f"{type(parser).__name__} 的解析状态无法按区间合并，改为串行解析: {input_path}")
+    elif workers > 1:
+        line_count = transform_log_to_csv_parallel(input_path, output_path, parser, workers,
+                                                   start=start, end=end, line_offset=line_offset,
+                                                   append_size=append_size, epoch_column=epoch_column)
+        if incremental:
+            parser.record_source(input_path, end, line_count, output_path)
+            parser.save_store()
+        return
 
-        # 添加进度条
-        with tqdm(total=total_lines, desc="Processing logs", unit="line") as pbar:
-            for line_id, raw_line in enumerate(f_in, 1):
-                # 分块处理逻辑
-                if line_id % chunk_size == 0:
-                    writer.writerows(chunk)
-                    chunk = []
-                    logging.debug(f"已写入 {line_id} 行到临时文件")
+    # 单遍读取：进度条按已读字节数显示，支持 .gz/.zst 压缩输入
+    reader = LineReader(input_path, desc="Processing logs") if compressed else \
+        LineReader(input_path, start=start, end=end, desc="Processing logs")
+    with reader as f_in, \
+         open_structured_output(output_path, headers, parser.settings, append_size, epoch_column) as writer:
+        chunk = []
+        logging.info(f"开始处理文件: {input_path}")
 
-                parts = raw_line.strip().split()
+        line_id = line_offset
+        for line_id, raw_line in enumerate(f_in, line_offset + 1):
+            # 分块处理逻辑
+            if line_id % chunk_size == 0:
+                writer.writerows(chunk)
+                chunk = []
+                logging.debug(f"已写入 {line_id} 行到临时文件")
+                profile_checkpoint()
 
-                # 动态验证字段数（保留最后三个字段给Content+EventId+EventTemplate）
-                if len(parts) < (content_index - 1):  # LineId不占用parts位置
+            try:
+                structured = build_structured_row(line_id, raw_line, headers, parser)
+                # 字段数不足的行直接跳过
+                if structured is None:
                     continue
-
-                try:
-                    # 动态构建基础结构
-                    structured = [line_id]  # LineId
-                    # 填充中间字段（从parts按顺序取）
-                    for i in range(content_index - 1):  # 跳过LineId和最后三个字段
-                        if i < len(parts):
-                            structured.append(parts[i])
-                        else:
-                            structured.append("")  # 补空值
-                    
-                    # 处理Content（合并剩余部分）
-                    content = ' '.join(parts[content_index-1:])  # 注意索引偏移
-                    structured.append(content)
-                    
-                    # 实时解析并填充最后两列
-                    event_id, template = parser.parse_line(structured[-1])
-                    structured.extend([event_id, template])
-                    
-                    chunk.append(structured)
-                except Exception as e:
-                    logging.error(f"处理行 {line_id} 失败: {str(e)}")
-
-                pbar.update(1)  # 更新进度条
+                chunk.append(structured)
+            except Exception as e:
+                logging.error(f"处理行 {line_id} 失败: {str(e)}")
         
         # 写入剩余数据
         if chunk:
@@ -244,9 +790,144 @@ def transform_log_to_csv(input_path: str,
         logging.info(f"生成 {len(parser.templates)} 个日志模板")
         logging.info(f"事件分布统计: {dict(parser._cluster_stats)}")
 
+    if incremental:
+        parser.record_source(input_path, reader.end, line_id, output_path)
+        parser.save_store()
+
 
-def run_benchmark(running_settings: Dict[str, Any]) -> None:
-    """改进后的基准测试函数"""
+# ==== 多进程并行解析 ====
+PARALLEL_CHUNK_BYTES = 16 << 20  # 每个并行任务处理的字节数（按换行对齐）
+
+
+def _parse_byte_range(task: Tuple[str, int, int, Dict[str, Any], Dict[str, bool]]) -> Dict[str, Any]:
+    """
+    子进程任务：用独立的 LogParser 解析一个字节区间。
+    行号与 EventId 都是区间内的局部编号，由主进程按区间顺序换算为全局编号。
+    """
+    input_path, start, end, settings, options = task
+    parser = LogParser(settings, **options)
+    headers = settings['headers']
+    rows, errors = [], []
+    line_count = 0
+    with LineReader(input_path, start=start, end=end) as reader:
+        for line_count, raw_line in enumerate(reader, 1):
+            try:
+                structured = split_fields(line_count, raw_line, headers)
+                if structured is None:
+                    continue
+                event_id, _ = parser.parse_line(structured[-1])
+                structured.append(int(event_id[1:]))  # 局部 EventId，模板由主进程统一填充
+                rows.append(structured)
+            except Exception as e:
+                errors.append((line_count, str(e)))
+    return {
+        'bytes': end - start,
+        'lines': line_count,
+        'rows': rows,
+        'errors': errors,
+        'key_id_map': parser.key_id_map,
+        'templates': parser.templates,
+        'cluster_stats': dict(parser._cluster_stats),
+        'processed_lines': parser._processed_lines,
+    }
+
+
+def merge_parser_state(parser: LogParser, result: Dict[str, Any]) -> Dict[int, int]:
+    """
+    把一个区间的解析状态并入主解析器，返回 局部 EventId → 全局 EventId。
+    区间按文件顺序合并、区间内按局部首次出现顺序分配，全局 EventId 与串行解析的首次出现顺序一致；
+    模板取全局首次出现时生成的模板。
+    """
+    remap = {}
+    for key, local_id in sorted(result['key_id_map'].items(), key=lambda item: item[1]):
+        global_id = parser.key_id_map.get(key)
+        if global_id is None:
+            global_id = parser.key_id_map[key] = len(parser.key_id_map)
+            parser.templates[global_id] = result['templates'][local_id]
+        remap[local_id] = global_id
+    for local_id, count in result['cluster_stats'].items():
+        parser._cluster_stats[remap[local_id]] += count
+    parser._processed_lines += result['processed_lines']
+    return remap
+
+
+def transform_log_to_csv_parallel(input_path: str,
+                                  output_path: str,
+                                  parser: LogParser,
+                                  workers: int,
+                                  chunk_bytes: int = PARALLEL_CHUNK_BYTES,
+                                  start: int = 0,
+                                  end: Optional[int] = None,
+                                  line_offset: int = 0,
+                                  append_size: Optional[int] = None,
+                                  epoch_column: bool = False) -> int:
+    """
+    多进程版 transform_log_to_csv：按换行对齐的字节区间分发到进程池解析，
+    主进程按区间顺序合并 key_id_map/templates/_cluster_stats 并按原始行序写出，结果与串行模式逐字节一致。
+    同时在途的区间数限制为 2×workers，避免已完成但未轮到写出的区间堆积在内存中。
+    start/end/line_offset/append_size 供增量解析使用，epoch_column 同 transform_log_to_csv；返回累计行数。
+    """
+    headers = parser.settings['headers']
+    options = dict(enable_time_parse=parser.enable_time_parse,
+                   enable_specific_key=parser.enable_specific_key,
+                   enable_regex_substitute=parser.enable_regex_substitute,
+                   enable_regex_split=parser.enable_regex_split,
+                   use_parse_plan=parser.plan is not None,
+                   validate_time=parser.validate_time)
+    ranges = split_byte_ranges(input_path, chunk_bytes, start, end)
+    tasks = iter([(input_path, range_start, range_end, parser.settings, options)
+                  for range_start, range_end in ranges])
+
+    total_bytes = ranges[-1][1] - start if ranges else 0
+    with open_structured_output(output_path, headers, parser.settings, append_size, epoch_column) as writer, \
+         multiprocessing.Pool(workers) as pool, \
+         tqdm(total=total_bytes, desc="Processing logs", unit="B", unit_scale=True) as pbar:
+        logging.info(f"开始并行处理文件: {input_path}（{workers} 进程）")
+
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_parse_byte_range, (task,)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            result = pending.popleft().get()
+            for task in tasks:
+                pending.append(pool.apply_async(_parse_byte_range, (task,)))
+                break
+
+            remap = merge_parser_state(parser, result)
+            for line_id, message in result['errors']:
+                logging.error(f"处理行 {line_id + line_offset} 失败: {message}")
+            rows = result['rows']
+            for row in rows:
+                event_id = remap[row[-1]]
+                row[0] += line_offset
+                row[-1] = f"E{event_id}"
+                row.append(parser.templates[event_id])
+            writer.writerows(rows)
+            line_offset += result['lines']
+            pbar.update(result['bytes'])
+            profile_checkpoint()
+
+    logging.info(f"完成处理，共处理 {parser._processed_lines} 行日志")
+    logging.info(f"生成 {len(parser.templates)} 个日志模板")
+    logging.info(f"事件分布统计: {dict(parser._cluster_stats)}")
+    return line_offset
+
+
+def run_benchmark(running_settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    逐个数据集执行解析并返回各数据集的行数、耗时与模板数。
+    跨数据集的吞吐 / 峰值内存 / 分组准确率报告见 parse_benchmark.py。
+    """
+    profiler = ProfileSession(running_settings.get('profile_output'),
+                              window=running_settings.get('profile_window', 0),
+                              top_n=running_settings.get('profile_top', 30))
+    with profiler:
+        return _run_benchmark(running_settings)
+
+
+def _run_benchmark(running_settings: Dict[str, Any]) -> List[Dict[str, Any]]:
     log_data_dir = Path(running_settings["log_data_dir"])
     
     # 获取所有子目录名称作为数据集类型（过滤非目录项）
@@ -269,31 +950,76 @@ def run_benchmark(running_settings: Dict[str, Any]) -> None:
 
 
         # log_type.name = 'BGL2'
-        # 初始化日志解析器
-        parser = LogParser(
+        # 初始化日志解析器（增量模式下加载该数据集的模板库）
+        incremental = running_settings.get('incremental', False)
+        store_path = log_data_dir / log_type / f"{log_type}.log_template_store.json.gz"  # 模板库
+        parser_cls = PARSERS[running_settings.get('parser', 'regex')]
+        parser = parser_cls(
             settings=parse_settings[log_type],
             enable_time_parse=running_settings['enable_time_parse'],
             enable_specific_key=running_settings['enable_specific_key'],
             enable_regex_substitute=running_settings['enable_regex_substitute'],
-            enable_regex_split=running_settings['enable_regex_split']
+            enable_regex_split=running_settings['enable_regex_split'],
+            validate_time=running_settings.get('validate_time', True),
+            store_path=str(store_path) if incremental else None
         )
         
         # 构建文件路径
         raw_log_path = log_data_dir / log_type / f"{log_type}.log"  # 原始日志文件
-        structured_log_path = log_data_dir / log_type / f"{log_type}.log_structured.csv"  # 结构化日志文件
+        output_format = running_settings.get('output_format', 'csv')
+        structured_log_path = log_data_dir / log_type / f"{log_type}.log_structured.{output_format}"  # 结构化日志文件
         output_template_path = log_data_dir / log_type / f"{log_type}.log_template.csv"  # 原始日志文件
            
         # 执行转换和解析
+        started = time.perf_counter()
         transform_log_to_csv(
             input_path=str(raw_log_path),
             output_path=str(structured_log_path),
             parser=parser,
-            chunk_size=20000  # 20万条数据分10块处理
+            chunk_size=20000,  # 20万条数据分10块处理
+            workers=running_settings.get('parse_workers', 1),
+            incremental=incremental,
+            epoch_column=running_settings.get('epoch_column', False)
         )
         
+        elapsed = time.perf_counter() - started
+        lines = parser._processed_lines
+        benchmark_result.append({'dataset': log_type, 'lines': lines, 'seconds': round(elapsed, 3),
+                                 'templates': len(parser.templates)})
+        if running_settings['parse_result_output']:
+            print(f"{lines:>10} 行  {lines / elapsed if elapsed else 0:>12,.0f} 行/s  模板 {len(parser.templates)}")
+
         # 保存模板信息
         parser.save_templates(output_template_path)
 
+    return benchmark_result
+
 if __name__ == "__main__":
-    print("begin")
-    run_benchmark(default_running_settings)
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="日志解析与模板提取")
+    arg_parser.add_argument("--workers", type=int, default=default_running_settings['parse_workers'],
+                            help="解析进程数，>1 时按字节区间多进程并行解析")
+    arg_parser.add_argument("--output-format", choices=['csv', 'parquet'],
+                            default=default_running_settings['output_format'],
+                            help="结构化日志输出格式（parquet 需安装 pyarrow）")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="增量解析：复用模板库中的 EventId，只解析上次之后追加的日志行")
+    arg_parser.add_argument("--parser", choices=sorted(PARSERS), default=default_running_settings['parser'],
+                            help="模板挖掘算法：regex 为静态 token 日志键，drain 为 Drain 风格解析树")
+    arg_parser.add_argument("--skip-time-validation", action="store_true",
+                            help="跳过内容中时间串的格式校验（时间格式不符的行不再被丢弃）")
+    arg_parser.add_argument("--epoch-column", action="store_true",
+                            help="CSV 输出追加纪元微秒列 EventTimeUs（按 settings 的 timestamp_columns 解析）")
+    add_profile_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    running_settings = dict(default_running_settings)
+    running_settings.update(parse_workers=args.workers,
+                            incremental=args.incremental,
+                            output_format=args.output_format,
+                            parser=args.parser,
+                            validate_time=not args.skip_time_validation,
+                            epoch_column=args.epoch_column,
+                            profile_output=args.profile,
+                            profile_window=args.profile_window,
+                            profile_top=args.profile_top)
+    run_benchmark(running_settings)
\ No newline at end of file
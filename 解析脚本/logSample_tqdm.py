@@ -1,11 +1,16 @@
+import argparse
 import pandas as pd
 import os
+import sys
 import logging
-from tqdm import tqdm
 from collections import deque
 from settings import parse_settings
+from line_reader import LineReader
 from heapq import heappush, heappop
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 复用项目根目录下的公共工具
+from profile_utils import ProfileSession, add_profile_arguments, profile_checkpoint
+
 def setup_logging(output_dir, log_type, radio):
     """配置增强型日志记录"""
     log_file = os.path.join(output_dir, f"{log_type}_opt_{radio}_sample.log")
@@ -168,8 +173,14 @@ def proportional_allocation(distribution, target):
     return allocation
 
 
-def optimized_sampling(log_type, radio, scheme='anomaly_based'):
-    """优化后的采样主函数"""
+def optimized_sampling(log_type, radio, scheme='anomaly_based',
+                       profile_output=None, profile_window=0, profile_top=30, data_format='csv'):
+    """优化后的采样主函数（profile_output 非空时开启性能剖析；data_format 为 csv 或 parquet）"""
+    with ProfileSession(profile_output, window=profile_window, top_n=profile_top):
+        _optimized_sampling(log_type, radio, scheme, data_format)
+
+
+def _optimized_sampling(log_type, radio, scheme, data_format='csv'):
     # 初始化配置
     config = parse_settings[log_type]
     headers = config['headers']
@@ -179,19 +190,30 @@ def optimized_sampling(log_type, radio, scheme='anomaly_based'):
     # 路径配置
     log_data_dir = './dataset'
     input_dir = os.path.join(log_data_dir, log_type)
-    raw_log_file = os.path.join(input_dir, f"{log_type}.log_structured.csv")
-    output_file = os.path.join(input_dir, f"{log_type}_opt_{radio}.csv")
+    raw_log_file = os.path.join(input_dir, f"{log_type}.log_structured.{data_format}")
+    output_file = os.path.join(input_dir, f"{log_type}_opt_{radio}.{data_format}")
     
     setup_logging(input_dir, log_type, radio)
     
     # 高效数据读取
     logging.info("🔄 开始读取数据文件...")
-    chunks = []
-    for chunk in tqdm(pd.read_csv(raw_log_file, chunksize=100000, header=0, names=headers),
-                      desc="数据读取进度",
-                      unit="chunk"):
-        chunks.append(chunk)
-    df = pd.concat(chunks, axis=0)
+    if data_format == 'parquet':
+        # 列式输入：字典编码列直接读为 category，时间列保持类型，无需逐行解析文本
+        df = pd.read_parquet(raw_log_file)
+        profile_checkpoint()
+    else:
+        chunks = []
+        # 按文件自带的表头读取：解析时开启 epoch_column 的 CSV 在行尾多一列 EventTimeUs，
+        # 用 names=headers 覆盖表头会让 pandas 把首列当作索引、其余列整体错位
+        with LineReader(raw_log_file, desc="数据读取进度") as reader:  # 按已读字节数显示进度，支持 .gz/.zst
+            for chunk in pd.read_csv(reader.binary(), chunksize=100000, header=0):
+                chunks.append(chunk)
+                profile_checkpoint()
+        df = pd.concat(chunks, axis=0)
+    missing_columns = [h for h in headers if h not in df.columns]
+    if missing_columns:
+        logging.error(f"结构化文件缺少配置中的列：{missing_columns}")
+        return
     
     # 数据预处理
     logging.info("🔍 进行数据预处理...")
@@ -213,7 +235,8 @@ def optimized_sampling(log_type, radio, scheme='anomaly_based'):
     logging.info(f"📈 目标异常样本数：{target_anomaly}（基于{total_normal}正常样本）")
      
     # 异常事件分布分析
-    anomaly_dist = anomaly_df[event_id_col].value_counts().to_dict()
+    # Parquet 读入的 EventId 为 category，value_counts 会带上计数为 0 的类别，这里去掉
+    anomaly_dist = {k: v for k, v in anomaly_df[event_id_col].value_counts().to_dict().items() if v > 0}
     logging.info(f"\n原始异常事件分布（共{len(anomaly_dist)}类）：")
     # for event, count in sorted(anomaly_dist.items(), key=lambda x: x[1], reverse=True):
     #     logging.info(f"  - {event}: {count} 条")
@@ -268,6 +291,7 @@ def optimized_sampling(log_type, radio, scheme='anomaly_based'):
             sampled = event_data.sample(n=sample_size, random_state=42)
             sampled_anomaly.append(sampled)
             logging.info(f"{event_id}: 采样 {len(sampled)}/{quota} 条")
+            profile_checkpoint()
         anomaly_sample = pd.concat(sampled_anomaly)
     else:
         anomaly_sample = anomaly_df.copy()
@@ -304,7 +328,10 @@ def optimized_sampling(log_type, radio, scheme='anomaly_based'):
     
     # 保存结果
     logging.info("💾 保存采样结果...")
-    final_df.to_csv(output_file, index=False)
+    if data_format == 'parquet':
+        final_df.to_parquet(output_file, index=False)
+    else:
+        final_df.to_csv(output_file, index=False)
     logging.info(f"✅ 采样完成！结果已保存至：{output_file}")
     
     # 最终统计
@@ -314,9 +341,19 @@ def optimized_sampling(log_type, radio, scheme='anomaly_based'):
     logging.info(f"  - 总计：{len(final_df)} 条")
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="结构化日志平衡采样")
+    arg_parser.add_argument("--format", choices=['csv', 'parquet'], default='csv',
+                            help="结构化日志格式（与 logParser_main.py --output-format 一致）")
+    add_profile_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
     # 示例调用
     optimized_sampling(
         log_type="HDFS",
         radio=10,
-        scheme="anomaly_labels" #normal_based | anomaly_labels
+        scheme="anomaly_labels", #normal_based | anomaly_labels
+        profile_output=args.profile,
+        profile_window=args.profile_window,
+        profile_top=args.profile_top,
+        data_format=args.format
     )
\ No newline at end of file
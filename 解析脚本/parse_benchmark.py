@@ -0,0 +1,197 @@
+"""
+解析基准套件：对 parse_settings（或 parse_settings_plus）中目录存在的每个数据集，在独立子进程中执行 transform_log_to_csv，
+统计吞吐（行/s）、峰值内存（RSS）、模板数，以及相对 loghub 标注的分组准确率（标注文件的查找规则见 parser_bench.ground_truth_path，
+解析器自身的 {log_type}.log_structured.csv 不会被当作标注；结构化输出写到临时目录，不会覆盖数据集目录中的任何文件），
+结果写成 JSON 报告。指定 --baseline 时与历史报告逐项比较：吞吐下降超过容忍度或分组准确率降低时以非零状态退出。
+
+用法：
+    python parse_benchmark.py --log-data-dir ./dataset --output parse_benchmark.json
+    python parse_benchmark.py --log-data-dir ./dataset --settings plus --parser regex drain --baseline parse_benchmark.json
+    python parse_benchmark.py --log-data-dir ./dataset --dataset HDFS --truth HDFS=./loghub/HDFS_2k.log_structured.csv
+"""
+import argparse
+import csv
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource  # 仅 Unix 可用，Windows 上不统计峰值内存
+except ImportError:
+    resource = None
+
+from logParser_main import PARSERS, transform_log_to_csv
+from parse_diff_check import SETTINGS
+from parser_bench import grouping_accuracy, ground_truth_path, load_ground_truth, parse_all, parse_truth_args
+
+# ==== 配置参数 ====
+REPORT_PATH = "parse_benchmark.json"
+REGRESSION_TOLERANCE = 0.10   # 吞吐较基线下降超过该比例视为回退
+TIMEOUT = 6 * 3600            # 单个数据集的最长运行时间（秒）
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）；不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)  # macOS 单位为字节，Linux 为 KB
+
+
+# ==== 单个数据集（子进程内执行） ====
+def run_dataset(dataset_dir: Path, log_type: str, settings, parser_name: str, truth_path=None):
+    """
+    有原始日志时完整执行 transform_log_to_csv（结构化 CSV 写到当前目录，即 run_isolated 的临时目录），按 LineId 与标注对齐；
+    只有 loghub 标注文件时直接解析其 Content 列。
+    """
+    truth_path = ground_truth_path(dataset_dir, log_type, truth_path)
+    truth = load_ground_truth(truth_path)
+    raw_log = dataset_dir / f"{log_type}.log"
+    parser = PARSERS[parser_name](settings)
+    if raw_log.exists() and settings.get('headers'):
+        output_path = Path.cwd() / f"{log_type}.log_structured.csv"
+        if output_path.resolve().parent == dataset_dir.resolve() or \
+                (truth_path is not None and output_path.resolve() == truth_path.resolve()):
+            raise RuntimeError(f"结构化输出 {output_path} 会覆盖数据集目录中的文件")
+        started = time.perf_counter()
+        transform_log_to_csv(str(raw_log), str(output_path), parser, chunk_size=20000)
+        elapsed = time.perf_counter() - started
+        with open(output_path, newline='', encoding='utf-8') as f:
+            event_ids = {int(row['LineId']): row['EventId'] for row in csv.DictReader(f)}
+        pred = [event_ids.get(line_id, f"MISSING{line_id}") for line_id in range(1, len(truth or ()) + 1)]
+    elif truth is not None:
+        pred, elapsed = parse_all(parser, [content for content, _ in truth])
+    else:
+        return {'status': 'skipped', 'reason': '没有原始日志或标注文件'}
+
+    lines = parser._processed_lines
+    return {
+        'status': 'ok',
+        'lines': lines,
+        'seconds': round(elapsed, 3),
+        'lines_per_sec': round(lines / elapsed, 1) if elapsed else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'templates': len(parser.templates),
+        'grouping_accuracy': round(grouping_accuracy([event_id for _, event_id in truth], pred), 4)
+        if truth else None,
+        'ground_truth': str(truth_path) if truth_path is not None else None,
+    }
+
+
+def run_isolated(log_data_dir: Path, log_type: str, settings_name: str, parser_name: str, truth_path=None):
+    """在新的解释器进程中运行一个数据集，峰值内存互不影响；临时目录存放结构化输出和 log_parser.log"""
+    command = [sys.executable, str(Path(__file__).resolve()), '--worker', log_type,
+               '--log-data-dir', str(log_data_dir.resolve()), '--settings', settings_name, '--parser', parser_name]
+    if truth_path:
+        command += ['--truth', f"{log_type}={Path(truth_path).resolve()}"]
+    with tempfile.TemporaryDirectory() as work_dir:
+        try:
+            proc = subprocess.run(command, cwd=work_dir, capture_output=True, text=True,
+                                  encoding='utf-8', errors='replace', timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return {'status': 'timeout'}
+    if proc.returncode != 0 or not proc.stdout.strip():
+        stderr = proc.stderr.strip().splitlines()
+        return {'status': 'error', 'reason': stderr[-1] if stderr else f"退出码 {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ==== 报告与基线比较 ====
+def compare_with_baseline(results, baseline_path, tolerance=REGRESSION_TOLERANCE):
+    """逐项与基线报告比较，返回回退描述列表；分组准确率只在两次使用同一标注文件时比较"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['dataset'], r['parser']): r for r in json.load(f)['results']}
+    regressions = []
+    for r in results:
+        base = baseline.get((r['dataset'], r['parser']))
+        if r.get('status') != 'ok' or not base or base.get('status') != 'ok':
+            continue
+        name = f"{r['dataset']}/{r['parser']}"
+        if base.get('lines_per_sec') and r['lines_per_sec'] < base['lines_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name} 吞吐 {base['lines_per_sec']:,.0f} → {r['lines_per_sec']:,.0f} 行/s")
+        if base.get('grouping_accuracy') is not None and r['grouping_accuracy'] is not None \
+                and base.get('ground_truth') == r['ground_truth'] \
+                and r['grouping_accuracy'] < base['grouping_accuracy']:
+            regressions.append(f"{name} 分组准确率 {base['grouping_accuracy']} → {r['grouping_accuracy']}")
+        if r['templates'] != base.get('templates'):
+            print(f"ℹ️ {name} 模板数变化：{base.get('templates')} → {r['templates']}")
+    return regressions
+
+
+def _fmt(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="日志解析基准套件")
+    arg_parser.add_argument("--log-data-dir", default="./dataset", help="数据集根目录（每个数据集一个子目录）")
+    arg_parser.add_argument("--dataset", nargs="*", default=None, help="只运行指定数据集（默认配置中的全部数据集）")
+    arg_parser.add_argument("--settings", choices=sorted(SETTINGS), default="base",
+                            help="使用 parse_settings（base）或 parse_settings_plus（plus）")
+    arg_parser.add_argument("--parser", nargs="+", choices=sorted(PARSERS), default=['regex'], help="参与基准的解析算法")
+    arg_parser.add_argument("--output", default=REPORT_PATH, help="JSON 报告路径")
+    arg_parser.add_argument("--baseline", default=None, help="历史 JSON 报告，用于检测吞吐 / 准确率回退")
+    arg_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="允许的吞吐下降比例")
+    arg_parser.add_argument("--truth", nargs="*", default=[], metavar="DATASET=PATH",
+                            help="显式指定数据集的 loghub 标注文件（默认按 loghub 命名在数据集目录中查找）")
+    arg_parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    settings_table = SETTINGS[args.settings]
+    log_data_dir = Path(args.log_data_dir)
+    truth_paths = parse_truth_args(args.truth)
+    if args.worker:
+        result = run_dataset(log_data_dir / args.worker, args.worker, settings_table[args.worker], args.parser[0],
+                             truth_paths.get(args.worker))
+        print(json.dumps(result, ensure_ascii=False))
+        return 0
+
+    results = []
+    for log_type in settings_table:
+        if args.dataset and log_type not in args.dataset:
+            continue
+        if not (log_data_dir / log_type).is_dir():
+            continue
+        for parser_name in args.parser:
+            result = {'dataset': log_type, 'parser': parser_name}
+            result.update(run_isolated(log_data_dir, log_type, args.settings, parser_name,
+                                       truth_paths.get(log_type)))
+            results.append(result)
+            if result['status'] != 'ok':
+                print(f"⚠️ {log_type:12} {parser_name:<6} {result['status']} {result.get('reason') or ''}")
+                continue
+            print(f"{log_type:12} {parser_name:<6} {result['lines']:>10} 行  {result['lines_per_sec']:>12,.0f} 行/s"
+                  f"  峰值内存 {_fmt(result['peak_rss_mb'], '>8.1f')} MB  模板 {result['templates']:>6}"
+                  f"  分组准确率 {_fmt(result['grouping_accuracy'], '.4f')}")
+
+    if not results:
+        print(f"⚠️ {log_data_dir} 下没有与配置对应的数据集")
+        return 1
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': args.settings,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 报告已写入 {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for message in regressions:
+            print(f"❌ 回退：{message}")
+        if regressions:
+            return 1
+        print("✅ 与基线相比无回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+解析计划差分校验：对同一批日志分别用预编译解析计划（ParsePlan）和原始逐条 re 调用解析，
+逐行比对 EventId / EventTemplate，任何不一致都会列出并以非零状态退出。
+
+用法：
+    python parse_diff_check.py --log-data-dir ./dataset                 # 目录下全部数据集
+    python parse_diff_check.py --log-data-dir ./dataset --dataset BGL HDFS --settings plus
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+from line_reader import read_lines
+from logParser_main import LogParser, get_parse_plan, split_fields
+from settings import parse_settings, parse_settings_plus
+
+SETTINGS = {'base': parse_settings, 'plus': parse_settings_plus}
+MAX_REPORTED = 20
+
+
+def iter_contents(dataset_dir: Path, log_type: str, settings, limit=None):
+    """
+    按数据集可用的文件产出待解析内容：
+    1）原始日志 + headers 配置：与 transform_log_to_csv 一致地切出 Content；
+    2）loghub 的 *_structured.csv：取 Content 列；
+    3）仅有原始日志、无 headers：整行解析。
+    """
+    raw_log = dataset_dir / f"{log_type}.log"
+    structured = sorted(dataset_dir.glob("*_structured.csv"))
+    count = 0
+    if raw_log.exists() and settings.get('headers'):
+        headers = settings['headers']
+        for line_id, raw_line in enumerate(read_lines(raw_log, errors='replace'), 1):
+            row = split_fields(line_id, raw_line, headers)
+            if row is not None:
+                yield line_id, row[-1]
+                count += 1
+            if limit and count >= limit:
+                return
+    elif structured:
+        for row in csv.DictReader(read_lines(structured[0], errors='replace')):
+            yield row.get('LineId'), row['Content']
+            count += 1
+            if limit and count >= limit:
+                return
+    elif raw_log.exists():
+        for line_id, raw_line in enumerate(read_lines(raw_log, errors='replace'), 1):
+            yield line_id, raw_line
+            if limit and line_id >= limit:
+                return
+
+
+def _parse(parser: LogParser, content: str):
+    try:
+        return parser.parse_line(content)
+    except Exception as e:  # 与 transform_log_to_csv 一致：异常行被跳过，这里比对异常类型
+        return 'ERROR', type(e).__name__
+
+
+def check_dataset(dataset_dir: Path, log_type: str, settings, limit=None) -> int:
+    plan_parser = LogParser(settings)
+    legacy_parser = LogParser(settings, use_parse_plan=False)
+    lines = mismatches = 0
+    for line_id, content in iter_contents(dataset_dir, log_type, settings, limit):
+        lines += 1
+        got, expected = _parse(plan_parser, content), _parse(legacy_parser, content)
+        if got != expected:
+            mismatches += 1
+            if mismatches <= MAX_REPORTED:
+                print(f"  ❌ 行 {line_id}: 解析计划 {got} ≠ 原实现 {expected}\n     {content.strip()[:200]}")
+
+    plan = get_parse_plan(settings)
+    fused = sum(type(step).__name__ == '_FusedSubstitution' for step in plan.substitutions + plan.splits)
+    status = "✅ 一致" if mismatches == 0 else f"❌ {mismatches} 行不一致"
+    print(f"{log_type:12} {lines:>9} 行  模板 {len(plan_parser.templates):>5}  合并替换组 {fused}  {status}")
+    return mismatches
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="ParsePlan 与原始解析实现的差分校验")
+    arg_parser.add_argument("--log-data-dir", default="./dataset", help="数据集根目录（每个数据集一个子目录）")
+    arg_parser.add_argument("--dataset", nargs="*", default=None, help="只校验指定数据集")
+    arg_parser.add_argument("--settings", choices=sorted(SETTINGS), default="base",
+                            help="使用 parse_settings（base）或 parse_settings_plus（plus）")
+    arg_parser.add_argument("--limit", type=int, default=None, help="每个数据集最多校验的行数")
+    args = arg_parser.parse_args(argv)
+
+    settings_table = SETTINGS[args.settings]
+    data_dir = Path(args.log_data_dir)
+    total = 0
+    checked = 0
+    for dataset_dir in sorted(p for p in data_dir.glob("*") if p.is_dir()):
+        log_type = dataset_dir.name
+        if args.dataset and log_type not in args.dataset:
+            continue
+        if log_type not in settings_table:
+            continue
+        total += check_dataset(dataset_dir, log_type, settings_table[log_type], args.limit)
+        checked += 1
+
+    if not checked:
+        print(f"⚠️ {data_dir} 下没有可校验的数据集")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
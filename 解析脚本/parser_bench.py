@@ -0,0 +1,206 @@
+"""
+解析基准：
+1）token 变量判定：在真实数据集的 token 流上比较
+   原始实现（is_variable_token）、快速判定（classify_token）与带缓存的快速判定（cached_classify_token）的吞吐（tokens/s），
+   并逐个 token 校验三者结果一致；
+2）--compare：比较模板挖掘算法（静态 token 日志键 LogParser / Drain 解析树 DrainParser）的
+   模板数、吞吐（行/s）以及相对 loghub 标注的分组准确率。
+   标注文件按 loghub 命名查找（见 LOGHUB_TRUTH_NAMES），或用 --truth 数据集=路径 显式指定；
+   解析器自己写出的 {log_type}.log_structured.csv 永远不会被当作标注。
+
+用法：
+    python parser_bench.py --log-data-dir ./dataset --dataset BGL HDFS --limit 500000
+    python parser_bench.py --log-data-dir ./dataset --dataset HDFS_2k BGL_2k --compare
+    python parser_bench.py --log-data-dir ./dataset --dataset HDFS --compare --truth HDFS=./loghub/HDFS_2k.log_structured.csv
+"""
+import argparse
+import csv
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+from logParser_main import PARSERS, LogParser, classify_token, cached_classify_token, is_variable_token
+from parse_diff_check import SETTINGS, iter_contents
+
+# loghub 标注文件命名（{name} 为去掉 _2k 后缀的数据集名），按顺序取第一个存在的文件
+LOGHUB_TRUTH_NAMES = (
+    '{name}_2k.log_structured_corrected.csv',
+    '{name}_2k.log_structured.csv',
+    '{name}_full.log_structured.csv',
+)
+
+CLASSIFIERS = [
+    ('原始实现', is_variable_token),
+    ('快速判定', classify_token),
+    ('快速判定+缓存', cached_classify_token),
+]
+
+
+def collect_tokens(dataset_dir: Path, log_type: str, settings, limit=None):
+    """按 parse_line 相同的预处理（时间/替换/分割）得到每行的 token，拼接成一个 token 流"""
+    parser = LogParser(settings)
+    tokens = []
+    for _, content in iter_contents(dataset_dir, log_type, settings, limit):
+        try:
+            line, _ = parser._apply_plan(content.strip())
+        except Exception:  # 与 transform_log_to_csv 一致：异常行跳过
+            continue
+        tokens.extend(t for t in line.split() if t)
+    return tokens
+
+
+def bench(classify, tokens, repeat):
+    """返回最好一轮的 tokens/s；缓存版本每轮开始前清空缓存，计入冷启动开销"""
+    best = float('inf')
+    for _ in range(repeat):
+        if hasattr(classify, 'cache_clear'):
+            classify.cache_clear()
+        start = time.perf_counter()
+        for token in tokens:
+            classify(token)
+        best = min(best, time.perf_counter() - start)
+    return len(tokens) / best if best else float('inf')
+
+
+def bench_dataset(dataset_dir: Path, log_type: str, settings, limit=None, repeat=3) -> int:
+    tokens = collect_tokens(dataset_dir, log_type, settings, limit)
+    mismatches = sum(is_variable_token(t) != classify_token(t) for t in set(tokens))
+    print(f"\n📊 {log_type}：{len(tokens)} 个 token（去重 {len(set(tokens))}）")
+    baseline = None
+    for name, classify in CLASSIFIERS:
+        rate = bench(classify, tokens, repeat)
+        baseline = baseline or rate
+        print(f"  {name:<10} {rate / 1e6:8.2f} M tokens/s  ×{rate / baseline:.2f}")
+    info = cached_classify_token.cache_info()
+    print(f"  缓存命中率 {info.hits / max(info.hits + info.misses, 1):.1%}（上限 {info.maxsize}）"
+          f"  {'✅ 结果一致' if not mismatches else f'❌ {mismatches} 个 token 判定不一致'}")
+    return mismatches
+
+
+# ==== 模板挖掘算法对比 ====
+def grouping_accuracy(truth, pred) -> float:
+    """
+    loghub 的分组准确率（Grouping Accuracy）：某个预测分组与某个标注分组包含的行完全相同时，
+    该组内的行计为解析正确；返回正确行数占比。
+    """
+    if not truth:
+        return 0.0
+    truth_sizes, pred_sizes = Counter(truth), Counter(pred)
+    correct = sum(n for (p, t), n in Counter(zip(pred, truth)).items()
+                  if n == pred_sizes[p] == truth_sizes[t])
+    return correct / len(truth)
+
+
+def parser_output_path(dataset_dir: Path, log_type: str) -> Path:
+    """logParser_main 写出的结构化 CSV（不能作为标注使用）"""
+    return dataset_dir / f"{log_type}.log_structured.csv"
+
+
+def ground_truth_path(dataset_dir: Path, log_type: str, truth_path=None):
+    """
+    loghub 标注文件路径：优先使用显式指定的文件，否则按 LOGHUB_TRUTH_NAMES 在数据集目录中查找；找不到时返回 None。
+    与解析器自身输出路径相同的文件会被跳过（显式指定时报错），避免用解析器的旧输出给自己打分。
+    """
+    own_output = parser_output_path(dataset_dir, log_type).resolve()
+    if truth_path:
+        path = Path(truth_path)
+        if path.resolve() == own_output:
+            raise ValueError(f"{path} 是解析器自身的结构化输出，不能作为 loghub 标注")
+        if not path.exists():
+            raise FileNotFoundError(f"标注文件不存在: {path}")
+        return path
+    name = log_type[:-3] if log_type.endswith('_2k') else log_type
+    for pattern in LOGHUB_TRUTH_NAMES:
+        path = dataset_dir / pattern.format(name=name)
+        if path.exists() and path.resolve() != own_output:
+            return path
+    return None
+
+
+def load_ground_truth(path, limit=None):
+    """读取 loghub 标注文件，返回 [(Content, EventId)]；path 为 None 时返回 None"""
+    if path is None:
+        return None
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.DictReader(f)
+        if not {'Content', 'EventId'} <= set(reader.fieldnames or ()):
+            raise ValueError(f"标注文件 {path} 缺少 Content / EventId 列")
+        return [(row['Content'], row['EventId']) for row in islice(reader, limit)]
+
+
+def parse_truth_args(values):
+    """把 --truth 的 数据集=路径 列表转为字典"""
+    truth_paths = {}
+    for value in values or ():
+        log_type, sep, path = value.partition('=')
+        if not sep or not path:
+            raise ValueError(f"--truth 格式应为 数据集=路径：{value}")
+        truth_paths[log_type] = path
+    return truth_paths
+
+
+def parse_all(parser: LogParser, contents):
+    """逐行解析，返回 (每行 EventId, 耗时)；异常行各自单独成组"""
+    pred = []
+    start = time.perf_counter()
+    for i, content in enumerate(contents):
+        try:
+            pred.append(parser.parse_line(content)[0])
+        except Exception:  # 与 transform_log_to_csv 一致：异常行跳过
+            pred.append(f"ERROR{i}")
+    return pred, time.perf_counter() - start
+
+
+def compare_dataset(dataset_dir: Path, log_type: str, settings, limit=None, truth_path=None) -> None:
+    truth_path = ground_truth_path(dataset_dir, log_type, truth_path)
+    truth = load_ground_truth(truth_path, limit)
+    if truth is not None:
+        contents = [content for content, _ in truth]
+        truth_ids = [event_id for _, event_id in truth]
+    else:
+        contents = [content for _, content in iter_contents(dataset_dir, log_type, settings, limit)]
+        truth_ids = None
+    print(f"\n📊 {log_type}：{len(contents)} 行"
+          + (f"，标注 {truth_path.name}（{len(set(truth_ids))} 个模板）" if truth_ids
+             else "（无 loghub 标注，不计算分组准确率）"))
+    for name, parser_cls in PARSERS.items():
+        parser = parser_cls(settings)
+        pred, elapsed = parse_all(parser, contents)
+        rate = len(contents) / elapsed if elapsed else float('inf')
+        accuracy = f"{grouping_accuracy(truth_ids, pred):.4f}" if truth_ids else "-"
+        print(f"  {name:<6} 模板 {len(parser.templates):>6}  {rate:>12,.0f} 行/s  分组准确率 {accuracy}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="LogParser token 变量判定基准")
+    arg_parser.add_argument("--log-data-dir", default="./dataset", help="数据集根目录（每个数据集一个子目录）")
+    arg_parser.add_argument("--dataset", nargs="*", default=['BGL', 'HDFS'], help="参与基准的数据集")
+    arg_parser.add_argument("--settings", choices=sorted(SETTINGS), default="base")
+    arg_parser.add_argument("--limit", type=int, default=None, help="每个数据集最多读取的行数")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="每种实现重复测量的轮数（取最好一轮）")
+    arg_parser.add_argument("--compare", action="store_true",
+                            help="比较模板挖掘算法（regex / drain）的模板数、吞吐与分组准确率")
+    arg_parser.add_argument("--truth", nargs="*", default=[], metavar="DATASET=PATH",
+                            help="显式指定数据集的 loghub 标注文件（默认按 loghub 命名在数据集目录中查找）")
+    args = arg_parser.parse_args(argv)
+
+    settings_table = SETTINGS[args.settings]
+    truth_paths = parse_truth_args(args.truth)
+    total = 0
+    for log_type in args.dataset:
+        dataset_dir = Path(args.log_data_dir) / log_type
+        if not dataset_dir.is_dir() or log_type not in settings_table:
+            print(f"⚠️ 跳过 {log_type}：{dataset_dir} 不存在或无解析配置")
+            continue
+        if args.compare:
+            compare_dataset(dataset_dir, log_type, settings_table[log_type], args.limit,
+                            truth_paths.get(log_type))
+            continue
+        total += bench_dataset(dataset_dir, log_type, settings_table[log_type], args.limit, args.repeat)
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
+# timestamp_columns 沿用 loghub 结构化文件的列名（多列以空格拼接后按 time_format 解析）；
+# Hadoop / OpenStack / Proxifier 的 loghub 时间列与 time_format 不一致（小数秒分隔符、方括号），不配置
 parse_settings = {
     'Andriod': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'^(\d{2}-\d{2}\s\d{2}:\d{2}:\d{2}\.\d{3})',
         'time_format': '%m-%d %H:%M:%S.%f',
         'specific': [
@@ -17,6 +20,7 @@ parse_settings = {
         },
     },
     'Apache': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'^\[(.+?)\]',
         'time_format': '%a %b %d %H:%M:%S %Y',
         'specific': [],
@@ -32,6 +36,7 @@ parse_settings = {
             'NodeRepeat', 'Type', 'Component', 'Level', 'Content',
             'EventId', 'EventTemplate'
         ],
+        'timestamp_columns': ['Time'],  # 结构化输出中按 time_format 解析的时间列（Parquet 的 EventTime）
         'time_regex': r'\b(\d{4}-\d{2}-\d{2}-\d{2}.\d{2}.\d{2}.\d{6})\b',
         'time_format': '%Y-%m-%d-%H.%M.%S.%f',
         'specific': [],
@@ -57,6 +62,7 @@ parse_settings = {
             'NodeRepeat', 'Type', 'Component', 'Level', 'Content',
             'EventId', 'EventTemplate'
         ],
+        'timestamp_columns': ['Time'],  # 结构化输出中按 time_format 解析的时间列（Parquet 的 EventTime）
         'time_regex': r'\b(\d{4}-\d{2}-\d{2}-\d{2}.\d{2}.\d{2}.\d{6})\b',
         'time_format': '%Y-%m-%d-%H.%M.%S.%f',
         'specific': [],
@@ -91,6 +97,7 @@ parse_settings = {
             'Component', 'Content', 
             'EventId', 'EventTemplate'
         ],
+        'timestamp_columns': ['Date', 'Time'],  # 结构化输出中按 time_format 解析的时间列（Parquet 的 EventTime）
         'time_regex': r'^(\d{6} \d{6})',
         'time_format': '%y%m%d %H%M%S',
         'specific': [],
@@ -103,6 +110,7 @@ parse_settings = {
             'Component', 'Content', 
             'EventId', 'EventTemplate'
         ],
+        'timestamp_columns': ['Date', 'Time'],  # 结构化输出中按 time_format 解析的时间列（Parquet 的 EventTime）
         'time_regex': r'^(\d{6} \d{6})',
         'time_format': '%y%m%d %H%M%S',
         'specific': [],
@@ -110,6 +118,7 @@ parse_settings = {
         'split_regex': {},
     },
     'HealthApp': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'^(\d{6}-\d{2}:\d{2}:\d{2}:\d{3})',
         'time_format': '%Y%m%d-%H:%M:%S:%f',
         'specific': [],
@@ -120,6 +129,7 @@ parse_settings = {
         },
     },
     'HPC': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'\b(\d{10})\b',
         'time_format': '%UNIX_TIMESTAMP',
         'specific': [
@@ -129,6 +139,7 @@ parse_settings = {
         'split_regex': {},
     },
     'Linux': {
+        'timestamp_columns': ['Month', 'Date', 'Time'],
         'time_regex': r'^(\w{3}\s+\d{1,2} \d{2}:\d{2}:\d{2})',
         'time_format': '%b %d %H:%M:%S',
         'specific': [],
@@ -144,6 +155,7 @@ parse_settings = {
     },
 
     'Mac': {
+        'timestamp_columns': ['Month', 'Date', 'Time'],
         'time_regex': r'^(\w{3}\s+\d{1,2} \d{2}:\d{2}:\d{2})',
         'time_format': '%b %d %H:%M:%S',
         'specific': [
@@ -162,6 +174,7 @@ parse_settings = {
     },
 
     'OpenSSH': {
+        'timestamp_columns': ['Date', 'Day', 'Time'],
         'time_regex': r'^(\w{3}\s+\d{1,2} \d{2}:\d{2}:\d{2})',
         'time_format': '%b %d %H:%M:%S',
         'specific': [],
@@ -201,6 +214,7 @@ parse_settings = {
     },
 
     'Spark': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'^(\d{2}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2})',
         'time_format': '%y/%m/%d %H:%M:%S',
         'specific': [],
@@ -211,6 +225,7 @@ parse_settings = {
     },
 
     'Thunderbird': {
+        'timestamp_columns': ['Timestamp'],
         'time_regex': r'\b1(\d{9})\b',
         'time_format': '%UNIX_TIMESTAMP',
         'specific': [],
@@ -223,6 +238,7 @@ parse_settings = {
     },
 
     'Windows': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})',
         'time_format': '%Y-%m-%d %H:%M:%S',
         'specific': [],
@@ -232,6 +248,7 @@ parse_settings = {
     },
 
     'Zookeeper': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})',
         'time_format': '%Y-%m-%d %H:%M:%S,%f',
         'specific': [],
@@ -245,6 +262,7 @@ parse_settings = {
 
 parse_settings_plus = {
     'Andriod': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'^(\d{2}-\d{2}\s\d{2}:\d{2}:\d{2}\.\d{3})',
         'time_format': '%m-%d %H:%M:%S.%f',
         'specific': [
@@ -263,6 +281,7 @@ parse_settings_plus = {
         },
     },
     'Apache': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'^\[(.+?)\]',
         'time_format': '%a %b %d %H:%M:%S %Y',
         'specific': [],
@@ -270,6 +289,7 @@ parse_settings_plus = {
         'split_regex': {},
     },
     'BGL': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'\b(\d{4}-\d{2}-\d{2}-\d{2}.\d{2}.\d{2}.\d{6})\b',
         'time_format': '%Y-%m-%d-%H.%M.%S.%f',
         'specific': [],
@@ -299,6 +319,7 @@ parse_settings_plus = {
         },
     },
     'HDFS': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'^(\d{6} \d{6})',
         'time_format': '%y%m%d %H%M%S',
         'specific': [],
@@ -306,6 +327,7 @@ parse_settings_plus = {
         'split_regex': {},
     },
     'HealthApp': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'^(\d{6}-\d{2}:\d{2}:\d{2}:\d{3})',
         'time_format': '%Y%m%d-%H:%M:%S:%f',
         'specific': [],
@@ -316,6 +338,7 @@ parse_settings_plus = {
         },
     },
     'HPC': {
+        'timestamp_columns': ['Time'],
         'time_regex': r'\b(\d{10})\b',
         'time_format': '%UNIX_TIMESTAMP',
         'specific': [
@@ -325,6 +348,7 @@ parse_settings_plus = {
         'split_regex': {},
     },
     'Linux': {
+        'timestamp_columns': ['Month', 'Date', 'Time'],
         'time_regex': r'^(\w{3}\s+\d{1,2} \d{2}:\d{2}:\d{2})',
         'time_format': '%b %d %H:%M:%S',
         'specific': [],
@@ -341,6 +365,7 @@ parse_settings_plus = {
     },
 
     'Mac': {
+        'timestamp_columns': ['Month', 'Date', 'Time'],
         'time_regex': r'^(\w{3}\s+\d{1,2} \d{2}:\d{2}:\d{2})',
         'time_format': '%b %d %H:%M:%S',
         'specific': [
@@ -359,6 +384,7 @@ parse_settings_plus = {
     },
 
     'OpenSSH': {
+        'timestamp_columns': ['Date', 'Day', 'Time'],
         'time_regex': r'^(\w{3}\s+\d{1,2} \d{2}:\d{2}:\d{2})',
         'time_format': '%b %d %H:%M:%S',
         'specific': [],
@@ -398,6 +424,7 @@ parse_settings_plus = {
     },
 
     'Spark': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'^(\d{2}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2})',
         'time_format': '%y/%m/%d %H:%M:%S',
         'specific': [],
@@ -408,6 +435,7 @@ parse_settings_plus = {
     },
 
     'Thunderbird': {
+        'timestamp_columns': ['Timestamp'],
         'time_regex': r'\b1(\d{9})\b',
         'time_format': '%UNIX_TIMESTAMP',
         'specific': [],
@@ -421,6 +449,7 @@ parse_settings_plus = {
     },
 
     'Windows': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})',
         'time_format': '%Y-%m-%d %H:%M:%S',
         'specific': [],
@@ -430,6 +459,7 @@ parse_settings_plus = {
     },
 
     'Zookeeper': {
+        'timestamp_columns': ['Date', 'Time'],
         'time_regex': r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})',
         'time_format': '%Y-%m-%d %H:%M:%S,%f',
         'specific': [],
@@ -0,0 +1,167 @@
+import csv
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from time_parser import get_time_parser
+
+# ==== 配置参数 ====
+ROW_GROUP_SIZE = 100000     # Parquet 每个 row group 的行数
+PARQUET_COMPRESSION = 'zstd'
+# 取值高度重复的列按字典编码存储（读入 pandas 后为 category）
+DICTIONARY_COLUMNS = ('EventId', 'EventTemplate', 'Component', 'Level', 'Label', 'Type')
+INTEGER_COLUMNS = ('LineId',)
+TIME_COLUMN = 'EventTime'   # 由 settings['timestamp_columns'] 按 time_format 解析出的时间列（微秒精度）
+EPOCH_COLUMN = 'EventTimeUs'  # CSV 输出可选的纪元微秒整数列（与 Parquet 的 EventTime 同源）
+
+
+def is_parquet(path) -> bool:
+    return str(path).lower().endswith('.parquet')
+
+
+class EventTimeColumn:
+    """
+    按 settings['timestamp_columns'] 与 time_format 计算每行时间的纪元微秒（time_parser.TimeParser，秒级前缀缓存），
+    多个时间列以空格拼接后解析，无法解析时为 None。数据集未配置时间列或列名不在 headers 中时 enabled 为 False。
+    """
+
+    def __init__(self, headers: List[str], settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
+        time_columns = settings.get('timestamp_columns') or []
+        self._index = [headers.index(c) for c in time_columns if c in headers]
+        self.enabled = bool(self._index) and len(self._index) == len(time_columns) and 'time_format' in settings
+        self._parse = get_time_parser(settings['time_format']) if self.enabled else None
+
+    def __call__(self, row: List[Any]) -> Optional[int]:
+        index = self._index
+        text = row[index[0]] if len(index) == 1 else ' '.join(row[i] for i in index)
+        try:
+            return self._parse(text)
+        except (ValueError, OverflowError, OSError):
+            return None
+
+
+class CsvOutput:
+    """
+    结构化 CSV 输出。
+    append_size 为上次增量解析结束时的输出大小：截断到该大小后续写（丢弃中断运行写出的半截内容）；
+    输出文件缺失或比记录的小时无法续写，重新写表头并只包含本次新增的行。
+    epoch 不为空时在行尾追加 EventTimeUs（纪元微秒）列。
+    """
+
+    def __init__(self, output_path: str, headers: List[str], append_size: Optional[int] = None,
+                 epoch: Optional[EventTimeColumn] = None):
+        self._epoch = epoch
+        if epoch is not None:
+            headers = list(headers) + [EPOCH_COLUMN]
+        if append_size is not None and os.path.exists(output_path) and os.path.getsize(output_path) >= append_size:
+            os.truncate(output_path, append_size)
+            self._file = open(output_path, 'a', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            return
+        if append_size is not None:
+            logging.warning(f"输出文件 {output_path} 缺失或不完整，本次只写出新增的日志行")
+        self._file = open(output_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(headers)
+
+    def writerows(self, rows: List[List[Any]]) -> None:
+        if self._epoch is not None:
+            epoch = self._epoch
+            for row in rows:
+                row.append(epoch(row))
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetOutput:
+    """
+    结构化 Parquet 输出（需安装 pyarrow）：
+    EventId/EventTemplate/Component/Level 等列字典编码，LineId 为整数，
+    配置了 timestamp_columns 的数据集额外写出 EventTime（timestamp[us]，无法解析的时间为空值）。
+    行先在内存中攒到 ROW_GROUP_SIZE 再写出一个 row group。
+    """
+
+    def __init__(self, output_path: str, headers: List[str], settings: Optional[Dict[str, Any]] = None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self.headers = list(headers)
+        self._event_time = EventTimeColumn(self.headers, settings)
+
+        fields = []
+        for name in self.headers:
+            if name in INTEGER_COLUMNS:
+                fields.append(pa.field(name, pa.int64()))
+            elif name in DICTIONARY_COLUMNS:
+                fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        if self._event_time.enabled:
+            fields.append(pa.field(TIME_COLUMN, pa.timestamp('us')))
+        self.schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(output_path, self.schema, compression=PARQUET_COMPRESSION)
+        self._buffer = []
+
+    def writerows(self, rows: List[List[Any]]) -> None:
+        self._buffer.extend(rows)
+        if len(self._buffer) >= ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        pa = self._pa
+        columns = list(zip(*self._buffer))
+        arrays = []
+        for name, values in zip(self.headers, columns):
+            if name in INTEGER_COLUMNS:
+                arrays.append(pa.array(values, type=pa.int64()))
+            elif name in DICTIONARY_COLUMNS:
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=pa.string()))
+        if len(arrays) < len(self.schema):
+            event_time = self._event_time
+            arrays.append(pa.array([event_time(row) for row in self._buffer], type=pa.timestamp('us')))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._flush()
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_structured_output(output_path: str, headers: List[str], settings: Optional[Dict[str, Any]] = None,
+                           append_size: Optional[int] = None, epoch_column: bool = False):
+    """
+    按扩展名选择输出格式：*.parquet 写 Parquet，其余写 CSV。
+    epoch_column=True 时 CSV 额外写出 EventTimeUs 列（Parquet 的 EventTime 本身即纪元微秒，不重复写出）。
+    """
+    if is_parquet(output_path):
+        if append_size is not None:
+            raise ValueError(f"Parquet 输出不支持增量续写: {output_path}")
+        return ParquetOutput(output_path, headers, settings)
+    epoch = None
+    if epoch_column:
+        epoch = EventTimeColumn(headers, settings)
+        if not epoch.enabled:
+            logging.warning(f"数据集未配置可用的 timestamp_columns，不写出 {EPOCH_COLUMN} 列")
+            epoch = None
+    return CsvOutput(output_path, headers, append_size, epoch)
@@ -0,0 +1,99 @@
+import re
+from datetime import datetime, timedelta
+
+# ==== 配置参数 ====
+SECOND_CACHE_SIZE = 1 << 16   # 秒级前缀缓存的条目上限（满后清空重建）
+UNIX_FORMAT = '%UNIX_TIMESTAMP'
+# 手写快速路径支持的定宽数字指令及其宽度
+_NUMERIC_DIRECTIVES = {'Y': 4, 'y': 2, 'm': 2, 'd': 2, 'H': 2, 'M': 2, 'S': 2}
+# 以“非空白、非字母数字的分隔符 + %f”结尾的格式可以把小数秒拆出来单独处理
+_FRACTION_SUFFIX = re.compile(r'(?<!%)[^\w\s%]%f$')
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+
+def _compile_numeric(time_format):
+    """
+    只含定宽数字指令（%Y %y %m %d %H %M %S）与分隔符的格式编译为 (正则, 指令顺序)，否则返回 None。
+    分隔符的处理与 strptime 相同：空白匹配任意长度空白，其余字符按字面、忽略大小写匹配。
+    """
+    pattern, fields = [], []
+    for part in re.split(r'(%.)', time_format):
+        if len(part) == 2 and part[0] == '%' and part != '%%':
+            width = _NUMERIC_DIRECTIVES.get(part[1])
+            if width is None or part[1] in fields:
+                return None
+            pattern.append(rf'(\d{{{width}}})')
+            fields.append(part[1])
+        elif part:
+            literal = part.replace('%%', '%')
+            pattern.append(r'\s+'.join(re.escape(piece) for piece in re.split(r'\s+', literal)))
+    return re.compile(''.join(pattern), re.IGNORECASE), fields
+
+
+class TimeParser:
+    """
+    按 time_format 专门化的时间解析，返回纪元微秒（时间串按 UTC 解释，与 datetime.utcfromtimestamp 对应）。
+    - 以 分隔符+%f 结尾的格式先拆出小数秒，秒级前缀的解析结果按字典缓存，同一秒内的日志行只做一次字典查找；
+    - 只含定宽数字指令的格式用预编译正则 + datetime() 手写解析，其余格式或快速路径失败时回退 strptime，
+      接受与拒绝的时间串都与 LogParser.to_datetime 一致，无法解析时同样抛出 ValueError。
+    """
+
+    def __init__(self, time_format: str):
+        self.time_format = time_format
+        self._unix = time_format == UNIX_FORMAT
+        self._fraction = not self._unix and _FRACTION_SUFFIX.search(time_format) is not None
+        self._prefix_format = time_format[:-2] if self._fraction else time_format
+        self._numeric = None if self._unix else _compile_numeric(self._prefix_format)
+        self._cache = {}
+
+    def __call__(self, text: str) -> int:
+        if self._fraction:
+            prefix = text.rstrip('0123456789')
+            fraction = text[len(prefix):]
+            if not 0 < len(fraction) <= 6:  # strptime 的 %f 只接受 1~6 位，交给 strptime 给出一致的结果
+                return (datetime.strptime(text, self.time_format) - _EPOCH) // timedelta(microseconds=1)
+        else:
+            prefix, fraction = text, ''
+
+        seconds = self._cache.get(prefix)
+        if seconds is None:
+            seconds = self._parse_seconds(prefix)
+            if len(self._cache) >= SECOND_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[prefix] = seconds
+        return seconds * 1000000 + (int(fraction.ljust(6, '0')) if fraction else 0)
+
+    def to_datetime(self, text: str) -> datetime:
+        return _EPOCH + timedelta(microseconds=self(text))
+
+    def _parse_seconds(self, text: str) -> int:
+        """解析秒级精度的时间串，返回纪元秒"""
+        if self._unix:
+            return (datetime.utcfromtimestamp(int(text)) - _EPOCH) // _SECOND
+        if self._numeric is not None:
+            regex, fields = self._numeric
+            match = regex.fullmatch(text)
+            if match is not None:
+                values = dict(zip(fields, map(int, match.groups())))
+                year = values.get('Y')
+                if year is None:
+                    year = values['y'] + (2000 if values['y'] < 69 else 1900) if 'y' in values else 1900
+                try:
+                    date_obj = datetime(year, values.get('m', 1), values.get('d', 1),
+                                        values.get('H', 0), values.get('M', 0), values.get('S', 0))
+                    return (date_obj - _EPOCH) // _SECOND
+                except ValueError:
+                    pass  # 超出范围的字段交给 strptime 判定
+        return (datetime.strptime(text, self._prefix_format) - _EPOCH) // _SECOND
+
+
+_parser_cache = {}
+
+
+def get_time_parser(time_format: str) -> TimeParser:
+    """每种 time_format 共用一个解析器（共享秒级缓存）"""
+    parser = _parser_cache.get(time_format)
+    if parser is None:
+        parser = _parser_cache[time_format] = TimeParser(time_format)
+    return parser